@@ -0,0 +1,2 @@
+"""helpers for talking to (and running) the AEPsych server used by the experiment scripts
+"""
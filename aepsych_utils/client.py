@@ -0,0 +1,370 @@
+#!/usr/bin/python
+"""streaming client for the AEPsych server socket protocol
+"""
+import json
+
+from aepsych_utils.transport import open_transport
+
+
+# The AEPsych server does not put any framing around its replies: an ask is answered
+# with a JSON document, a tell with the bare token ``acq``, a setup with the strategy
+# id and an exit with ``Terminate``. Replies are therefore framed by JSON document
+# boundaries, with these tokens recognised on their own.
+BARE_REPLIES = (b'acq', b'Terminate')
+
+# The server reads each message with a single recv and does not handle short reads: a
+# message split over two segments is parsed as two broken ones. Batched messages are
+# therefore kept to a few KiB, which a local connection delivers in one piece (a tell
+# takes about 100 bytes, so that is still some 80 tells per round trip)
+MAX_MESSAGE_BYTES = 8 * 1024
+
+# characters a JSON value can start with
+JSON_START = b'{["-0123456789tfn'
+
+WHITESPACE = b' \t\r\n'
+
+
+class MessageBuffer:
+    """growable receive buffer that splits a byte stream into AEPsych replies
+
+    Bytes are received straight into a preallocated ``bytearray`` (see
+    ``writable`` and ``commit``), and each reply is decoded directly out
+    of that buffer once it is complete, so a reply that arrives over
+    several ``recv`` calls is never truncated or concatenated before it
+    is parsed.
+
+    Parameters
+    ----------
+    size : int
+        Initial size of the buffer, in bytes. The buffer doubles in size
+        whenever a single reply does not fit.
+
+    """
+    def __init__(self, size=65536):
+        self._buf = bytearray(size)
+        self._start = 0
+        self._end = 0
+        self._decoder = json.JSONDecoder()
+        # only try to decode again once a byte that can end a JSON document arrives
+        self._maybe_complete = False
+
+    def __len__(self):
+        return self._end - self._start
+
+    def writable(self, min_free=4096):
+        """return a memoryview on the free part of the buffer
+
+        Already consumed bytes are discarded, and the buffer is grown if
+        fewer than ``min_free`` bytes would be left.
+        """
+        if len(self._buf) - self._end < min_free:
+            pending = self._end - self._start
+            if self._start:
+                self._buf[:pending] = self._buf[self._start:self._end]
+                self._start, self._end = 0, pending
+            if len(self._buf) - self._end < min_free:
+                self._buf.extend(bytes(max(len(self._buf), min_free)))
+        return memoryview(self._buf)[self._end:]
+
+    def commit(self, n_bytes):
+        """mark ``n_bytes`` written into the view from ``writable`` as received
+        """
+        start, self._end = self._end, self._end + n_bytes
+        if not self._maybe_complete and n_bytes:
+            # a document can only have been completed by a closing bracket or quote,
+            # or by a bare number/literal that runs up to the end of the data
+            self._maybe_complete = (any(self._buf.find(c, start, self._end) != -1 for c in (b'}', b']', b'"'))
+                                    or self._buf[self._end - 1:self._end].isalnum())
+
+    def feed(self, data):
+        """copy ``data`` into the buffer (convenience for non-socket sources)
+        """
+        self.writable(len(data))[:len(data)] = data
+        self.commit(len(data))
+
+    def next_message(self, at_end=False):
+        """pop the next complete reply from the buffer
+
+        A bare JSON number or literal (e.g. the strategy id a setup is
+        answered with) has nothing that marks its end, so one that runs
+        up to the end of the received data is only taken as complete with
+        ``at_end``: ``1`` followed by ``2`` in the next ``recv`` is ``12``.
+
+        Parameters
+        ----------
+        at_end : bool
+            The sender has nothing more to send until it gets a reply, so
+            the data received so far ends where its last message does
+
+        Returns
+        -------
+        complete : bool
+            Whether a full reply was available
+        message : dict, list, str, int, float or None
+            The decoded reply. JSON replies are returned decoded, bare
+            tokens such as ``acq`` are returned as str.
+
+        """
+        buf = self._buf
+        while self._start < self._end and buf[self._start] in WHITESPACE:
+            self._start += 1
+        if self._start == self._end:
+            return False, None
+        view = memoryview(buf)[self._start:self._end]
+        for token in BARE_REPLIES:
+            if view[:len(token)] == token:
+                self._start += len(token)
+                return True, token.decode('ascii')
+            if token[:len(view)] == view:
+                # the start of a token, wait for the rest of it
+                return False, None
+        if buf[self._start] not in JSON_START:
+            # unknown bare reply, take everything up to the next JSON document
+            stop = len(view)
+            for c in b'{[':
+                pos = buf.find(c, self._start, self._end)
+                if pos != -1:
+                    stop = min(stop, pos - self._start)
+            self._start += stop
+            return True, str(view[:stop], 'utf-8')
+        if not self._maybe_complete:
+            return False, None
+        try:
+            text = str(view, 'utf-8')
+        except UnicodeDecodeError as e:
+            # a multi-byte character is split over two recvs
+            if e.start < len(view) - 3:
+                raise
+            text = str(view[:e.start], 'utf-8')
+        try:
+            message, n_chars = self._decoder.raw_decode(text)
+        except json.JSONDecodeError:
+            self._maybe_complete = False
+            return False, None
+        if n_chars == len(text) and not at_end and not isinstance(message, (dict, list, str)):
+            # more digits may still be on the way
+            return False, None
+        if text.isascii():
+            self._start += n_chars
+        else:
+            self._start += len(text[:n_chars].encode('utf-8'))
+        self._maybe_complete = self._start < self._end
+        return True, message
+
+
+def tell_message(config, outcome):
+    """build the tell message for one trial
+
+    Parameters
+    ----------
+    config : dict
+        The ``config`` entry of the ask reply the trial was run with
+    outcome : int or float
+        The participant's response
+
+    Returns
+    -------
+    message : dict
+        The message, ready to be sent with ``AEPsychClient.request``
+
+    """
+    return {
+        "type": "tell",
+        "message": {
+            "config": config,
+            "outcome": outcome
+        }
+    }
+
+
+class AEPsychClient:
+    """connection to an AEPsych server
+
+    Message formats are described in the AEPsych documentation,
+    https://github.com/facebookresearch/aepsych#setup
+
+    Parameters
+    ----------
+    ip : str
+        Address the server is listening on
+    port : int
+        Port the server is listening on
+    timeout : float or None
+        Socket timeout, in seconds, for sends and receives. None blocks
+        forever (as the experiment scripts always have)
+    buffer_size : int
+        Initial size of the receive buffer, in bytes
+    transport : {'tcp', 'unix', 'pipe'}
+        What the connection goes over, see ``aepsych_utils.transport``.
+        TCP connections have Nagle's algorithm turned off.
+    address : str or None
+        Socket file (unix) or pipe name (pipe); TCP connects to ``(ip, port)``
+
+    """
+    def __init__(self, ip='127.0.0.1', port=5555, timeout=None, buffer_size=65536, transport='tcp', address=None):
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.transport = transport
+        self.address = address
+        self.connection = None
+        self._buffer = MessageBuffer(buffer_size)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def connect(self, verbose=True, timeout=None):
+        """try to connect to the server, once
+
+        A fresh connection is opened for every attempt, since a socket
+        whose ``connect`` has failed cannot be reused on every platform.
+
+        Parameters
+        ----------
+        verbose : bool
+        timeout : float or None
+            Seconds to wait for the connection; None blocks as long as
+            the OS lets it
+
+        Returns
+        -------
+        connected : bool
+            Whether the connection succeeded
+
+        """
+        if verbose:
+            print("Connecting to server...")
+        address = (self.ip, self.port) if self.transport == 'tcp' else self.address
+        try:
+            connection = open_transport(self.transport, address, timeout)
+        except OSError as e:
+            if verbose:
+                print("Could not connect: %s" % (e))
+            return False
+        connection.settimeout(self.timeout)
+        self.connection = connection
+        if verbose:
+            print("Connected!")
+        return True
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def send(self, message):
+        """send one message (a JSON-serializable dict) to the server
+        """
+        encoded = json.dumps(message).encode('utf-8')
+        self.connection.sendall(encoded)
+        self.bytes_sent += len(encoded)
+
+    def receive(self, scalar=False):
+        """block until the next complete reply has arrived and return it decoded
+
+        Parameters
+        ----------
+        scalar : bool
+            The reply is a bare number or literal, so it is complete once
+            received up to the end of what has arrived (see
+            ``MessageBuffer.next_message``)
+
+        """
+        while True:
+            complete, message = self._buffer.next_message(at_end=scalar)
+            if complete:
+                return message
+            n_bytes = self.connection.recv_into(self._buffer.writable())
+            if n_bytes == 0:
+                raise RuntimeError("Socket connection broken")
+            self._buffer.commit(n_bytes)
+            self.bytes_received += n_bytes
+
+    def request(self, message):
+        """send a message and wait for its reply
+        """
+        self.send(message)
+        return self.receive()
+
+    def setup(self, config_str):
+        """send the experiment config (the contents of the config.ini) to the server, returns the strategy id
+        """
+        self.send({
+            "type": "setup",
+            "message": {"config_str": config_str}
+        })
+        return self.receive(scalar=True)
+
+    def ask(self):
+        """ask the server for the next trial's parameters
+
+        Returns
+        -------
+        trial_parameters : dict
+            The reply, with the parameters in ``['config']`` and whether
+            the strategy is done in ``['is_finished']``
+
+        """
+        reply = self.request({
+            "type": "ask",
+            "message": ""
+        })
+        if not isinstance(reply, dict):
+            raise RuntimeError("Unexpected reply to ask message: %s" % (reply,))
+        return reply
+
+    def tell(self, config, outcome):
+        """tell the server the outcome of a trial, returns the server's acknowledgement
+        """
+        return self.request(tell_message(config, outcome))
+
+    def prime(self, tells, max_batch_bytes=MAX_MESSAGE_BYTES, progress=None):
+        """replay previously recorded tells, many per round trip
+
+        The AEPsych server accepts a tell message whose ``message`` is a
+        list of tells and records them all before acknowledging. The
+        tells are packed into as few such messages as fit in
+        ``max_batch_bytes`` each, so resuming a session costs a handful
+        of round trips instead of one per trial. The server expects each
+        ``recv`` to return exactly one whole message, so several messages
+        cannot be in flight at once, and each is kept small enough
+        (``MAX_MESSAGE_BYTES``) to arrive in a single segment.
+
+        Parameters
+        ----------
+        tells : list of dict
+            Tell messages, as built by ``tell_message``
+        max_batch_bytes : int
+            Upper bound on the size of each batched message
+        progress : callable or None
+            Called as ``progress(n_done, n_total)`` after every
+            acknowledged batch, e.g. to update a loading screen
+
+        Returns
+        -------
+        n_batches : int
+            Number of round trips it took
+
+        """
+        encoded = [json.dumps(tell['message']) for tell in tells]
+        n_batches = 0
+        start = 0
+        while start < len(encoded):
+            stop = start + 1
+            batch_bytes = len(encoded[start])
+            while stop < len(encoded) and batch_bytes + len(encoded[stop]) + 2 < max_batch_bytes:
+                batch_bytes += len(encoded[stop]) + 2
+                stop += 1
+            message = ('{"type": "tell", "message": [%s]}' % ', '.join(encoded[start:stop])).encode('utf-8')
+            self.connection.sendall(message)
+            self.bytes_sent += len(message)
+            self.receive()
+            n_batches += 1
+            start = stop
+            if progress is not None:
+                progress(start, len(encoded))
+        return n_batches
+
+    def exit(self):
+        """ask the server to shut down (it does not have to reply)
+        """
+        self.send({"type": "exit"})
@@ -0,0 +1,341 @@
+#!/usr/bin/python
+"""a stand-in for the AEPsych server, to run the client, the scheduler and the sessions without it
+
+It speaks the server's protocol (``setup``, ``ask``, ``tell``, including
+batched tells, and ``exit``) on TCP or a Unix domain socket, and answers
+asks with points within the ``lb``/``ub`` of the config it was set up
+with: a scrambled Sobol sequence for strategies whose generator is
+``SobolGenerator``, and uniformly random points for the others (which
+fit no model). Each connection is a separate session, so many clients
+can load it at once:
+
+    python -m aepsych_utils.mock_server --port 5555 --latency OptimizeAcqfGenerator=0.5 --record logs/mock
+
+``latency`` makes asks take as long as the real generators would
+(``SobolGenerator`` is near instant, ``OptimizeAcqfGenerator`` is capped
+by ``max_gen_time``); without it, a session runs as fast as the client
+can go. The tells of every session are kept in ``sessions``, and
+journaled to ``<record>/session-<n>.jsonl`` if ``record`` is given.
+"""
+import argparse
+import configparser
+import json
+import os
+import os.path as op
+import socket
+import threading
+import time
+
+import numpy as np
+
+from aepsych_utils.client import MessageBuffer
+from aepsych_utils.server import READY_LINE
+from aepsych_utils.tell_journal import TellJournal
+
+DEFAULT_CONFIG = op.join(op.dirname(op.dirname(op.abspath(__file__))), 'configs', 'config.ini')
+
+## Sobol direction numbers (Joe & Kuo, new-joe-kuo-6.21201) of dimensions 2 to 10, as (s, a, m)
+SOBOL_DIRECTIONS = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+]
+SOBOL_BITS = 32
+
+
+class SobolSequence:
+    """points of the Sobol sequence in the unit cube, scrambled by a random digital shift
+
+    Parameters
+    ----------
+    n_dims : int
+        Up to ``len(SOBOL_DIRECTIONS) + 1``
+    seed : int or None
+        Seed of the shift; None leaves the sequence unscrambled
+
+    """
+    def __init__(self, n_dims, seed=None):
+        if n_dims > len(SOBOL_DIRECTIONS) + 1:
+            raise ValueError("the Sobol sequence is only available up to %i dimensions"
+                             % (len(SOBOL_DIRECTIONS) + 1))
+        self.directions = np.zeros((n_dims, SOBOL_BITS), np.uint64)
+        self.directions[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+        for dim, (s, a, m) in enumerate(SOBOL_DIRECTIONS[:n_dims - 1], 1):
+            v = [m[k] << (SOBOL_BITS - 1 - k) for k in range(s)]
+            for k in range(s, SOBOL_BITS):
+                value = v[k - s] ^ (v[k - s] >> s)
+                for i in range(1, s):
+                    value ^= ((a >> (s - 1 - i)) & 1) * v[k - i]
+                v.append(value)
+            self.directions[dim] = v
+        if seed is None:
+            self.shift = np.zeros(n_dims, np.uint64)
+        else:
+            self.shift = np.random.default_rng(seed).integers(0, 1 << SOBOL_BITS, n_dims, dtype=np.uint64)
+        self.index = 0
+        self._state = np.zeros(n_dims, np.uint64)
+
+    def next(self):
+        """the next point, in [0, 1) along every dimension
+        """
+        if self.index > 0:
+            #Gray code order: each point differs from the previous one by the direction of the lowest zero bit
+            bit = ((self.index - 1) ^ self.index).bit_length() - 1
+            self._state ^= self.directions[:, bit]
+        self.index += 1
+        return (self._state ^ self.shift) / float(1 << SOBOL_BITS)
+
+
+def _parse_list(value):
+    """``[a, b, c]`` from the config into a list of strings
+    """
+    return [item.strip() for item in value.strip().strip('[]').split(',') if item.strip()]
+
+
+def parse_config(config_str):
+    """the parameters, their bounds and the strategies of an AEPsych config
+
+    Returns
+    -------
+    config : dict
+        ``parnames`` (list of str), ``lb`` and ``ub`` (numpy.ndarray) and
+        ``strategies``: ``(name, min_asks, generator)`` in order
+
+    """
+    parser = configparser.ConfigParser(inline_comment_prefixes=('#',))
+    parser.read_string(config_str)
+    common = parser['common']
+    config = {'parnames': _parse_list(common['parnames']),
+              'lb': np.array(_parse_list(common['lb']), float),
+              'ub': np.array(_parse_list(common['ub']), float),
+              'strategies': []}
+    if not len(config['parnames']) == len(config['lb']) == len(config['ub']):
+        raise ValueError("parnames, lb and ub do not have the same length")
+    for name in _parse_list(common['strategy_names']):
+        config['strategies'].append((name, parser.getint(name, 'min_asks'), parser.get(name, 'generator')))
+    return config
+
+
+class MockSession:
+    """the state of one client of the mock server: its config, its generators and its tells
+
+    Parameters
+    ----------
+    config_str : str
+        Config used until the client sends its own with ``setup``
+    latency : dict
+        Seconds an ask takes, by generator name
+    seed : int or None
+    journal : aepsych_utils.tell_journal.TellJournal or None
+        Where the tells are journaled
+
+    """
+    def __init__(self, config_str, latency=None, seed=None, journal=None):
+        self.latency = latency or {}
+        self.seed = seed
+        self.journal = journal
+        self.tells = []
+        self.setup(config_str)
+
+    def setup(self, config_str):
+        """start over with a new config, returns the strategy id as the server does
+        """
+        self.config = parse_config(config_str)
+        self.n_asks = 0
+        self.rng = np.random.default_rng(self.seed)
+        self.sobol = SobolSequence(len(self.config['parnames']), self.rng.integers(1 << 31))
+        return 0
+
+    def strategy(self, n_asks):
+        """the ``(name, min_asks, generator)`` of the strategy ask number ``n_asks`` (from 0) comes from
+        """
+        for strategy in self.config['strategies']:
+            if n_asks < strategy[1]:
+                return strategy
+            n_asks -= strategy[1]
+        return self.config['strategies'][-1]
+
+    def ask(self):
+        """the next point, finished once every strategy has had its ``min_asks`` (AEPsych counts asks, not tells)
+        """
+        _, _, generator = self.strategy(self.n_asks)
+        if self.latency.get(generator, 0.) > 0:
+            time.sleep(self.latency[generator])
+        point = self.sobol.next() if generator == 'SobolGenerator' else self.rng.random(len(self.config['lb']))
+        values = self.config['lb'] + point * (self.config['ub'] - self.config['lb'])
+        self.n_asks += 1
+        is_finished = self.n_asks >= sum(strategy[1] for strategy in self.config['strategies'])
+        return {"config": {name: [float(value)] for name, value in zip(self.config['parnames'], values)},
+                "is_finished": is_finished}
+
+    def tell(self, message):
+        """record one tell, or a list of them (a batched tell)
+        """
+        tells = message if isinstance(message, list) else [message]
+        tells = [{"type": "tell", "message": tell} for tell in tells]
+        self.tells.extend(tells)
+        if self.journal is not None:
+            if len(tells) == 1:
+                self.journal.append(tells[0])
+            else:
+                self.journal.extend(tells)
+        return 'acq'
+
+
+class MockServer:
+    """serve ``MockSession``s, one per connection, each on its own thread
+
+    Parameters
+    ----------
+    config : str
+        Path of the config sessions start with (configs/config.ini)
+    latency : dict or None
+        Seconds an ask takes, by generator name, e.g.
+        ``{'OptimizeAcqfGenerator': 0.5}``
+    seed : int or None
+        Seed of the first session; the n-th gets ``seed + n``
+    record : str or None
+        Folder the sessions' tells are journaled to
+
+    Attributes
+    ----------
+    sessions : list of MockSession
+        Every session so far, in the order the clients connected
+
+    """
+    def __init__(self, config=DEFAULT_CONFIG, latency=None, seed=None, record=None):
+        with open(config) as f:
+            self.config_str = f.read()
+        self.latency = latency or {}
+        self.seed = seed
+        self.record = record
+        self.sessions = []
+        self._listener = None
+        self._lock = threading.Lock()
+        if record is not None:
+            os.makedirs(record, exist_ok=True)
+
+    def new_session(self):
+        with self._lock:
+            n = len(self.sessions)
+            journal = None
+            if self.record is not None:
+                journal = TellJournal(op.join(self.record, 'session-%i.jsonl' % n))
+            session = MockSession(self.config_str, self.latency, None if self.seed is None else self.seed + n,
+                                  journal)
+            self.sessions.append(session)
+        return session
+
+    def handle(self, session, message):
+        """the reply to one message, or None for ``exit``
+        """
+        kind = message.get('type')
+        if kind == 'setup':
+            return session.setup(message['message']['config_str'])
+        if kind == 'ask':
+            return session.ask()
+        if kind == 'tell':
+            return session.tell(message['message'])
+        if kind == 'exit':
+            return None
+        raise ValueError("unknown message type %r" % kind)
+
+    def _serve_connection(self, conn):
+        session = self.new_session()
+        buffer = MessageBuffer()
+        try:
+            with conn:
+                while True:
+                    complete, message = buffer.next_message()
+                    if not complete:
+                        n_bytes = conn.recv_into(buffer.writable())
+                        if n_bytes == 0:
+                            return
+                        buffer.commit(n_bytes)
+                        continue
+                    reply = self.handle(session, message)
+                    if reply is None:
+                        conn.sendall(b'Terminate')
+                        return
+                    conn.sendall(reply.encode('ascii') if isinstance(reply, str) else json.dumps(reply).encode('utf-8'))
+        except OSError:
+            pass
+        finally:
+            if session.journal is not None:
+                session.journal.close()
+
+    def listen(self, ip='127.0.0.1', port=5555, unix_path=None):
+        """open the listening socket (port 0 picks a free one), returns its address
+        """
+        if unix_path is not None:
+            if op.exists(unix_path):
+                os.remove(unix_path)
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._listener.bind(unix_path)
+            self._listener.listen(16)
+        else:
+            self._listener = socket.create_server((ip, port), backlog=16)
+        return self._listener.getsockname()
+
+    def serve(self):
+        """accept connections until the listener is closed
+        """
+        while True:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def start(self, ip='127.0.0.1', port=0, unix_path=None):
+        """listen and serve on a background thread (for benchmarks), returns the address
+        """
+        address = self.listen(ip, port, unix_path)
+        threading.Thread(target=self.serve, name='MockServer', daemon=True).start()
+        return address
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+
+def parse_latency(items):
+    """``Generator=seconds`` command line items into the ``latency`` dict of ``MockServer``
+    """
+    latency = {}
+    for item in items:
+        generator, seconds = item.split('=')
+        latency[generator] = float(seconds)
+    return latency
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Answer AEPsych clients with Sobol and random points, without fitting any model.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--unix', default=None, help='Listen on this Unix domain socket instead of TCP')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='Config used until a client sends its own')
+    parser.add_argument('--latency', nargs='*', default=[], help='Generator=seconds an ask takes')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--record', default=None, help="Folder the sessions' tells are journaled to")
+    args = parser.parse_args()
+
+    server = MockServer(args.config, parse_latency(args.latency), args.seed, args.record)
+    server.listen(args.ip, args.port, args.unix)
+    print(READY_LINE.decode('ascii') + '!', flush=True)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print("%i session(s), %i tells" % (len(server.sessions), sum(len(s.tells) for s in server.sessions)))
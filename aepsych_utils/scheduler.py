@@ -0,0 +1,123 @@
+#!/usr/bin/python
+"""background ask/tell scheduler, so the AEPsych server works while the participant does
+"""
+import queue
+import threading
+import time
+
+
+class TrialScheduler:
+    """run the AEPsych round trips for upcoming trials on a background thread
+
+    After a response comes in, ``request_trial`` hands the tell message
+    to a worker thread, which sends it and then immediately asks for the
+    next trial's parameters. The model refit and point generation that
+    follow a tell then overlap with whatever the render loop does next
+    (feedback, fixation, waiting for the participant to start the
+    trial), and ``next_trial`` only blocks for whatever generation time
+    is left by the time the parameters are actually needed.
+
+    The next ask is always sent after the previous tell, so the server
+    sees exactly the same sequence of messages as before. A failed round
+    trip (or a tell the server does not answer with ``acq``) stops the
+    worker, and is raised by the next ``next_trial``, or by ``close``
+    when no trial is asked for after it.
+
+    Parameters
+    ----------
+    client : aepsych_utils.client.AEPsychClient
+        A connected client. It must not be used by anything else while
+        the scheduler is running.
+
+    Attributes
+    ----------
+    latencies : list of dict
+        One entry per trial handed out by ``next_trial``, with
+        ``ask_latency`` (seconds the server took to answer the ask) and
+        ``wait`` (seconds ``next_trial`` blocked the caller for)
+    tell_reply : str or None
+        The server's reply to the most recent tell
+
+    """
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+        self.tell_reply = None
+        self._requests = queue.Queue()
+        self._ready = queue.Queue()
+        self._pending_asks = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='TrialScheduler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            tell, ask = request
+            try:
+                if tell is not None:
+                    self.tell_reply = self.client.request(tell)
+                    if self.tell_reply != 'acq':
+                        raise RuntimeError("Unexpected reply to tell message: %s" % (self.tell_reply,))
+                if ask:
+                    start = time.perf_counter()
+                    parameters = self.client.ask()
+                    self._ready.put((parameters, time.perf_counter() - start))
+            except Exception as e:
+                # hand the error to the render loop instead of dying silently
+                self._error = e
+                self._ready.put((e, None))
+                return
+
+    def request_trial(self, tell=None, ask=True):
+        """queue a tell (if any) followed by an ask for the next trial
+
+        Parameters
+        ----------
+        tell : dict or None
+            The tell message for the trial that just finished (see
+            ``aepsych_utils.client.tell_message``)
+        ask : bool
+            Whether to ask for another trial after the tell. Pass False
+            after the last trial so only the tell is sent.
+
+        """
+        if ask:
+            self._pending_asks += 1
+        self._requests.put((tell, ask))
+
+    def next_trial(self, timeout=None):
+        """return the parameters of the next trial, waiting for them if needed
+
+        Returns
+        -------
+        trial_parameters : dict
+            The ask reply, with the parameters in ``['config']`` and
+            whether the strategy is done in ``['is_finished']``
+
+        """
+        if self._pending_asks == 0:
+            raise RuntimeError("next_trial called without a matching request_trial")
+        start = time.perf_counter()
+        parameters, ask_latency = self._ready.get(timeout=timeout)
+        wait = time.perf_counter() - start
+        self._pending_asks -= 1
+        if isinstance(parameters, Exception):
+            self._error = None
+            raise parameters
+        self.latencies.append({'ask_latency': ask_latency, 'wait': wait})
+        return parameters
+
+    def close(self):
+        """finish any queued tells and stop the worker thread
+
+        Raises the error that stopped the worker, if ``next_trial`` has
+        not raised it already (e.g. the last trial's tell failed).
+        """
+        self._requests.put(None)
+        self._thread.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
@@ -0,0 +1,231 @@
+#!/usr/bin/python
+"""start the AEPsych server process and wait until it accepts connections
+"""
+import os
+import os.path as op
+import shutil
+import subprocess
+import time
+
+
+## what the server logs once it listens for connections
+READY_LINE = b'Server up, waiting for connections'
+
+
+class ServerError(RuntimeError):
+    """the server exited, or did not accept connections in time"""
+
+
+def find_server(executable=None):
+    """the path of the ``aepsych_server`` executable, or None if it cannot be found
+
+    Parameters
+    ----------
+    executable : str or None
+        Path (or name on the PATH) of the executable. None looks for
+        ``aepsych_server`` on the PATH.
+
+    """
+    return shutil.which(executable or 'aepsych_server')
+
+
+class AEPsychServer:
+    """an AEPsych server process, and a client connected to it once it is ready
+
+    The server is started directly, with its output going to a log file
+    instead of a console window, rather than through the batch files
+    that opened a shell and activated conda first. Readiness is probed
+    by connecting the client, on a fresh socket every time, at
+    exponentially growing intervals (``poll`` does one step without
+    blocking, so a loading screen can call it between frames). If the
+    process exits while it is being waited for, the end of its log is
+    raised with the error.
+
+    Parameters
+    ----------
+    client : aepsych_utils.client.AEPsychClient
+        The client to connect; its ``ip`` and ``port`` are passed to the server
+    database_file : str
+        Database of the session, relative to ``cwd``
+    cwd : str
+        Folder the server runs in
+    executable : str or None
+        The ``aepsych_server`` executable (see ``find_server``)
+    log_path : str or None
+        Where the server's stdout and stderr go; logs/<database>.server.log
+        in ``cwd`` by default
+    timeout : float
+        Seconds to wait for the server before giving up
+    first_interval, max_interval : float
+        Seconds between the first two connection attempts, and the cap
+        on that interval as it doubles
+
+    Attributes
+    ----------
+    process : subprocess.Popen or None
+    launcher : subprocess.Popen or None
+        What started a detached server (see ``start``)
+    attempts : int
+        Connection attempts so far
+    time_to_ready : float or None
+        Seconds from launch to the first successful connection
+
+    """
+    def __init__(self, client, database_file, cwd, executable=None, log_path=None, timeout=120.,
+                 first_interval=0.02, max_interval=0.25):
+        self.client = client
+        self.database_file = database_file
+        self.cwd = cwd
+        self.executable = executable
+        if log_path is None:
+            log_path = op.join(cwd, 'logs', op.splitext(database_file)[0] + '.server.log')
+        self.log_path = log_path
+        self.timeout = timeout
+        self.first_interval = first_interval
+        self.max_interval = max_interval
+        self.process = None
+        self.launcher = None
+        self.attempts = 0
+        self.time_to_ready = None
+        self._log = None
+        self._start = None
+        self._interval = first_interval
+        self._next_probe = None
+
+    def command(self):
+        path = find_server(self.executable)
+        if path is None:
+            raise ServerError("aepsych_server was not found (%s): set the path of the executable in the "
+                              "experiment's config" % (self.executable or 'not on the PATH'))
+        return [path, '--port', str(self.client.port), '--ip', self.client.ip, '--db', self.database_file]
+
+    def start(self, command=None, detached=False):
+        """launch the server process
+
+        Parameters
+        ----------
+        command : list or str or None
+            What to run instead of ``command()``
+        detached : bool
+            Whether ``command`` only launches the server and returns, as
+            startAEPsychShell.bat does (it opens the server in a window of
+            its own with ``start``). The launcher exiting is then not taken
+            for the server exiting: readiness is only probed by connecting,
+            and ``stop`` cannot end the server (the session's exit message does)
+        """
+        if command is None:
+            command = self.command()
+        os.makedirs(op.dirname(self.log_path), exist_ok=True)
+        self._log = open(self.log_path, 'wb')
+        process = subprocess.Popen(command, cwd=self.cwd, stdin=subprocess.DEVNULL, stdout=self._log,
+                                   stderr=subprocess.STDOUT)
+        if detached:
+            self.launcher = process
+        else:
+            self.process = process
+        self.attach()
+
+    def attach(self):
+        """start the clock ``poll`` probes and times out by
+
+        ``start`` calls it; call it instead of ``start`` for a server that
+        something else launched (e.g. one listening on a Unix socket or a pipe).
+        """
+        self._start = time.perf_counter()
+        self._next_probe = self._start
+        self._interval = self.first_interval
+
+    def log_tail(self, n_lines=30):
+        """the last ``n_lines`` of the server's output
+        """
+        if not op.isfile(self.log_path):
+            return '(no output)'
+        with open(self.log_path, 'rb') as f:
+            lines = f.read().decode('utf-8', 'replace').splitlines()
+        return '\n'.join(lines[-n_lines:])
+
+    def check_alive(self):
+        """raise ``ServerError`` with the end of the server's output if the process has exited
+        """
+        if self.process is not None and self.process.poll() is not None:
+            self._log.flush()
+            raise ServerError("the AEPsych server exited with code %i:\n%s" % (self.process.returncode,
+                                                                              self.log_tail()))
+
+    def listening(self):
+        """whether the server's output says it is listening (without connecting to it)
+        """
+        if self._log is None:
+            return False
+        self._log.flush()
+        with open(self.log_path, 'rb') as f:
+            return READY_LINE in f.read()
+
+    @property
+    def ready(self):
+        return self.time_to_ready is not None
+
+    def time_to_next_probe(self):
+        """seconds until ``poll`` would try to connect again (0 if it would now)
+        """
+        if self.ready:
+            return 0.
+        return max(0., self._next_probe - time.perf_counter())
+
+    def poll(self):
+        """try to connect if the next attempt is due, without blocking otherwise
+
+        Returns
+        -------
+        ready : bool
+
+        Raises
+        ------
+        ServerError
+            If the server exited, or has not accepted a connection within ``timeout``
+
+        """
+        if self.ready:
+            return True
+        self.check_alive()
+        now = time.perf_counter()
+        if now < self._next_probe:
+            return False
+        self.attempts += 1
+        if self.client.connect(verbose=False, timeout=self.max_interval):
+            self.time_to_ready = time.perf_counter() - self._start
+            print("AEPsych server ready after %.2f s (%i connection attempts)" % (self.time_to_ready, self.attempts))
+            return True
+        if now - self._start > self.timeout:
+            raise ServerError("the AEPsych server did not accept connections within %g s, its output so far:\n%s"
+                              % (self.timeout, self.log_tail()))
+        self._interval = min(self._interval * 2, self.max_interval)
+        self._next_probe = time.perf_counter() + self._interval
+        return False
+
+    def wait_ready(self):
+        """block (sleeping) until the server accepts a connection
+        """
+        while not self.poll():
+            time.sleep(self.time_to_next_probe())
+
+    def stop(self, timeout=5.):
+        """end the server process, killing it if it does not exit within ``timeout`` seconds
+        """
+        if self.launcher is not None:
+            if self.launcher.poll() is None:
+                self.launcher.terminate()
+                self.launcher.wait()
+            self.launcher = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+            self.process = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,265 @@
+#!/usr/bin/python
+"""keep AEPsych servers started ahead of the sessions that will use them
+
+Starting ``aepsych_server`` (Python, torch and aepsych imports, opening
+the database) takes long enough to be felt at the start of every
+session. The supervisor keeps ``size`` servers running and listening,
+each on its own port with its own fresh database in ``<dir>/pool/``:
+
+    python -m aepsych_utils.server_pool --dir "C:/.../Time To Fuse" --executable ".../Scripts/aepsych_server.exe"
+
+A session (``ExperimentConfig.aepsych_pool``) claims one through the
+supervisor's control port, telling it where its database should end up,
+and connects to it straight away. A server serves a single session:
+when the session's control connection closes (the session ended, or
+crashed), the supervisor stops that server, moves its database to the
+path the session gave and starts a fresh server in its place.
+
+Idle servers are checked every ``check_every`` seconds: one that exited,
+did not come up within ``start_timeout`` or has been idle for longer
+than ``max_idle`` is replaced.
+
+Control protocol: the session sends one JSON line
+``{"type": "claim", "database_path": ...}`` and gets one back with the
+server's ``ip``, ``port``, ``database_file`` and ``log_path``, or an
+``error``. It then keeps the connection open until it is done.
+"""
+import argparse
+import json
+import os
+import os.path as op
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from aepsych_utils.client import AEPsychClient
+from aepsych_utils.server import AEPsychServer, ServerError
+
+CONTROL_PORT = 5554
+BASE_PORT = 5560
+
+
+class ServerPool:
+    """the supervisor: a pool of warm AEPsych servers, and the control port sessions claim them through
+
+    Parameters
+    ----------
+    dir : str
+        Folder the servers run in (the experiment's)
+    size : int
+        Number of servers kept warm
+    executable : str or None
+        The ``aepsych_server`` executable (see ``aepsych_utils.server.find_server``)
+    ip : str
+        Address the servers and the control port listen on
+    control_port : int
+    base_port : int
+        The servers listen on ports from ``base_port`` to ``base_port + 2*size``
+    check_every, start_timeout, max_idle : float
+        In seconds, see the module docstring
+
+    """
+    def __init__(self, dir, size=1, executable=None, ip='127.0.0.1', control_port=CONTROL_PORT, base_port=BASE_PORT,
+                 check_every=10., start_timeout=120., max_idle=12*3600.):
+        self.dir = op.abspath(dir)
+        self.size = size
+        self.executable = executable
+        self.ip = ip
+        self.control_port = control_port
+        self.ports = list(range(base_port, base_port + 2*size))
+        self.check_every = check_every
+        self.start_timeout = start_timeout
+        self.max_idle = max_idle
+        self.idle = []
+        self.claimed = []
+        self._started = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        os.makedirs(op.join(self.dir, 'pool'), exist_ok=True)
+
+    def _log(self, text):
+        print("%s  %s" % (datetime.now().strftime('%H:%M:%S'), text), flush=True)
+
+    def _spawn(self):
+        """start a server on a free port with a fresh database, and add it to the idle servers
+        """
+        used = set(server.client.port for server in self.idle + self.claimed)
+        port = next(port for port in self.ports if port not in used)
+        database_file = op.join('pool', uuid.uuid4().hex[:12] + '.db')
+        server = AEPsychServer(AEPsychClient(self.ip, port), database_file, self.dir, self.executable)
+        server.start()
+        self._started[server] = time.monotonic()
+        self.idle.append(server)
+        self._log("started a server on port %i (%s)" % (port, database_file))
+
+    def _retire(self, server, reason, database_path=None):
+        """stop ``server``, and move its database to ``database_path`` (or delete it if it served no session)
+        """
+        server.stop(timeout=10.)
+        self._started.pop(server, None)
+        source = op.join(self.dir, server.database_file)
+        if op.isfile(source):
+            if database_path is None:
+                os.remove(source)
+            else:
+                if op.exists(database_path):
+                    stem, extension = op.splitext(database_path)
+                    database_path = stem + datetime.now().strftime("_%Y_%m_%d_%Hh_%Mm_%Ss") + extension
+                os.replace(source, database_path)
+        self._log("retired the server on port %i: %s" % (server.client.port, reason))
+
+    def check(self):
+        """replace the idle servers that exited, never came up or have been idle too long, and top the pool up
+        """
+        with self._lock:
+            for server in list(self.idle):
+                age = time.monotonic() - self._started[server]
+                reason = None
+                try:
+                    server.check_alive()
+                except ServerError as e:
+                    reason = str(e)
+                if reason is None and not server.listening() and age > self.start_timeout:
+                    reason = "not listening after %g s" % self.start_timeout
+                if reason is None and age > self.max_idle:
+                    reason = "idle for %g s" % age
+                if reason is not None:
+                    self.idle.remove(server)
+                    self._retire(server, reason)
+            while len(self.idle) < self.size and not self._closing:
+                self._spawn()
+
+    def claim(self):
+        """hand out an idle server, listening ones first
+        """
+        with self._lock:
+            if not self.idle:
+                self._spawn()
+            listening = [server for server in self.idle if server.listening()]
+            server = (listening or self.idle)[0]
+            self.idle.remove(server)
+            self.claimed.append(server)
+        return server
+
+    def release(self, server, database_path):
+        #the session asked its server to exit, so this is quick, and claims do not have to wait for it
+        self._retire(server, "session over", database_path)
+        with self._lock:
+            self.claimed.remove(server)
+        self.check()
+
+    def _serve_session(self, conn):
+        """answer one claim, and release the server once the session closes the connection
+        """
+        with conn:
+            stream = conn.makefile('rb')
+            try:
+                request = json.loads(stream.readline().decode('utf-8'))
+                database_path = request['database_path']
+                server = self.claim()
+            except (ValueError, KeyError, StopIteration, ServerError) as e:
+                conn.sendall((json.dumps({'error': repr(e)}) + '\n').encode('utf-8'))
+                return
+            self._log("port %i claimed, database will be %s" % (server.client.port, database_path))
+            conn.sendall((json.dumps({'ip': self.ip, 'port': server.client.port,
+                                      'database_file': server.database_file,
+                                      'log_path': server.log_path}) + '\n').encode('utf-8'))
+            try:
+                while conn.recv(4096):
+                    pass
+            except OSError:
+                pass
+            self.release(server, database_path)
+
+    def serve(self):
+        """run the supervisor until interrupted
+        """
+        listener = socket.create_server((self.ip, self.control_port))
+        listener.settimeout(self.check_every)
+        self._log("supervising %i server(s), claims on port %i" % (self.size, self.control_port))
+        self.check()
+        try:
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    self.check()
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self._serve_session, args=(conn,), daemon=True).start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.close()
+            self.close()
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            for server in self.idle:
+                self._retire(server, "supervisor closed")
+            self.idle = []
+
+
+class PooledServer(AEPsychServer):
+    """a server claimed from a ``ServerPool``, with the interface of ``AEPsychServer``
+
+    ``start`` claims the server (instead of launching one) and points the
+    client at it; ``poll`` then connects as for a server launched by the
+    session, usually at the first attempt. ``stop`` hands it back.
+
+    Parameters
+    ----------
+    client : aepsych_utils.client.AEPsychClient
+    database_path : str
+        Where the supervisor moves the session's database once it is over
+    address : tuple
+        ``(ip, port)`` of the supervisor's control port
+
+    """
+    def __init__(self, client, database_path, address=('127.0.0.1', CONTROL_PORT), **kwargs):
+        super().__init__(client, database_path, op.dirname(op.abspath(database_path)), **kwargs)
+        self.address = address
+        self._control = None
+
+    def start(self, command=None):
+        """claim a server, raising ``ServerError`` if the supervisor is not running or has none to give
+        """
+        try:
+            self._control = socket.create_connection(self.address, timeout=5.)
+            self._control.sendall((json.dumps({'type': 'claim', 'database_path': op.abspath(self.database_file)})
+                                   + '\n').encode('utf-8'))
+            reply = json.loads(self._control.makefile('rb').readline().decode('utf-8'))
+        except (OSError, ValueError) as e:
+            self.stop()
+            raise ServerError("could not claim a server from the pool at %s:%i (%s)" % (self.address + (e,)))
+        if 'error' in reply:
+            self.stop()
+            raise ServerError("the server pool refused the claim: %s" % reply['error'])
+        self.client.ip, self.client.port = reply['ip'], reply['port']
+        self.log_path = reply['log_path']
+        self.attach()
+
+    def stop(self, timeout=5.):
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Keep AEPsych servers warm for the experiment sessions to claim.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--dir', default='.', help="Experiment folder (the servers' working directory)")
+    parser.add_argument('--size', type=int, default=1, help='Number of servers kept warm')
+    parser.add_argument('--executable', default=None, help='aepsych_server executable (default: on the PATH)')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--control-port', type=int, default=CONTROL_PORT, help='Port sessions claim servers on')
+    parser.add_argument('--base-port', type=int, default=BASE_PORT, help='First port of the servers')
+    parser.add_argument('--check-every', type=float, default=10., help='Seconds between health checks')
+    parser.add_argument('--max-idle', type=float, default=12., help='Hours after which an idle server is replaced')
+    args = parser.parse_args()
+    ServerPool(args.dir, args.size, args.executable, args.ip, args.control_port, args.base_port, args.check_every,
+               max_idle=args.max_idle*3600).serve()
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+"""append-only journal of the tell messages sent to the AEPsych server
+"""
+import argparse
+import json
+import os
+import os.path as op
+import warnings
+
+
+class TellJournal:
+    """crash-safe, append-only record of tell messages (JSON Lines)
+
+    Every tell is written as one line and flushed to the OS straight
+    away, so writing a trial costs the same however long the session
+    has been running. ``os.fsync`` is only called every
+    ``fsync_every`` tells (and on ``close``), which bounds how many
+    trials a power cut could lose without paying for a disk sync on
+    every trial. A line torn by a crash is skipped by ``load_tells``.
+
+    Parameters
+    ----------
+    path : str
+        Path of the journal (conventionally ending in ``.jsonl``). An
+        existing journal is appended to.
+    fsync_every : int
+        Number of tells between disk syncs
+
+    """
+    def __init__(self, path, fsync_every=10):
+        self.path = path
+        self.fsync_every = fsync_every
+        if op.exists(path):
+            _drop_torn_line(path)
+        self._file = open(path, 'a', encoding='utf-8', newline='\n')
+        self._unsynced = 0
+
+    def append(self, message):
+        """write one tell message to the journal
+        """
+        self._file.write(json.dumps(message) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def extend(self, messages):
+        """write several tell messages at once (e.g. those replayed from a previous journal)
+        """
+        if len(messages) == 0:
+            return
+        self._file.write(''.join(json.dumps(message) + '\n' for message in messages))
+        self.sync()
+
+    def sync(self):
+        """make sure everything written so far is on disk
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _drop_torn_line(path):
+    """truncate a journal after its last complete line, so appending to it is safe
+    """
+    with open(path, 'rb+') as f:
+        contents = f.read()
+        if contents and not contents.endswith(b'\n'):
+            f.truncate(contents.rfind(b'\n') + 1)
+
+
+def load_tells(path):
+    """load the tell messages recorded for a session
+
+    Reads either a journal written by ``TellJournal`` or one of the
+    ``.json`` files the experiment scripts used to rewrite after every
+    trial (anything ending in ``.json``).
+
+    Parameters
+    ----------
+    path : str
+        Path of the journal or json file
+
+    Returns
+    -------
+    tells : list of dict
+        The tell messages, in the order they were sent
+
+    """
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)
+    tells = []
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            tells.append(json.loads(line))
+        except json.JSONDecodeError:
+            if i == len(lines) - 1:
+                # the session crashed while this line was being written
+                warnings.warn("Skipping incomplete last line of %s" % path)
+            else:
+                raise
+    return tells
+
+
+def convert_json_to_journal(json_path, journal_path=None):
+    """convert a ``.json`` tell file from an older session into a journal
+
+    Parameters
+    ----------
+    json_path : str
+        Path of the ``.json`` file, containing a list of tell messages
+    journal_path : str or None
+        Where to write the journal. By default, ``json_path`` with the
+        extension changed to ``.jsonl``. Must not exist yet.
+
+    Returns
+    -------
+    journal_path : str
+        Path of the journal that was written
+
+    """
+    if journal_path is None:
+        journal_path = op.splitext(json_path)[0] + '.jsonl'
+    if op.exists(journal_path):
+        raise FileExistsError("%s already exists, not overwriting it" % journal_path)
+    with TellJournal(journal_path) as journal:
+        journal.extend(load_tells(json_path))
+    return journal_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Convert .json tell files written by older versions of the experiment "
+                     "scripts into the .jsonl journals they now write, so that those sessions "
+                     "can still be resumed."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('json_paths', nargs='+', help='Path(s) of the .json tell file(s)')
+    args = parser.parse_args()
+    for json_path in args.json_paths:
+        journal_path = convert_json_to_journal(json_path)
+        print("%s -> %s (%d tells)" % (json_path, journal_path, len(load_tells(journal_path))))
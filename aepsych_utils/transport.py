@@ -0,0 +1,112 @@
+#!/usr/bin/python
+"""the connections the AEPsych client can talk over: TCP, Unix domain sockets and Windows named pipes
+
+Each backend opens a connection with the three methods the client uses,
+``sendall``, ``recv_into`` and ``close`` (sockets have them already), and
+``settimeout``. The AEPsych server itself only listens on TCP; the other
+two are for a server (or a relay in front of it) listening on a socket
+file or a pipe, which skips the loopback TCP stack.
+``benchmarks/bench_transport.py`` compares their round trip latencies.
+"""
+import socket
+
+## what ``open_transport`` accepts, with the address each expects
+TRANSPORTS = {
+    'tcp': '(ip, port)',
+    'unix': 'path of the socket file',
+    'pipe': r'name of the pipe (opened as \\.\pipe\<name>)',
+}
+
+
+def open_tcp(address, timeout=None, nodelay=True):
+    """connect over TCP, with Nagle's algorithm off by default so that every message leaves as soon as it is sent
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(tuple(address))
+        if nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def open_unix(path, timeout=None):
+    """connect to a Unix domain socket
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("Unix domain sockets are not available in this Python")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class NamedPipe:
+    """client end of a Windows named pipe, with the socket methods the client uses
+
+    Reads and writes are unbuffered and blocking: ``settimeout`` is
+    accepted but has no effect.
+
+    Parameters
+    ----------
+    name : str
+        Name of the pipe, without the ``\\\\.\\pipe\\`` prefix
+
+    """
+    def __init__(self, name):
+        self.path = '\\\\.\\pipe\\' + name
+        self._file = open(self.path, 'r+b', buffering=0)
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, data):
+        view = memoryview(data)
+        while len(view):
+            view = view[self._file.write(view):]
+
+    def recv_into(self, buffer):
+        n_bytes = self._file.readinto(buffer)
+        return n_bytes or 0
+
+    def close(self):
+        self._file.close()
+
+
+def open_pipe(name, timeout=None):
+    """open a Windows named pipe (``timeout`` is ignored: a pipe that exists opens straight away)
+    """
+    return NamedPipe(name)
+
+
+def open_transport(transport, address, timeout=None):
+    """open a connection over ``transport`` (one of ``TRANSPORTS``)
+
+    Parameters
+    ----------
+    transport : {'tcp', 'unix', 'pipe'}
+    address :
+        See ``TRANSPORTS``
+    timeout : float or None
+        Seconds to wait for the connection
+
+    Raises
+    ------
+    OSError
+        If the connection cannot be made
+
+    """
+    if transport == 'tcp':
+        return open_tcp(address, timeout)
+    if transport == 'unix':
+        return open_unix(address, timeout)
+    if transport == 'pipe':
+        return open_pipe(address, timeout)
+    raise ValueError("unknown transport %r, expected one of %s" % (transport, ', '.join(TRANSPORTS)))
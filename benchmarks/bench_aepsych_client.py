@@ -0,0 +1,173 @@
+#!/usr/bin/python
+"""throughput benchmark for the AEPsych client against a local stand-in server
+
+Compares ``aepsych_utils.client.AEPsychClient`` with the single
+``recv(1024)`` the experiment scripts used to do, for ask replies of
+increasing size, and times resuming a session by replaying its tells one
+round trip at a time and batched with ``AEPsychClient.prime``. The stand-in answers every ask with a fixed JSON reply
+and every tell with ``acq``, the same way the AEPsych server does.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aepsych_utils.client import AEPsychClient, tell_message  # noqa: E402
+
+
+def make_ask_reply(n_parameters):
+    """an ask reply with ``n_parameters`` parameters, like a multi-parameter config would give
+    """
+    config = {"parameter_%d" % i: [0.123456789 * i] for i in range(n_parameters)}
+    return {"config": config, "is_finished": False}
+
+
+def serve(listener, ask_reply):
+    """answer asks and tells on one connection until the client hangs up
+    """
+    conn, _ = listener.accept()
+    reply = json.dumps(ask_reply).encode('utf-8')
+    decoder = json.JSONDecoder()
+    pending = ''
+    with conn:
+        while True:
+            try:
+                data = conn.recv(1 << 20)
+            except ConnectionResetError:
+                return
+            if not data:
+                return
+            pending += data.decode('utf-8')
+            while pending:
+                try:
+                    message, end = decoder.raw_decode(pending)
+                except ValueError:
+                    # the rest of the message is still in flight
+                    break
+                pending = pending[end:]
+                if message['type'] == 'ask':
+                    conn.sendall(reply)
+                elif message['type'] == 'tell':
+                    conn.sendall(b'acq')
+                else:
+                    return
+
+
+def start_server(ask_reply):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    thread = threading.Thread(target=serve, args=(listener, ask_reply), daemon=True)
+    thread.start()
+    return listener, thread
+
+
+def legacy_round_trip(sock, message):
+    """the old SocketSendMessage/SocketRecvMessage pair
+    """
+    sock.send(bytes(json.dumps(message), encoding="utf-8"))
+    return sock.recv(1024).decode("utf-8")
+
+
+def run_client(n_trials, ask_reply):
+    listener, thread = start_server(ask_reply)
+    client = AEPsychClient(*listener.getsockname())
+    client.connect(verbose=False)
+    start = time.perf_counter()
+    for _ in range(n_trials):
+        parameters = client.ask()
+        client.tell(parameters['config'], 1)
+    elapsed = time.perf_counter() - start
+    n_bytes = client.bytes_received
+    client.exit()
+    client.close()
+    thread.join()
+    listener.close()
+    return elapsed, n_trials, n_bytes, False
+
+
+def run_prime(n_tells, batched):
+    """replay ``n_tells`` tells one round trip at a time, or batched with ``AEPsychClient.prime``
+    """
+    listener, thread = start_server(make_ask_reply(3))
+    client = AEPsychClient(*listener.getsockname())
+    client.connect(verbose=False)
+    tells = [tell_message(make_ask_reply(3)['config'], i % 2) for i in range(n_tells)]
+    start = time.perf_counter()
+    if batched:
+        n_round_trips = client.prime(tells)
+    else:
+        for tell in tells:
+            client.request(tell)
+        n_round_trips = n_tells
+    elapsed = time.perf_counter() - start
+    n_bytes = client.bytes_sent
+    client.exit()
+    client.close()
+    thread.join()
+    listener.close()
+    return elapsed, n_round_trips, n_bytes
+
+
+def run_legacy(n_trials, ask_reply):
+    listener, thread = start_server(ask_reply)
+    sock = socket.create_connection(listener.getsockname())
+    failed = False
+    n_done = 0
+    n_bytes = 0
+    start = time.perf_counter()
+    for _ in range(n_trials):
+        reply = legacy_round_trip(sock, {"type": "ask", "message": ""})
+        n_bytes += len(reply)
+        try:
+            config = json.loads(reply)['config']
+        except ValueError:
+            # the rest of the reply is still in flight, which is the bug the client fixes
+            failed = True
+            break
+        n_bytes += len(legacy_round_trip(sock, tell_message(config, 1)))
+        n_done += 1
+    elapsed = time.perf_counter() - start
+    if not failed:
+        sock.send(b'{"type": "exit"}')
+    sock.close()
+    thread.join()
+    listener.close()
+    return elapsed, n_done, n_bytes, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Measure ask/tell round trips per second and reply throughput of the "
+                     "AEPsych client against a local stand-in server, compared to the single "
+                     "1024 byte recv the experiment scripts used to do."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--trials', '-n', type=int, default=2000,
+                        help='Number of ask/tell pairs per measurement')
+    parser.add_argument('--prime', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Numbers of stored tells to measure session resume (priming) for')
+    parser.add_argument('--parameters', '-p', type=int, nargs='+', default=[3, 30, 300, 3000],
+                        help='Number of parameters in the ask replies to measure')
+    args = parser.parse_args()
+
+    print("%10s %12s %10s %14s %12s %10s" % ('params', 'reply bytes', 'client', 'trials/s',
+                                            'MB/s', 'failed'))
+    for n_parameters in args.parameters:
+        ask_reply = make_ask_reply(n_parameters)
+        reply_size = len(json.dumps(ask_reply))
+        for name, run in [('streaming', run_client), ('legacy', run_legacy)]:
+            elapsed, n_done, n_bytes, failed = run(args.trials, ask_reply)
+            print("%10d %12d %10s %14.0f %12.2f %10s" % (
+                n_parameters, reply_size, name, n_done / elapsed,
+                n_bytes / elapsed / 1e6, 'yes' if failed else 'no'))
+
+    print()
+    print("%10s %10s %12s %12s %12s" % ('tells', 'mode', 'round trips', 'bytes', 'seconds'))
+    for n_tells in args.prime:
+        for name, batched in [('one-by-one', False), ('batched', True)]:
+            elapsed, n_round_trips, n_bytes = run_prime(n_tells, batched)
+            print("%10d %10s %12d %12d %12.3f" % (n_tells, name, n_round_trips, n_bytes, elapsed))
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+"""dead-leaves generation time: tile-bounded generator vs the full-grid algorithm of DeadLeaves.m
+
+For each size, times ``stimulus_utils.dead_leaves.dead_leaves`` and (up
+to ``--reference-pixels``) the full-grid ``dead_leaves_reference``, and
+checks they give the same image. Then times writing a batch of images
+with one process and with a process pool.
+"""
+import argparse
+import os
+import os.path as op
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, op.dirname(op.dirname(op.abspath(__file__))))
+from stimulus_utils.dead_leaves import SHAPES, dead_leaves, dead_leaves_reference, generate_backgrounds  # noqa: E402
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compare the dead-leaves generator with the full-grid algorithm of DeadLeaves.m.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['512x512', '1024x1024', '2160x3840', '3840x3840'],
+                        help='Image sizes, as <height>x<width>')
+    parser.add_argument('--shape', choices=SHAPES, default='square')
+    parser.add_argument('--iterations', type=int, default=10000, help='Maximum number of leaves')
+    parser.add_argument('--reference-pixels', type=int, default=1024 * 1024,
+                        help='Largest image (in pixels) to run the full-grid reference on')
+    parser.add_argument('--batch', type=int, default=8, help='Number of images for the process pool timing')
+    parser.add_argument('--workers', type=int, default=None, help='Processes for the batch (default: one per CPU)')
+    args = parser.parse_args()
+
+    print("%12s %12s %12s %10s %10s" % ('size', 'tiled (s)', 'naive (s)', 'speedup', 'identical'))
+    for size in args.sizes:
+        height, width = (int(n) for n in size.split('x'))
+        kwargs = dict(seed=0, n_iter=args.iterations, shape=args.shape)
+        tiled_time, tiled = timed(dead_leaves, height, width, **kwargs)
+        if height * width <= args.reference_pixels:
+            naive_time, naive = timed(dead_leaves_reference, height, width, **kwargs)
+            print("%12s %12.3f %12.3f %10.1f %10s" % (size, tiled_time, naive_time, naive_time / tiled_time,
+                                                       'yes' if np.array_equal(tiled, naive) else 'NO'))
+        else:
+            print("%12s %12.3f %12s %10s %10s" % (size, tiled_time, '-', '-', '-'))
+
+    height, width = (int(n) for n in args.sizes[-1].split('x'))
+    print()
+    print("%d images of %dx%d:" % (args.batch, height, width))
+    with tempfile.TemporaryDirectory() as folder:
+        for n_workers in [1, args.workers or os.cpu_count()]:
+            elapsed, _ = timed(generate_backgrounds, folder, args.batch, height, width, n_workers=n_workers,
+                               n_iter=args.iterations, shape=args.shape)
+            print("  %3d process(es): %7.2f s (%.2f s per image)" % (n_workers, elapsed, elapsed / args.batch))
@@ -0,0 +1,216 @@
+#!/usr/bin/python
+"""per-frame and per-trial overhead of the experiment engine, without PsychoPy
+
+The windows and stims are stand-ins: ``draw`` does nothing and
+``flip`` busy-waits for ``--flip-us`` (standing in for the driver's
+work on a flip), so what is timed is the engine's own Python work and
+the flips it asks for:
+
+* per frame: ``RenderLoop.draw_frame`` (background, both eyes, flips),
+  without and with flip time recording, vs the draw loop the scripts
+  had inline, which also redrew and flipped the static back screen,
+* per trial: looking the trial up in the ``TrialPlan``, placing its
+  stimuli and writing its data file row, vs the scripts' random choices
+  and position arithmetic.
+"""
+import argparse
+import os
+import os.path as op
+import sys
+import tempfile
+import time
+from random import choice, randrange, uniform
+
+sys.path.insert(0, op.dirname(op.dirname(op.abspath(__file__))))
+from experiment_engine.frame_timing import FlipRecorder  # noqa: E402
+from experiment_engine.paradigms import VerticalDisparity  # noqa: E402
+from experiment_engine.render import RenderLoop  # noqa: E402
+from experiment_engine.trial_log import TrialLog  # noqa: E402
+from experiment_engine.trial_plan import TrialPlan  # noqa: E402
+
+
+class FakeWindow:
+    flip_cost = 0.
+
+    def __init__(self):
+        self.n_flips = 0
+
+    def flip(self):
+        self.n_flips += 1
+        end = time.perf_counter() + self.flip_cost
+        while time.perf_counter() < end:
+            pass
+
+
+class FakeStim:
+    def __init__(self):
+        self.pos = (0, 0)
+
+    def draw(self, win=None):
+        pass
+
+
+class FakeBackground:
+    def __init__(self):
+        self.image = FakeStim()
+        self.border = FakeStim()
+        self.version = 0
+
+    def draw(self):
+        self.image.draw()
+        self.border.draw()
+
+
+class FakeDisplay:
+    def __init__(self, mode):
+        self.win_left = FakeWindow()
+        self.win_right = FakeWindow() if mode == 'test' else None
+        self.win_back = FakeWindow() if mode == 'test' else None
+        self.offset = (.1, -.05)
+
+    @property
+    def right_window(self):
+        return self.win_right if self.win_right is not None else self.win_left
+
+    def flip(self):
+        pass
+
+
+class FakeStimuli:
+    def __init__(self, n):
+        self.target_files = ['%i.png' % i for i in range(n)]
+        self.foil_files = ['%i.png' % i for i in range(n)]
+
+    def target(self, index):
+        return 'Real/' + self.target_files[index]
+
+    def foil(self, index):
+        return 'Nonsense/' + self.foil_files[index]
+
+
+def legacy_frame(mode, background, display, stims, spacing, hpos1, hpos2, offset, constant_offset, disparity):
+    """one iteration of the scripts' inline draw loop"""
+    stimRight1, stimRight2, stimLeft1, stimLeft2 = stims
+    if background == "on":
+        display.background.image.draw()
+        display.background.border.draw()
+        if mode == "test":
+            display.win_back.flip()
+    if mode == "test":
+        stimRight1.pos = ((spacing/2)+offset[0]+hpos1, constant_offset+offset[1]-disparity/2)
+        stimRight1.draw(display.win_right)
+        stimRight2.pos = ((-spacing/2)+offset[0]+hpos2, constant_offset+offset[1]-disparity/2)
+        stimRight2.draw(display.win_right)
+    elif mode == "debug":
+        stimRight1.pos = ((spacing/2)+offset[0]+hpos1, constant_offset+offset[1]-disparity/2)
+        stimRight1.draw()
+        stimRight2.pos = ((-spacing/2)+offset[0]+hpos2, constant_offset+offset[1]-disparity/2)
+        stimRight2.draw()
+    stimLeft1.pos = ((spacing/2)-hpos1, 0+disparity/2)
+    stimLeft1.draw(display.win_left)
+    stimLeft2.pos = ((-spacing/2)-hpos2, 0+disparity/2)
+    stimLeft2.draw(display.win_left)
+    display.win_left.flip()
+    if mode == 'test':
+        display.win_right.flip()
+
+
+def legacy_trial(files, h_disparity, spacing, offset, data_file, trial_num):
+    """the scripts' per-trial choices, positions and data file row"""
+    wordFiles, nonsenseWordFiles = files
+    Choice = choice(["A", "B"])
+    if Choice == "A":
+        word1 = 'Real/' + wordFiles[randrange(0, len(wordFiles))]
+        word2 = 'Nonsense/' + nonsenseWordFiles[randrange(0, len(nonsenseWordFiles))]
+    else:
+        word1 = 'Nonsense/' + nonsenseWordFiles[randrange(0, len(nonsenseWordFiles))]
+        word2 = 'Real/' + wordFiles[randrange(0, len(wordFiles))]
+    popOutChoice = choice(['real or flower', 'nonesense or bird'])
+    if (popOutChoice == 'real or flower') == (Choice == "A"):
+        hpos1, hpos2 = (h_disparity/2)/60, 0
+    else:
+        hpos1, hpos2 = 0, (h_disparity/2)/60
+    disparity = uniform(0, 60)/60
+    positions = [((spacing/2)-hpos1, disparity/2), ((-spacing/2)-hpos2, disparity/2),
+                 ((spacing/2)+offset[0]+hpos1, offset[1]-disparity/2),
+                 ((-spacing/2)+offset[0]+hpos2, offset[1]-disparity/2)]
+    data_file.write('%i,%.3f,%.3f,%s,%s,%s,%i,%s,%s,%.3f,%.3f\n' % (
+        trial_num, disparity*60, 1., word1, word2, popOutChoice, 1, 'none', time.strftime("%H%M%S"), 0., 0.))
+    return positions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Time the engine's per-frame and per-trial overhead against the scripts' inline code.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--frames', type=int, default=200000, help='Frames to draw per mode')
+    parser.add_argument('--trials', type=int, default=20000, help='Trials to build')
+    parser.add_argument('--files', type=int, default=3000, help='Stimuli per folder')
+    parser.add_argument('--flip-us', type=float, default=50., help='Time each stand-in flip takes, in us')
+    args = parser.parse_args()
+    FakeWindow.flip_cost = args.flip_us*1e-6
+
+    spacing, h_disparity, constant_offset = 6, 10, 0.
+
+    print("%8s %16s %16s %10s %18s %16s" % ('mode', 'legacy (us/frm)', 'engine (us/frm)', 'ratio',
+                                             'recording (us/frm)', 'back flips'))
+    for mode in ['debug', 'test']:
+        display = FakeDisplay(mode)
+        display.background = background = FakeBackground()
+        left = [FakeStim(), FakeStim()]
+        right = [FakeStim(), FakeStim()] if mode == 'debug' else left
+
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            legacy_frame(mode, "on", display, right + left, spacing, h_disparity/120, 0, display.offset,
+                         constant_offset, .5)
+        legacy = (time.perf_counter() - start) / args.frames
+        legacy_back_flips = display.win_back.n_flips if display.win_back is not None else 0
+
+        loop = RenderLoop(display, spacing, constant_offset, background)
+        loop.place(left, right, (h_disparity/120, 0), (0., .5))
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            loop.draw_frame(left, right)
+        engine = (time.perf_counter() - start) / args.frames
+
+        loop.recorder = FlipRecorder(1/60.)
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            loop.draw_frame(left, right)
+        recording = (time.perf_counter() - start) / args.frames
+        back_flips = loop.back.n_flips if loop.back is not None else 0
+        print("%8s %16.2f %16.2f %10.2f %18.2f %16s" % (mode, legacy*1e6, engine*1e6, engine/legacy, recording*1e6,
+                                                         '%i -> %i' % (legacy_back_flips, back_flips)))
+
+    print()
+    stimuli = FakeStimuli(args.files)
+    paradigm = VerticalDisparity()
+    latency = {'ask_latency': 0., 'wait': 0.}
+    display = FakeDisplay('debug')
+    loop = RenderLoop(display, spacing, constant_offset)
+    left, right = [FakeStim(), FakeStim()], [FakeStim(), FakeStim()]
+    with tempfile.TemporaryDirectory() as folder:
+        with open(op.join(folder, 'legacy.csv'), 'w') as data_file:
+            start = time.perf_counter()
+            for trial_num in range(args.trials):
+                legacy_trial((stimuli.target_files, stimuli.foil_files), h_disparity, spacing, display.offset,
+                             data_file, trial_num)
+            legacy = (time.perf_counter() - start) / args.trials
+
+        start = time.perf_counter()
+        plan = TrialPlan(stimuli, h_disparity, seed=0)
+        build = time.perf_counter() - start
+        log = TrialLog(op.join(folder, 'engine.csv'), paradigm, 'w')
+        start = time.perf_counter()
+        for trial_num in range(args.trials):
+            trial = plan[trial_num]
+            duration, disparity = paradigm.practice_parameters(trial, easy=False)
+            loop.place(left, right, trial.hpos, disparity)
+            log.write(trial_num, (disparity[1]*60, duration), trial, 1, None, latency,
+                      (duration, duration, duration, 60))
+        engine = (time.perf_counter() - start) / args.trials
+        log.close()
+        print("per trial: legacy %.2f us, engine %.2f us (plan of %i trials built up front in %.2f ms)"
+              % (legacy*1e6, engine*1e6, len(plan), build*1e3))
+        os.remove(op.join(folder, 'engine.csv'))
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+"""load test of the client, session resume and the trial scheduler against the mock AEPsych server
+
+Every client runs a whole session as ``AEPsychSession`` does it: setup
+with configs/config.ini, a sanity ask, priming with the tells of a
+previous run, then the trials through a ``TrialScheduler``. The clients
+run concurrently, each on its own thread, against one
+``aepsych_utils.mock_server.MockServer``. With ``--latency`` the asks
+take as long as the real generators would, and the scheduler's wait per
+trial shows how much of it a participant would notice.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aepsych_utils.client import AEPsychClient, tell_message  # noqa: E402
+from aepsych_utils.mock_server import DEFAULT_CONFIG, MockServer, parse_latency  # noqa: E402
+from aepsych_utils.scheduler import TrialScheduler  # noqa: E402
+
+
+def run_session(address, n_trials, n_primed, response_time, results):
+    client = AEPsychClient(*address)
+    client.connect(verbose=False)
+    with open(DEFAULT_CONFIG) as f:
+        client.setup(f.read())
+    parameters = client.ask()
+    start = time.perf_counter()
+    client.prime([tell_message(parameters['config'], i % 2) for i in range(n_primed)])
+    prime_time = time.perf_counter() - start
+
+    scheduler = TrialScheduler(client)
+    scheduler.request_trial()
+    start = time.perf_counter()
+    for trial in range(n_trials):
+        parameters = scheduler.next_trial()
+        if response_time > 0:
+            time.sleep(response_time)
+        scheduler.request_trial(tell_message(parameters['config'], trial % 2), ask=trial < n_trials - 1)
+    scheduler.close()
+    elapsed = time.perf_counter() - start
+    client.exit()
+    client.receive()
+    client.close()
+    results.append((elapsed, prime_time, [latency['wait'] for latency in scheduler.latencies]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run concurrent sessions against the mock AEPsych server.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16], help='Concurrent sessions to run')
+    parser.add_argument('--trials', '-n', type=int, default=2000, help='Trials per session')
+    parser.add_argument('--primed', type=int, default=1000, help='Tells replayed at the start of each session')
+    parser.add_argument('--latency', nargs='*', default=[], help='Generator=seconds an ask takes')
+    parser.add_argument('--response-time', type=float, default=0., help='Seconds the observer takes per trial')
+    args = parser.parse_args()
+
+    print("%9s %12s %14s %12s %14s" % ('sessions', 'trials/s', 'trials/s each', 'prime (ms)', 'wait p99 (ms)'))
+    for n_sessions in args.sessions:
+        server = MockServer(latency=parse_latency(args.latency), seed=0)
+        address = server.start()
+        results = []
+        threads = [threading.Thread(target=run_session, args=(address, args.trials, args.primed, args.response_time,
+                                                               results))
+                   for _ in range(n_sessions)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.close()
+        waits = np.concatenate([result[2] for result in results])
+        print("%9d %12.0f %14.0f %12.1f %14.3f" % (
+            n_sessions, n_sessions * args.trials / elapsed, np.mean([args.trials / result[0] for result in results]),
+            np.mean([result[1] for result in results]) * 1e3, np.percentile(waits, 99) * 1e3))
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+"""startup and per-trial fetch time of stimuli from loose image files vs a packed bundle
+
+For each folder, compares getting every image ready at session start
+(listing the folder and decoding every file with ``AssetPreloader``, vs
+opening the bundle) and fetching a random stimulus on a trial (decoding
+its file, vs slicing it out of the bundle). Bundles that do not exist
+yet are built in a temporary folder first.
+
+Run twice to see warm-cache numbers; the first run after a reboot shows
+what the lab machine sees on the first session of the day.
+"""
+import argparse
+import os
+import os.path as op
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, op.dirname(op.dirname(op.abspath(__file__))))
+from stimulus_utils.bundle import StimulusBundle, build_bundle, bundle_path  # noqa: E402
+from stimulus_utils.preloader import AssetPreloader, decode_image  # noqa: E402
+
+
+def summarize(times):
+    times = np.sort(times) * 1e3
+    return "mean %7.2f ms  p95 %7.2f ms  max %7.2f ms" % (
+        times.mean(), times[int(0.95 * (len(times) - 1))], times[-1])
+
+
+def startup_loose(folder, n_workers):
+    start = time.perf_counter()
+    names = os.listdir(folder)
+    preloader = AssetPreloader([op.join(folder, name) for name in names], n_workers).start()
+    preloader.wait()
+    return time.perf_counter() - start
+
+
+def startup_bundle(path):
+    start = time.perf_counter()
+    images = StimulusBundle(path).images()
+    for image in images.values():
+        # touch the pixels, so they are actually read from disk
+        image.getpixel((0, 0))
+    return time.perf_counter() - start
+
+
+def fetch_loose(folder, names, n_trials):
+    times = []
+    for name in random.choices(names, k=n_trials):
+        start = time.perf_counter()
+        image = decode_image(op.join(folder, name))
+        np.asarray(image).sum()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def fetch_bundle(bundle, names, n_trials):
+    times = []
+    for name in random.choices(names, k=n_trials):
+        start = time.perf_counter()
+        image = bundle.get_image(name)
+        np.asarray(image).sum()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Compare session startup and per-trial stimulus fetch time from the loose "
+                     "image files and from a stimulus bundle."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('folders', nargs='*',
+                        default=['assets/Words/lab/Real/57', 'assets/Flowers/Cropped Images'],
+                        help='Stimulus folders to measure')
+    parser.add_argument('--trials', '-n', type=int, default=200, help='Number of fetches to time')
+    parser.add_argument('--workers', type=int, default=None, help='Decoding threads for the loose files')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, folder in enumerate(args.folders):
+            path = bundle_path(folder)
+            if not op.isfile(path):
+                print("building a bundle for %s..." % folder)
+                path = build_bundle(folder, op.join(tmp_dir, '%d.stimbundle' % i), n_workers=args.workers)
+            bundle = StimulusBundle(path)
+            names = bundle.names()
+            print("%s: %d images, bundle %.1f MB" % (folder, len(names), op.getsize(path) / 1024**2))
+            print("  startup  loose  %8.3f s" % startup_loose(folder, args.workers))
+            print("  startup  bundle %8.3f s" % startup_bundle(path))
+            print("  fetch    loose  " + summarize(fetch_loose(folder, names, args.trials)))
+            print("  fetch    bundle " + summarize(fetch_bundle(bundle, names, args.trials)))
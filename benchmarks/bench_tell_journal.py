@@ -0,0 +1,84 @@
+#!/usr/bin/python
+"""per-trial cost of recording tells: rewriting the whole .json file vs appending to the journal
+
+The experiment scripts used to re-serialize every tell so far (with
+``indent=4``) and rewrite the .json file after each trial, which gets
+slower as the session goes on. ``aepsych_utils.tell_journal.TellJournal``
+appends one line per trial instead.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aepsych_utils.client import tell_message  # noqa: E402
+from aepsych_utils.tell_journal import TellJournal, load_tells  # noqa: E402
+
+
+def make_tell(trial):
+    config = {"HorizontaldisparityAmplitude": [-60 + trial % 120],
+              "VerticaldisparityAmplitude": [trial % 60 + 0.5],
+              "stimulusDuration": [0.1 + (trial % 24) / 10]}
+    return tell_message(config, trial % 2)
+
+
+def write_json(tells, path):
+    """what writeJSON in the experiment scripts did after every trial
+    """
+    with open(path, "w") as outfile:
+        outfile.write(json.dumps(tells, indent=4))
+
+
+def time_rewrite(n_trials, path):
+    tells = []
+    times = []
+    for trial in range(n_trials):
+        start = time.perf_counter()
+        tells.append(make_tell(trial))
+        write_json(tells, path)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def time_journal(n_trials, path, fsync_every):
+    times = []
+    with TellJournal(path, fsync_every=fsync_every) as journal:
+        for trial in range(n_trials):
+            start = time.perf_counter()
+            journal.append(make_tell(trial))
+            times.append(time.perf_counter() - start)
+    assert len(load_tells(path)) == n_trials
+    return times
+
+
+def summarize(times, trial):
+    """mean cost (in ms) of the 50 trials up to ``trial``
+    """
+    window = times[max(0, trial - 50):trial]
+    return 1000 * sum(window) / len(window)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Measure the per-trial cost of recording tells by rewriting the full "
+                     ".json file (the old behaviour) and by appending to the tell journal, "
+                     "at several points of a long session."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--trials', '-n', type=int, default=5000,
+                        help='Number of trials in the simulated session')
+    parser.add_argument('--fsync_every', '-f', type=int, default=10,
+                        help='Number of tells between disk syncs in the journal')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rewrite = time_rewrite(args.trials, os.path.join(tmp, 'tells.json'))
+        journal = time_journal(args.trials, os.path.join(tmp, 'tells.jsonl'), args.fsync_every)
+
+    checkpoints = [t for t in (50, 100, 250, 500, 1000, 2000, 5000, 10000) if t <= args.trials]
+    print("%8s %18s %18s" % ('trial', 'rewrite .json ms', 'journal ms'))
+    for trial in checkpoints:
+        print("%8d %18.3f %18.3f" % (trial, summarize(rewrite, trial), summarize(journal, trial)))
+    print("%8s %18.1f %18.1f" % ('total s', sum(rewrite), sum(journal)))
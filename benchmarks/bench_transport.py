@@ -0,0 +1,130 @@
+#!/usr/bin/python
+"""round trip latency of the AEPsych client over each transport, against a local stand-in server
+
+The stand-in answers every ask with a fixed JSON reply, as the AEPsych
+server does, over TCP (with and without Nagle's algorithm), a Unix
+domain socket (where Python has them) and a Windows named pipe (on
+Windows). Each transport runs the same number of ``AEPsychClient.ask``
+round trips; the median and 99th percentile are printed, to pick the
+fastest for the platform the experiment runs on.
+"""
+import argparse
+import json
+import os
+import os.path as op
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, op.dirname(op.dirname(op.abspath(__file__))))
+from aepsych_utils.client import AEPsychClient  # noqa: E402
+from aepsych_utils.transport import open_tcp  # noqa: E402
+
+ASK_REPLY = json.dumps({"config": {"disparityAmplitude": [12.5], "stimulusDuration": [0.4]},
+                        "is_finished": False}).encode('utf-8')
+
+
+def answer(recv, sendall):
+    """answer every message with ``ASK_REPLY`` until the client hangs up
+
+    The client waits for each reply before sending again, so every
+    receive holds exactly one message.
+    """
+    while True:
+        try:
+            data = recv()
+        except (ConnectionResetError, EOFError, BrokenPipeError):
+            return
+        if not data:
+            return
+        sendall(ASK_REPLY)
+
+
+def serve_socket(listener):
+    conn, _ = listener.accept()
+    with conn:
+        answer(lambda: conn.recv(1 << 16), conn.sendall)
+
+
+def start_tcp():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    threading.Thread(target=serve_socket, args=(listener,), daemon=True).start()
+    return listener.getsockname(), listener.close
+
+
+def start_unix():
+    folder = tempfile.mkdtemp()
+    path = op.join(folder, 'aepsych.sock')
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    threading.Thread(target=serve_socket, args=(listener,), daemon=True).start()
+
+    def close():
+        listener.close()
+        os.remove(path)
+        os.rmdir(folder)
+    return path, close
+
+
+def start_pipe():
+    from multiprocessing.connection import Listener
+
+    name = 'aepsych-bench-%i' % os.getpid()
+    listener = Listener('\\\\.\\pipe\\' + name, family='AF_PIPE')
+
+    def serve():
+        conn = listener.accept()
+        answer(conn.recv_bytes, conn.send_bytes)
+        conn.close()
+    threading.Thread(target=serve, daemon=True).start()
+    return name, listener.close
+
+
+def time_round_trips(client, n_trips):
+    times = np.empty(n_trips)
+    for i in range(n_trips):
+        start = time.perf_counter()
+        client.ask()
+        times[i] = time.perf_counter() - start
+    return times
+
+
+class NagleClient(AEPsychClient):
+    """the client over TCP with Nagle's algorithm left on, as before"""
+    def connect(self, verbose=True, timeout=None):
+        self.connection = open_tcp((self.ip, self.port), timeout, nodelay=False)
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Time ask round trips over each transport the AEPsych client supports.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--trips', type=int, default=20000, help='Round trips per transport')
+    args = parser.parse_args()
+
+    runs = [('tcp (Nagle on)', start_tcp, lambda address: NagleClient(*address)),
+            ('tcp (NODELAY)', start_tcp, lambda address: AEPsychClient(*address))]
+    if hasattr(socket, 'AF_UNIX'):
+        runs.append(('unix', start_unix, lambda path: AEPsychClient(transport='unix', address=path)))
+    if sys.platform == 'win32':
+        runs.append(('pipe', start_pipe, lambda name: AEPsychClient(transport='pipe', address=name)))
+
+    print("%16s %12s %12s %12s" % ('transport', 'median (us)', 'p99 (us)', 'trips/s'))
+    for label, start, make_client in runs:
+        address, close = start()
+        client = make_client(address)
+        client.connect(verbose=False)
+        time_round_trips(client, min(1000, args.trips))
+        times = time_round_trips(client, args.trips)
+        client.close()
+        close()
+        print("%16s %12.1f %12.1f %12.0f" % (label, np.median(times)*1e6, np.percentile(times, 99)*1e6,
+                                              len(times)/times.sum()))
@@ -0,0 +1,2 @@
+"""one parameterized engine for the experiment scripts (GUI, windows, calibration, practice and AEPsych trials)
+"""
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+"""the AEPsych side of a session: the server process, its database, the client and the tell journal
+"""
+import os
+import os.path as op
+from datetime import datetime
+
+from aepsych_utils.client import AEPsychClient, tell_message
+from aepsych_utils.mock_server import parse_config
+from aepsych_utils.scheduler import TrialScheduler
+from aepsych_utils.server import AEPsychServer, ServerError, find_server
+from aepsych_utils.server_pool import PooledServer
+from aepsych_utils.tell_journal import TellJournal, load_tells
+
+
+class AEPsychSession:
+    """run a session's trials through an AEPsych server
+
+    The database is created in the working directory rather than the
+    Data subfolder: databases were not always created properly when the
+    path was too complex. If one is already there from a previous run
+    of the same session, it is moved aside and its tells (journaled in
+    Data/<file_name>.jsonl) are replayed into the new server.
+
+    Parameters
+    ----------
+    dir : str
+        Folder of the experiment
+    file_name : str
+        Base name of the session's data files
+    config_ini : str
+        AEPsych config, relative to ``dir``
+    continue_if_data : bool
+        Whether to replay the tells of a previous run
+    ip, port :
+        Where the server listens
+    server_executable : str or None
+        The ``aepsych_server`` executable; None looks for it on the PATH.
+        If it cannot be found, the server is started through
+        startAEPsychShell.bat, as it used to be
+    transport : {'tcp', 'unix', 'pipe'}
+        What the client talks to the server over (see
+        ``aepsych_utils.transport``). The server is only started by the
+        session over TCP; over the others it must already be listening
+    address : str or None
+        Socket file or pipe name, for the unix and pipe transports
+    pool : tuple or None
+        ``(ip, port)`` of an ``aepsych_utils.server_pool`` supervisor to
+        claim an already running server from. If it cannot give one, the
+        session starts its own
+
+    Attributes
+    ----------
+    tells : list of dict
+        Every tell message of the session, starting with the replayed ones
+    client : aepsych_utils.client.AEPsychClient
+    server : aepsych_utils.server.AEPsychServer or None
+        Once launched
+    scheduler : aepsych_utils.scheduler.TrialScheduler or None
+        Running between ``start_trials`` and ``finish_trials``
+
+    """
+    def __init__(self, dir, file_name, config_ini, continue_if_data=True, ip='127.0.0.1', port=5555,
+                 server_executable=None, pool=None, transport='tcp', address=None):
+        self.dir = dir
+        self.server_executable = server_executable
+        self.pool = pool
+        self.config_path = dir + config_ini
+        self.database_file = file_name + '.db'
+        #the tells are journaled as JSON Lines, one line per trial, instead of rewriting a .json file after every trial
+        tell_filename = dir + 'Data/' + file_name + '.jsonl'
+        legacy_tell_filename = dir + 'Data/' + file_name + '.json'
+        self.tells = []
+        if op.isfile(self.database_file):
+            if continue_if_data:
+                if op.isfile(tell_filename):
+                    self.tells = load_tells(tell_filename)
+                elif op.isfile(legacy_tell_filename):
+                    #sessions run before the journal was introduced
+                    self.tells = load_tells(legacy_tell_filename)
+            current_time = datetime.now().strftime("%Y_%m_%d_%Hh_%Mm")
+            os.rename(self.database_file, self.database_file[0:-3] + "_" + current_time + ".db")
+            if op.isfile(tell_filename):
+                os.rename(tell_filename, tell_filename[0:-6] + "-" + current_time + ".jsonl")
+        #every tell is appended to the journal as soon as it is recorded, starting with the ones replayed from the previous session
+        self.journal = TellJournal(tell_filename)
+        self.journal.extend(self.tells)
+        print("number of tells: ", len(self.tells))
+
+        self.client = AEPsychClient(ip, port, transport=transport, address=address)
+        self.server = None
+        self.scheduler = None
+
+    def parameter_bounds(self, name):
+        """``(lb, ub)`` of parameter ``name`` in the session's AEPsych config
+        """
+        with open(self.config_path) as f:
+            config = parse_config(f.read())
+        index = config['parnames'].index(name)
+        return float(config['lb'][index]), float(config['ub'][index])
+
+    @property
+    def connected(self):
+        return self.server is not None and self.server.ready
+
+    def launch(self):
+        """claim a server from the pool, or start one (see ``aepsych_utils.server.AEPsychServer``)
+        """
+        if self.client.transport != 'tcp':
+            self.attach()
+            return
+        if self.pool is not None:
+            self.server = PooledServer(self.client, self.database_file, tuple(self.pool))
+            try:
+                self.server.start()
+                return
+            except ServerError as e:
+                print("Warning: %s, starting a server instead" % e)
+        self.server = AEPsychServer(self.client, self.database_file, self.dir, self.server_executable)
+        if find_server(self.server_executable) is None:
+            print("Warning: aepsych_server not found, starting it through startAEPsychShell.bat")
+            self.server.start(f"startAEPsychShell.bat {self.database_file}", detached=True)
+        else:
+            self.server.start()
+
+    def attach(self):
+        """use a server that something else started (over unix or pipe, or ``aepsych_utils.mock_server``)
+        """
+        self.server = AEPsychServer(self.client, self.database_file, self.dir)
+        self.server.attach()
+
+    def poll_ready(self):
+        """try to connect if the next attempt is due, returns whether the session is connected
+
+        Raises ``aepsych_utils.server.ServerError`` if the server exited.
+        """
+        return self.server.poll()
+
+    def time_to_next_probe(self):
+        return self.server.time_to_next_probe()
+
+    def start(self, progress=None):
+        """send the config, ask once for sanity, and replay the previous run's tells
+
+        Parameters
+        ----------
+        progress : callable or None
+            Called as ``progress(n_done, n_total)`` while tells are
+            replayed, see ``AEPsychClient.prime``
+
+        """
+        with open(self.config_path) as f:
+            config_str = f.read()
+        print("Setup response: " + str(self.client.setup(config_str)))
+        self.client.ask()
+        if len(self.tells) > 0:
+            if progress is not None:
+                progress(0, len(self.tells))
+            self.client.prime(self.tells, progress=progress)
+
+    def start_trials(self):
+        """ask for the first trial's parameters on the scheduler's thread
+
+        The ask/tell round trips run on a background thread, so that
+        AEPsych fits its model and generates the next trial while the
+        participant responds and looks at the fixation cross.
+        """
+        self.scheduler = TrialScheduler(self.client)
+        self.scheduler.request_trial()
+
+    def next_trial(self):
+        """the next trial's ask reply, waiting for the server if it is not in yet
+        """
+        return self.scheduler.next_trial()
+
+    def record(self, parameters, outcome, ask=True):
+        """journal the trial's tell and send it (followed by the next ask) in the background
+
+        Returns
+        -------
+        latency : dict
+            ``ask_latency`` and ``wait`` of the trial (see ``TrialScheduler.latencies``)
+
+        """
+        message = tell_message(parameters["config"], outcome)
+        self.tells.append(message)
+        self.journal.append(message)
+        self.scheduler.request_trial(message, ask=ask)
+        return self.scheduler.latencies[-1]
+
+    def finish_trials(self):
+        """send any tell that is still queued and stop the background thread
+
+        Raises the error of a tell that did not get through (it is in the
+        journal all the same, so resuming the session replays it).
+        """
+        if self.scheduler is not None:
+            scheduler, self.scheduler = self.scheduler, None
+            scheduler.close()
+
+    def close(self):
+        """make sure all of the tells are on disk, and shut the server down
+        """
+        try:
+            self.finish_trials()
+        finally:
+            self.journal.close()
+            if self.connected:
+                self.client.exit()
+            if self.server is not None:
+                self.server.stop()
@@ -0,0 +1,139 @@
+#!/usr/bin/python
+"""the binocular offset between the two eyes' screens, from ipd_correction.csv or the backup procedure
+"""
+import math
+from random import uniform
+
+import numpy as np
+import pandas as pd
+from psychopy import visual
+
+
+INSTRUCTIONS = ("Use the arrow keys to adjust the plus symbol until it's cetered within the circle. \n"
+                " Press the spacebar when finished.")
+
+## starting point of the backup calibration
+INITIAL_OFFSET_VERTICAL = -1.8      ## arcmin
+INITIAL_OFFSET_HORIZONTAL = -1.1    ## arcmin
+
+STEP = 0.1
+
+
+def csv_to_binocular_offset(ipd_csv, subject_name, units='pix'):
+    """read the participant's most recent calibration from ipd_correction.csv
+
+    Returns
+    -------
+    binocular_offset : list
+        Mean (horizontal, vertical) correction of the most recent
+        session, NaN if the participant has none
+
+    """
+    if isinstance(ipd_csv, str):
+        ipd_csv = pd.read_csv(ipd_csv)
+    # Filter by subject name
+    subject_data = ipd_csv.query("subject_name==@subject_name")
+    # Find the most recent session
+    max_session = subject_data['session'].max()
+    # Filter by the most recent session
+    recent_session_data = subject_data.query("session==@max_session")
+    # Calculate the mean binocular offset
+    binocular_offset = [
+        recent_session_data[f"ipd_correction_{units}_horizontal"].mean(),
+        recent_session_data[f"ipd_correction_{units}_vertical"].mean()
+    ]
+    return binocular_offset
+
+
+def pixels_per_degree(width_px, width_cm, view_distance):
+    """pixels per degree of the haploscope screens
+
+    Only used to apply the calibrated offsets to the instruction text,
+    which is sized in pixels so that it does not change size with the
+    viewing distance.
+    """
+    return math.pi * width_px / math.atan(width_cm / view_distance / 2) / 360
+
+
+def calibrate(display, settings, offset_path, targets=('glyph',)):
+    """find the offset of the right eye's screen and store it on ``display``
+
+    If ipd_calibration_vernier.py has been run for the participant, its
+    most recent result is used. Otherwise the participant aligns a plus
+    (right eye) inside a circle (left eye) with the arrow keys
+    (secondary calibration method: faster, but less accurate).
+
+    Parameters
+    ----------
+    display : experiment_engine.display.Display
+    settings : experiment_engine.settings.Settings
+    offset_path : str
+        Path of ipd_correction.csv
+    targets : tuple
+        What the left eye is shown in test mode: ``'glyph'`` and/or ``'circle'``
+
+    Returns
+    -------
+    offset : tuple
+        (horizontal, vertical) offset, in degrees
+    offset_px : tuple
+        The same, in pixels
+
+    """
+    geometry = settings.monitor
+    ppd = pixels_per_degree(geometry['width'], geometry['width_cm'], settings.view_distance)
+    offsets = np.asarray(csv_to_binocular_offset(offset_path, settings.participant))
+    if not math.isnan(offsets[0]):
+        #offsets are stored in pix, so the same offset works at every viewing distance
+        display.offset_px = (offsets[0], offsets[1])
+        display.offset = (offsets[0] / ppd, offsets[1] / ppd)
+        return display.offset, display.offset_px
+
+    offset_horizontal = INITIAL_OFFSET_HORIZONTAL + round(uniform(-10, 10)/10, 1)
+    offset_vertical = INITIAL_OFFSET_HORIZONTAL + round(uniform(-10, 10)/10, 1)
+    print("Initial vertical offset set to " + str(offset_vertical))
+    print("Initial horizontal offset set to " + str(offset_horizontal))
+
+    win_left, win_right = display.win_left, display.right_window
+    left_stims = []
+    if display.mode == "debug" or 'glyph' in targets:
+        left_stims.append(visual.TextStim(win_left, text=u'\u25EF', font="consolas", units='deg', pos=(0, 0),
+                                          height=0.75, wrapWidth=40, color=display.col, colorSpace='rgb'))
+    if display.mode == "test" and 'circle' in targets:
+        left_stims.append(visual.Circle(win_left, radius=0.5, units='deg', pos=(0, 0), fillColor=(1, 0, 0),
+                                        lineColor=(1, 0, 0)))
+    plus = visual.TextStim(win_right, text="+", font="consolas", units='deg', pos=(0, 0), height=1,
+                           wrapWidth=40, color=display.col2, colorSpace='rgb')
+    # no offset is set yet, so the right eye's text is not shifted by the one being adjusted
+    text = display.text(INSTRUCTIONS, units='pix', pos=(0, -(display.height*.25)), height=50,
+                        wrap_width=display.width*.75)
+
+    ## Allow participant to adjust the offset. The screen is only redrawn when the offset changes
+    step = -STEP if display.mirror else STEP
+    while True:
+        plus.pos = (offset_horizontal, offset_vertical + 0.1)
+        for stim in left_stims + [plus] + text:
+            stim.draw()
+        display.flip()
+
+        ## Wait for keypresses and adjust (left and right are swapped by the haploscope mirrors)
+        keys = display.wait_keys(['up', 'down', 'left', 'right', 'space'])
+        print(keys)
+        if 'up' in keys:
+            offset_vertical = offset_vertical + STEP
+            print("Vertical offet increased to " + str(offset_vertical))
+        if 'down' in keys:
+            offset_vertical = offset_vertical - STEP
+            print("Vertical offet decreased to " + str(offset_vertical))
+        if 'left' in keys:
+            offset_horizontal = offset_horizontal - step
+            print("Horizontal offet changed to " + str(offset_horizontal))
+        if 'right' in keys:
+            offset_horizontal = offset_horizontal + step
+            print("Horizontal offet changed to " + str(offset_horizontal))
+
+        ## When participant presses spacebar, save the offsets and exit
+        if 'space' in keys:
+            display.offset = (offset_horizontal, offset_vertical)
+            display.offset_px = (offset_horizontal*ppd, offset_vertical*ppd)
+            return display.offset, display.offset_px
@@ -0,0 +1,223 @@
+#!/usr/bin/python
+"""the session's windows and the screens (text, fixation) drawn in them
+"""
+from functools import partial
+
+from psychopy import colors, core, event, monitors, visual
+
+from experiment_engine.calibration import pixels_per_degree
+from stimulus_utils.atlas_text import AtlasTextStim
+from stimulus_utils.glyph_atlas import load_atlas
+from stimulus_utils.text_cache import TextCache
+
+
+## colours used for dichoptic presentation with anaglyph glasses (left eye, right eye)
+ANAGLYPH_COLORS = {
+    'cardboard': ('#038080', '#850505'),
+    'plastic': ('#850080', '#308285'),
+}
+
+WHITE = (1, 1, 1)
+## the font the glyph atlases are built from
+ATLAS_FONT = "Optimistic Display"
+
+
+class Display:
+    """the windows of a session and how each eye is drawn in them
+
+    In debug mode both eyes are drawn in ``win_left`` in anaglyph
+    colours. In test mode each eye has its own haploscope screen, the
+    stimuli are mirrored, and the background goes on the back screen.
+
+    Parameters
+    ----------
+    settings : experiment_engine.settings.Settings
+    back_screen : bool
+        Whether test mode opens the back screen
+    font_path : str or None
+        Font file of ``ATLAS_FONT``. With ``atlas_dir``, text in that font
+        is laid out from glyph atlases (see ``stimulus_utils.glyph_atlas``)
+        instead of by PsychoPy's font engine
+    atlas_dir : str or None
+        Folder of the glyph atlases; missing sizes are built there
+
+    Attributes
+    ----------
+    win_left, win_right, win_back : psychopy.visual.Window or None
+        ``win_right`` and ``win_back`` are None in debug mode
+    mirror : bool
+        Whether stimuli are flipped horizontally (for the haploscope mirrors)
+    col, col2 : tuple
+        Colours of the left and right eyes' stimuli in debug mode
+    offset, offset_px : tuple
+        Calibrated (horizontal, vertical) offset of the right eye, in
+        degrees and in pixels. Right eye text is shifted by it.
+    text_cache : stimulus_utils.text_cache.TextCache
+        Where the text stims come from
+    atlases : dict
+        The glyph atlases loaded, by font size in pixels
+
+    """
+    def __init__(self, settings, back_screen=True, font_path=None, atlas_dir=None):
+        self.mode = settings.mode
+        self.settings = settings
+        geometry = settings.monitor
+        self.width, self.height = geometry['width'], geometry['height']
+        self.offset = (0., 0.)
+        self.offset_px = (0., 0.)
+        self.text_cache = TextCache()
+        self.font_path = font_path
+        self.atlas_dir = atlas_dir
+        self.atlases = {}
+        self.ppd = pixels_per_degree(self.width, geometry['width_cm'], settings.view_distance)
+
+        ## defining our monitor charactersitics so stimili are presented at the correct size
+        if self.mode == "test":
+            back_monitor = monitors.Monitor("backgroundMonitor")
+            back_monitor.setWidth = (geometry['back_width_cm'])
+            back_monitor.setSizePix((geometry['back_width'], geometry['back_height']))
+            back_monitor.setDistance(settings.view_distance)
+            back_monitor.saveMon()
+            monitor = monitors.Monitor("testMonitor")
+        else:
+            monitor = monitors.Monitor("debugMonitor")
+        monitor.setWidth = (geometry['width_cm'])
+        monitor.setSizePix((self.width, self.height))
+        monitor.setDistance(settings.view_distance)
+        monitor.saveMon()
+
+        self.win_right = None
+        self.win_back = None
+        if self.mode == "debug":
+            self.win_left = visual.Window(
+                size=[self.width, self.height], color='grey', monitor=monitor, units="deg", screen=1,
+                blendMode="add", useFBO=True, gammaErrorPolicy="ignore", fullscr=False)
+            self.mirror = False
+            self.col, self.col2 = (colors.Color(hex_color, 'hex').rgb for hex_color in ANAGLYPH_COLORS[settings.anaglyph])
+        else:
+            screen_left, screen_right, screen_back = settings.screens
+            #this color was used to ensure the black level of virtual content was 1 nit
+            self.win_left = visual.Window(
+                size=[self.width, self.height], color=(-.93, -.93, -.93), colorSpace='rgb', monitor=monitor,
+                units="deg", gammaErrorPolicy="warn", screen=screen_left, fullscr=True)
+            self.win_right = visual.Window(
+                size=[self.width, self.height], color=(-.93, -.93, -.93), colorSpace='rgb', monitor=monitor,
+                units="deg", gammaErrorPolicy="warn", screen=screen_right, fullscr=True)
+            if back_screen:
+                self.win_back = visual.Window(
+                    size=[geometry['back_width'], geometry['back_height']], color='black', colorSpace='rgb',
+                    monitor=back_monitor, units="deg", gammaErrorPolicy="warn", screen=screen_back, fullscr=True)
+            self.mirror = True
+            self.col = self.col2 = WHITE
+
+    @property
+    def right_window(self):
+        """the window the right eye is drawn in
+        """
+        return self.win_right if self.win_right is not None else self.win_left
+
+    @property
+    def background_window(self):
+        """the window the noise background is drawn in
+        """
+        return self.win_back if self.win_back is not None else self.win_left
+
+    def flip(self):
+        """flip every window (back, right, then left)
+        """
+        if self.win_back is not None:
+            self.win_back.flip()
+        if self.win_right is not None:
+            self.win_right.flip()
+        self.win_left.flip()
+
+    def atlas(self, height, units):
+        """the glyph atlas for text ``height`` high in ``units``, or None if text is not drawn from atlases
+        """
+        if self.font_path is None or self.atlas_dir is None or units not in ('pix', 'deg'):
+            return None
+        size = int(round(height if units == 'pix' else height*self.ppd))
+        if size not in self.atlases:
+            self.atlases[size] = load_atlas(self.font_path, size, self.atlas_dir)
+        return self.atlases[size]
+
+    def text(self, text, units='deg', pos=(0, 0), height=1, wrap_width=40, font=ATLAS_FONT):
+        """the text stims showing ``text`` to both eyes
+
+        The right eye's copy is shifted by the calibrated offset. In debug
+        mode only the left eye's copy is built (both eyes see the one window).
+        Stims come from ``text_cache``, so asking for the same text again
+        does not lay it out again. Text in ``ATLAS_FONT`` is drawn from the
+        glyph atlas of its size, when there are atlases and the text only
+        uses their glyphs.
+
+        Returns
+        -------
+        stims : list of psychopy.visual.TextStim or stimulus_utils.atlas_text.AtlasTextStim
+
+        """
+        offset = self.offset_px if units == 'pix' else self.offset
+        kwargs = dict(font=font, units=units, height=height, wrapWidth=wrap_width, color=WHITE, colorSpace='rgb',
+                      flipHoriz=self.mirror)
+        factory = None
+        if font == ATLAS_FONT:
+            atlas = self.atlas(height, units)
+            if atlas is not None and atlas.can_render(text):
+                factory = partial(AtlasTextStim, atlas=atlas)
+        stims = [self.text_cache.get(self.win_left, text, factory, pos=tuple(pos), **kwargs)]
+        if self.win_right is not None:
+            stims.append(self.text_cache.get(self.win_right, text, factory,
+                                             pos=(pos[0] + offset[0], pos[1] + offset[1]), **kwargs))
+        return stims
+
+    def fixation(self):
+        """the fixation crosses that start each trial (left eye, and right eye in test mode)
+        """
+        stims = [visual.TextStim(self.win_left, text='+', font="Optimistic Display", units='deg', pos=self.offset,
+                                 height=1, wrapWidth=self.width*.75, color=WHITE, colorSpace='rgb',
+                                 flipHoriz=self.mirror)]
+        if self.win_right is not None:
+            stims.append(visual.TextStim(self.win_right, text='+', font="Optimistic Display", units='deg',
+                                         pos=(0, 0), height=1, wrapWidth=self.width*.75, color=WHITE,
+                                         colorSpace='rgb', flipHoriz=self.mirror))
+        return stims
+
+    def frame_rate(self):
+        """the measured refresh rate of the stimulus screens, in Hz
+
+        Falls back to 60 Hz (with a warning) if the frame intervals are
+        too irregular to measure it.
+        """
+        rate = self.win_left.getActualFrameRate(nIdentical=20, nMaxFrames=240, nWarmUpFrames=20, threshold=1)
+        if rate is None:
+            print("Warning: could not measure the frame rate, assuming 60 Hz")
+            return 60.
+        return rate
+
+    def get_keys(self):
+        return event.getKeys()
+
+    def wait_keys(self, key_list, poll=0.005):
+        """wait for one of ``key_list``, sleeping between checks instead of spinning
+
+        Keys pressed before the call are ignored, as with ``event.waitKeys``.
+        """
+        event.clearEvents('keyboard')
+        while True:
+            keys = event.getKeys(keyList=key_list)
+            if keys:
+                return keys
+            core.wait(poll, hogCPUperiod=0)
+
+    def wait(self, seconds):
+        core.wait(seconds)
+
+    def idle(self, seconds):
+        """sleep for ``seconds``, without spinning for the end of it as ``core.wait`` does
+        """
+        core.wait(seconds, hogCPUperiod=0)
+
+    def close(self):
+        for win in (self.win_right, self.win_back, self.win_left):
+            if win is not None:
+                win.close()
@@ -0,0 +1,392 @@
+#!/usr/bin/python
+"""the session itself: loading, calibration, practice and AEPsych trials, for any paradigm
+"""
+from psychopy import prefs
+prefs.general['audioLib'] = ['sounddevice']
+prefs.hardware['audioLib'] = ['sounddevice']
+from psychopy import core, visual
+
+import os.path as op
+from random import randrange
+
+from aepsych_utils.server import ServerError
+from experiment_engine.aepsych_session import AEPsychSession
+from experiment_engine.calibration import calibrate
+from experiment_engine.display import Display
+from experiment_engine.frame_timing import FlipRecorder, FrameLog
+from experiment_engine.render import FrameSchedule, RenderLoop, StaticScreen
+from experiment_engine.settings import Settings, ask_session_info
+from experiment_engine.stimuli import Background, StimulusSet
+from experiment_engine.trial_log import TrialLog
+from experiment_engine.trial_plan import POP_OUT_FOIL, POP_OUT_TARGET, Trial, TrialPlan
+from experiment_engine.trials import TrialRunner
+from stimulus_utils.glyph_atlas import FONT
+
+
+## instructions shown with an example trial before the practice session, by stimulus type
+INSTRUCTIONS = {
+    'w': ('On each trial, one of the two words will pop out (it will appear closer than the other).\n'
+          'Your task is to identify whether the closer word is real or nonsense.\n'
+          'Press 1 (the left key) for real or 3 (the right key) for nonsense.\n'
+          'In this case, the real word is closer, so the correct answer is 1 (left).\n'
+          'Press space to start the practice session.'),
+    'i': ('On each trial, one of the two images will pop out (it will appear closer than the other).\n'
+          'Your task is to identify whether the closer image is a flower or a bird.\n'
+          'Press 1 (the left key) for flower or 3 (the right key) for bird.\n'
+          'In this case, the flower is closer, so the correct answer is 1 (left).\n'
+          'Press space to start the practice session.'),
+}
+
+## the nonsense word of the instructions' example
+INSTRUCTION_FOIL = 192
+
+## the other screens of a session
+FEEDBACK = {1: 'Correct', 0: 'Incorrect'}
+PRACTICE_OVER = "Practice Session Over!"
+BEGIN = 'Press the spacebar to begin'
+END = 'End of experiment. Thanks!'
+
+## the loading screen checks on the preloading every LOADING_POLL seconds, and redraws every KEEP_ALIVE seconds
+## even when nothing changed
+LOADING_POLL = 0.05
+KEEP_ALIVE = 0.5
+
+
+class Experiment:
+    """one session of a paradigm, from the session dialog to the end screen
+
+    Parameters
+    ----------
+    config : experiment_engine.settings.ExperimentConfig
+        What the script sets (folders, sizes, number of practice trials...)
+    paradigm : experiment_engine.paradigms.VerticalDisparity or subclass
+        What the trials vary, and how the stimuli are presented
+
+    """
+    def __init__(self, config, paradigm):
+        self.config = config
+        self.paradigm = paradigm
+        self.session = None
+        self.trial_log = None
+        self.frame_log = None
+        self.background = None
+        self._n_trials = 0
+        self._stims = None
+
+    def run(self):
+        """run the whole session, and quit PsychoPy at the end
+        """
+        config = self.config
+        paradigm = self.paradigm
+        self.settings = settings = Settings(ask_session_info(config))
+        file_name = settings.file_name(config)
+        if paradigm.uses_server:
+            self.trial_log = TrialLog(config.dir + 'Data/' + file_name + '.csv', paradigm, settings.stim_type)
+        if config.glyph_atlas and not op.isfile(config.dir + FONT):
+            print("Warning: %s not found, text is drawn by PsychoPy's font engine" % (config.dir + FONT))
+        if config.glyph_atlas and op.isfile(config.dir + FONT):
+            self.display = Display(settings, config.back_screen, config.dir + FONT, config.dir + 'assets/GlyphAtlas/')
+        else:
+            self.display = Display(settings, config.back_screen)
+        if paradigm.uses_server:
+            self.session = AEPsychSession(config.dir, file_name, config.config_ini,
+                                          server_executable=config.aepsych_server, pool=config.aepsych_pool,
+                                          transport=config.aepsych_transport, address=config.aepsych_address)
+        self.stimuli = StimulusSet(config, settings)
+        self.plan = TrialPlan(self.stimuli, settings.h_disparity)
+
+        self.load()
+        calibrate(self.display, settings, config.offset_path, config.calibration_targets)
+
+        if settings.background is not None and paradigm.draws_background:
+            border = config.debug_border if settings.mode == 'debug' else str(settings.view_distance)
+            border_file = config.dir + 'assets/Backgrounds/Borders/' + border + '.png'
+            if not op.isfile(border_file):
+                #VIDs rendered with stimulus_utils.word_renderer have no border until one is made for them
+                print("Warning: there is no background border for a VID of %s cm" % border)
+                border_file = None
+            self.background = Background(settings.background, self.display, border_file,
+                                         config.bg_contrast, config.background_cache_dir,
+                                         config.background_cache_seeds)
+        self.schedule = self.recorder = None
+        if config.frame_locked or config.record_frames:
+            frame_rate = self.display.frame_rate()
+            print("Frame rate: %.2f Hz" % frame_rate)
+            if config.frame_locked:
+                bounds = self.session.parameter_bounds(paradigm.duration_parameter) if paradigm.uses_server else None
+                self.schedule = FrameSchedule(frame_rate, bounds)
+            if config.record_frames:
+                self.recorder = FlipRecorder(1./frame_rate)
+                if paradigm.uses_server:
+                    #the back screen is only flipped when its background changes, between trials
+                    windows = ['left'] if self.display.win_right is None else ['left', 'right']
+                    self.frame_log = FrameLog(config.dir + 'Data/' + file_name + '_frames.csv', windows)
+        #on the clock PsychoPy stamps flips with, as the loop times stimuli with the flips' own timestamps
+        self.loop = RenderLoop(self.display, settings.stim_spacing, config.constant_offset/60, self.background,
+                               clock=core.getTime, schedule=self.schedule, recorder=self.recorder)
+        self.fixation = self.display.fixation()
+        self.reminder = (config.reminder_texts or paradigm.reminder_texts)[settings.stim_type]
+        self.prebuild_text()
+
+        if settings.practice:
+            self.practice()
+        if paradigm.end_screen:
+            self.wait_for_start()
+        if paradigm.uses_server:
+            self.trials()
+        self.finish()
+
+    def load(self):
+        """the loading screen, up until the stimuli are preloaded and the server is ready
+        """
+        display = self.display
+        preloader = self.stimuli.preloader
+        aep_image = visual.ImageStim(
+            win=display.win_left, name='AEP_image', units='norm', image=self.config.dir + '/assets/bg_image.png',
+            mask=None, anchor='center', ori=0.0, pos=(0, 0), size=(2, 2), color=[1, 1, 1], colorSpace='rgb',
+            opacity=None, flipHoriz=False, flipVert=False, texRes=128.0, interpolate=True, depth=-1.0)
+        ## preloading progress, drawn under the loading image while the server starts
+        bar_outline = visual.Rect(display.win_left, units='norm', width=1.2, height=0.05, pos=(0, -0.9),
+                                  lineColor=(1, 1, 1), fillColor=None, colorSpace='rgb')
+        bar = visual.Rect(display.win_left, units='norm', width=0, height=0.05, pos=(-0.6, -0.9),
+                          lineColor=None, fillColor=(1, 1, 1), colorSpace='rgb')
+        text = visual.TextStim(display.win_left, text='', font="Optimistic Display", units='norm', pos=(0, -0.82),
+                               height=0.05, color=(1, 1, 1), colorSpace='rgb')
+
+        if self.session is not None:
+            self.session.launch()
+        #the screen is only redrawn when the progress changes (and every KEEP_ALIVE seconds, so the window keeps
+        #handling its events), and the loop sleeps in between instead of flipping as fast as it can
+        shown = None
+        last_flip = 0.
+        while True:
+            ready = preloader.done
+            if self.session is not None:
+                try:
+                    ready = self.session.poll_ready() and ready
+                except ServerError:
+                    #the server died (or never came up): close the fullscreen windows so its output can be read
+                    display.close()
+                    self.session.close()
+                    raise
+            if ready:
+                break
+            if not preloader.done:
+                status = "Loading stimuli: %i of %i" % (preloader.n_done, len(preloader))
+            else:
+                status = "Starting AEPsych"
+            if status != shown or core.getTime() - last_flip > KEEP_ALIVE:
+                shown = status
+                bar.width = 1.2*preloader.fraction_done
+                bar.pos = (-0.6 + bar.width/2, -0.9)
+                text.text = status
+                aep_image.draw()
+                bar_outline.draw()
+                bar.draw()
+                text.draw()
+                display.win_left.flip()
+                last_flip = core.getTime()
+            sleep = LOADING_POLL if self.session is None else min(LOADING_POLL, self.session.time_to_next_probe())
+            display.idle(sleep)
+        preloader.wait()
+        print("Stimuli preloaded: " + str(preloader.metrics()))
+
+        if self.session is not None:
+            ## replaying the tells of a previous run can take a while, so show how far along it is
+            text.pos = (0, -0.8)
+            text.height = 0.06
+
+            def show_progress(n_done, n_total):
+                aep_image.draw()
+                text.text = "Restoring the previous session: %i of %i trials" % (n_done, n_total)
+                text.draw()
+                display.win_left.flip()
+
+            self.session.start(progress=show_progress)
+
+    def prebuild_text(self):
+        """lay out every text of the session now that the offset is known, so that no screen waits for it
+        """
+        display = self.display
+        self.instruction_text()
+        for text in (self.reminder, FEEDBACK[1], FEEDBACK[0], PRACTICE_OVER, BEGIN, END):
+            display.text(text)
+
+    def instruction_text(self):
+        display = self.display
+        return display.text(INSTRUCTIONS[self.settings.stim_type], units='pix', pos=(0, -(display.height*.17)),
+                            height=50, wrap_width=display.width*.75)
+
+    def next_trial(self):
+        trial = self.plan[self._n_trials]
+        self._n_trials += 1
+        return trial
+
+    def show_text(self, text):
+        """the background with ``text`` in the middle, for both eyes
+        """
+        StaticScreen(self.loop, self.display.text(text)).show()
+
+    def wait_for_fixation(self):
+        """draw the fixation cross and wait for the participant to start the trial
+
+        Returns False if they quit instead.
+        """
+        for stim in self.fixation:
+            stim.draw()
+        self.display.win_left.flip()
+        if self.display.win_right is not None:
+            self.display.win_right.flip()
+        return 'q' not in self.display.wait_keys(["space", "q"])
+
+    def response(self, trial):
+        """wait for the participant's answer: 1 if they were right, 0 if not, None if they quit
+        """
+        keys = self.display.wait_keys(["q", "num_1", "num_3", "1", "3"])
+        if "q" in keys:
+            return None
+        if ("num_1" in keys or "1" in keys) and trial.pop_out_choice == POP_OUT_TARGET:
+            print("Correct response")
+            return 1
+        if ("num_3" in keys or "3" in keys) and trial.pop_out_choice == POP_OUT_FOIL:
+            print("Correct response")
+            return 1
+        print("Incorrect response")
+        return 0
+
+    def instructions(self):
+        """the task instructions, over an example where stimulus 1 (a real word, or a flower) pops out
+        """
+        display, stimuli = self.display, self.stimuli
+        foil = min(INSTRUCTION_FOIL, len(stimuli.foil_files) - 1) if self.settings.stim_type == 'w' \
+            else randrange(0, len(stimuli.foil_files))
+        example = Trial(-1, stimuli.target(randrange(0, len(stimuli.target_files))), stimuli.foil(foil),
+                        POP_OUT_TARGET, (self.plan.hpos, 0), (0., 0., 0.))
+        left, right = stimuli.stims((example.stim1, example.stim2), display)
+        #There is no need for VBD on the introductory screen, lets save that for the practice trials
+        self.loop.place(left, right, example.hpos, (0., 0.))
+        if 'q' in StaticScreen(self.loop, self.instruction_text(), left, right).wait(['space', 'q']):
+            self.abort()
+
+    def practice(self):
+        """the instructions, then the practice trials with their random durations and disparities
+        """
+        paradigm, stimuli, loop = self.paradigm, self.stimuli, self.loop
+        self.instructions()
+        loop.blank()
+
+        for trial_num in range(self.config.n_practice_trials + 1):
+            trial = self.next_trial()
+            duration, disparity = paradigm.practice_parameters(trial, self.settings.easy)
+            left, right = stimuli.stims((trial.stim1, trial.stim2), self.display)
+            loop.blank()
+            if not self.wait_for_fixation():
+                break
+            paradigm.present(loop, trial, left, right, duration, disparity)
+            if not paradigm.has_response:
+                continue
+
+            loop.blank()
+            #Reminding the participants of the controls
+            self.show_text(self.reminder)
+            correct = self.response(trial)
+            if correct is None:
+                break
+            #Showing feedback at the end of the trial (was the participant right or wrong?)
+            self.show_text(FEEDBACK[correct])
+
+        if paradigm.has_response:
+            self.show_text(PRACTICE_OVER)
+        self.display.wait(2)
+
+    def wait_for_start(self):
+        """the "press the spacebar" screen before the experiment proper
+        """
+        if 'q' in StaticScreen(self.loop, self.display.text(BEGIN)).wait(['space', 'q']):
+            self.abort()
+        self.loop.blank()
+
+    def trials(self):
+        """the AEPsych trials, until the server is done or the participant quits (see ``TrialRunner``)
+        """
+        runner = TrialRunner(self.session, self.paradigm, self.plan, self.trial_log, self._n_trials, self.schedule,
+                             self.config.tell_quantized_duration)
+        runner.run(self)
+        self._n_trials = runner.next_index
+
+    def start_trial(self, trial_num, trial):
+        """a new background, the trial's stimuli and the fixation cross; False if the participant quits
+        """
+        #a new background for every trial
+        background_seed = self.background.next() if self.background is not None else None
+        self.loop.blank()
+        self._stims = self.stimuli.stims((trial.stim1, trial.stim2), self.display)
+        return self.wait_for_fixation(), background_seed
+
+    def show_trial(self, trial_num, trial, duration, disparity):
+        """present the trial's stimuli, recording its frames, and return the frames drawn and the measured duration
+        """
+        loop = self.loop
+        left, right = self._stims
+        if self.recorder is not None:
+            self.recorder.start_trial()
+        n_frames = self.paradigm.present(loop, trial, left, right, duration, disparity)
+        #the blank's flip ends the last stimulus frame, so it is part of the trial's frame intervals
+        loop.blank(record=True)
+        if self.recorder is not None:
+            frames = self.recorder.end_trial()
+            self.frame_log.write(trial_num, frames)
+            dropped = sum(stats['dropped'] for stats in frames['windows'].values())
+            if dropped:
+                print("Warning: %i frame(s) dropped during trial %i" % (dropped, trial_num))
+        return n_frames, loop.measured_duration
+
+    def respond(self, trial, duration, disparity):
+        return self.response(trial)
+
+    def finish(self):
+        """close the data files, show the end screen and quit
+        """
+        if self.trial_log is not None:
+            self.trial_log.close()
+        if self.frame_log is not None:
+            self.frame_log.close()
+        if self.background is not None:
+            self.background.close()
+        if self.session is not None:
+            try:
+                self.session.finish_trials()
+            except Exception:
+                #the last tells did not reach the server: close the fullscreen windows so the error can be read
+                self.display.close()
+                self.session.close()
+                raise
+        print("Texture cache: " + str(self.stimuli.cache.stats()))
+        print("Text cache: " + str(self.display.text_cache.stats()))
+
+        if self.paradigm.end_screen:
+            self.display.wait(1)
+            text = self.display.text(END)
+            for stim in text:
+                stim.draw()
+            self.display.flip()
+            self.display.wait(5)
+        self.quit()
+
+    def abort(self):
+        """the participant pressed q: close everything and quit
+        """
+        if self.trial_log is not None:
+            self.trial_log.close()
+        if self.frame_log is not None:
+            self.frame_log.close()
+        if self.background is not None:
+            self.background.close()
+        self.quit()
+
+    def quit(self):
+        self.display.close()
+        if self.session is not None:
+            #make sure all of the tells are on disk, and shut the server down
+            self.session.close()
+        core.quit()
@@ -0,0 +1,145 @@
+#!/usr/bin/python
+"""flip timestamps of the stimulus windows, and the dropped and late frames they reveal
+"""
+import numpy as np
+
+
+## the windows a frame can flip, in the order of the recorder's columns
+WINDOWS = ('left', 'right', 'back')
+
+
+class FlipRecorder:
+    """record when each window flipped, frame after frame
+
+    The timestamps go in a ring buffer allocated once, ``capacity``
+    frames long, so recording a frame never allocates. A trial is
+    summarised from the frames drawn between ``start_trial`` and
+    ``end_trial`` (its last ``capacity`` frames if there were more).
+
+    Parameters
+    ----------
+    frame_period : float
+        Expected time between flips, in seconds
+    capacity : int
+        Number of frames kept
+    late_tolerance : float
+        A flip is late when it comes more than this fraction of a frame
+        period after the previous one
+
+    Attributes
+    ----------
+    times : numpy.ndarray
+        (capacity, 3) flip times of the ``WINDOWS``; NaN for a window
+        that did not flip in that frame
+    n_frames : int
+        Number of frames recorded so far
+
+    """
+    def __init__(self, frame_period, capacity=4096, late_tolerance=.25):
+        self.frame_period = frame_period
+        self.capacity = capacity
+        self.late_tolerance = late_tolerance
+        self.times = np.full((capacity, len(WINDOWS)), np.nan)
+        self.n_frames = 0
+        self._trial_start = 0
+
+    def frame(self):
+        """the row to write the flip times of a new frame into
+        """
+        row = self.times[self.n_frames % self.capacity]
+        row.fill(np.nan)
+        self.n_frames += 1
+        return row
+
+    def start_trial(self):
+        self._trial_start = self.n_frames
+
+    def trial_times(self):
+        """the flip times of the frames drawn since ``start_trial``, oldest first
+        """
+        n = min(self.n_frames - self._trial_start, self.capacity)
+        end = self.n_frames % self.capacity
+        if n <= end:
+            return self.times[end - n:end]
+        return np.concatenate([self.times[end - n:], self.times[:end]])
+
+    def end_trial(self):
+        """summarise the frame intervals of the trial
+
+        Returns
+        -------
+        summary : dict
+            ``n_frames`` (the blank that ends the stimulus included, when
+            it is recorded), the ``max_eye_skew`` between the left and
+            right flips (NaN with a single window), and for each window
+            that flipped: the ``mean``, ``sd``, ``min`` and ``max``
+            interval between its flips, the number of ``late`` flips, and
+            the number of refreshes ``dropped`` (an interval of n periods
+            drops n - 1).
+
+        """
+        times = self.trial_times()
+        summary = {'n_frames': len(times), 'windows': {}}
+        with np.errstate(invalid='ignore'):
+            skew = np.abs(times[:, 0] - times[:, 1])
+            summary['max_eye_skew'] = np.nanmax(skew) if np.isfinite(skew).any() else np.nan
+        for column, window in enumerate(WINDOWS):
+            flips = times[:, column]
+            flips = flips[np.isfinite(flips)]
+            if len(flips) == 0:
+                continue
+            intervals = np.diff(flips)
+            if len(intervals) == 0:
+                intervals = np.full(1, np.nan)
+            periods = np.rint(intervals/self.frame_period)
+            summary['windows'][window] = {
+                'mean': np.mean(intervals),
+                'sd': np.std(intervals),
+                'min': np.min(intervals),
+                'max': np.max(intervals),
+                'late': int(np.sum(intervals > self.frame_period*(1 + self.late_tolerance))),
+                'dropped': int(np.sum(np.clip(np.nan_to_num(periods) - 1, 0, None))),
+            }
+        return summary
+
+
+class FrameLog:
+    """the per-trial frame interval summaries of a session, next to its data file
+
+    One row per trial, with the interval statistics (in ms) of each
+    window the session flips.
+
+    Parameters
+    ----------
+    path : str
+        Path of the CSV file (overwritten)
+    windows : sequence of str
+        The ``WINDOWS`` that the session flips
+
+    """
+    STATS = ('mean', 'sd', 'min', 'max')
+
+    def __init__(self, path, windows):
+        self.path = path
+        self.windows = list(windows)
+        self._file = open(path, 'w')
+        columns = ['trialNum', 'nFrames']
+        for window in self.windows:
+            columns += [window + name for name in ('MeanMs', 'SdMs', 'MinMs', 'MaxMs', 'Late', 'Dropped')]
+        columns.append('maxEyeSkewMs')
+        self._file.write(','.join(columns) + '\n')
+
+    def write(self, trial_num, summary):
+        values = ['%i' % trial_num, '%i' % summary['n_frames']]
+        for window in self.windows:
+            stats = summary['windows'].get(window)
+            if stats is None:
+                values += ['nan']*6
+                continue
+            values += ['%.3f' % (stats[name]*1000) for name in self.STATS]
+            values += ['%i' % stats['late'], '%i' % stats['dropped']]
+        values.append('%.3f' % (summary['max_eye_skew']*1000))
+        self._file.write(','.join(values) + '\n')
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,240 @@
+#!/usr/bin/python
+"""the paradigms the engine can run: what AEPsych varies, and what happens while the stimuli are up
+
+A paradigm decides
+
+* how AEPsych's trial parameters (or a practice trial's random draws)
+  turn into a stimulus duration and a (horizontal, vertical) disparity,
+  and which of them go in the data file,
+* what happens while the stimuli are on screen (``present``): shown for
+  the trial's duration, or adjusted live with the keyboard,
+* and which parts of the session it uses (the AEPsych server, the
+  response, the background).
+
+Paradigms do not import PsychoPy: they work through the render loop
+(``experiment_engine.render.RenderLoop``) and its display.
+"""
+
+
+class VerticalDisparity:
+    """vertical disparity (Time To Fuse): AEPsych varies ``disparityAmplitude`` and ``stimulusDuration``
+
+    Attributes
+    ----------
+    uses_server : bool
+        Whether the session runs AEPsych trials after the practice. Without
+        a server, only the practice session is run.
+    has_response : bool
+        Whether practice trials end with a response and feedback
+    draws_background : bool
+    end_screen : bool
+        Whether the session ends on the "End of experiment" screen
+    reminder_texts : dict
+        Reminder of the response keys after each practice trial, by stimulus type
+    csv_header : str
+        Columns of the data file filled by the values ``trial_parameters`` returns
+    csv_format : str
+        How those values are formatted
+    duration_parameter : str
+        The AEPsych parameter that holds the stimulus duration
+
+    """
+    uses_server = True
+    has_response = True
+    draws_background = True
+    end_screen = True
+    reminder_texts = {'w': "left = real word, right = nonsense word", 'i': "left = flower, right = bird"}
+    csv_header = 'disparityAmplitude,stimulusDuration'
+    csv_format = '%.3f,%.3f'
+    duration_parameter = 'stimulusDuration'
+
+    def practice_ranges(self, easy):
+        """ranges of the practice trials' duration (s), vertical and horizontal disparity (arcmin)
+
+        The difficulty only changes the practice trials: during the
+        experimental trials the parameters are always controlled by AEPsych.
+        """
+        if easy:
+            return (.5, 2), (0, 20), (0, 0)
+        return (.25, 1.5), (15, 60), (0, 0)
+
+    def practice_parameters(self, trial, easy):
+        """the duration (s) and (horizontal, vertical) disparity (deg) of a practice trial
+        """
+        ranges = self.practice_ranges(easy)
+        duration, vertical, horizontal = (low + u*(high - low) for (low, high), u in zip(ranges, trial.uniforms))
+        return duration, (horizontal/60, vertical/60)
+
+    def trial_parameters(self, config):
+        """read a trial's parameters from the ``config`` of AEPsych's ask reply
+
+        Returns
+        -------
+        duration : float
+            Stimulus duration, in seconds
+        disparity : tuple
+            (horizontal, vertical) disparity, in degrees
+        values : tuple
+            What goes in the data file's ``csv_header`` columns
+
+        """
+        duration = float(config['stimulusDuration'][0])
+        amplitude = float(config['disparityAmplitude'][0])
+        return duration, (0., amplitude/60), (amplitude, duration)
+
+    def set_duration(self, config, duration):
+        """replace the duration in a trial's ``config``, e.g. with the one actually shown before it is told
+        """
+        config[self.duration_parameter] = [duration]
+
+    def present(self, loop, trial, left, right, duration, disparity):
+        """show the stimuli for the trial's duration, returns the number of frames drawn
+        """
+        loop.place(left, right, trial.hpos, disparity)
+        return loop.present(left, right, duration)
+
+
+class HVDisparity(VerticalDisparity):
+    """horizontal and vertical disparity (test.py): AEPsych also varies ``HorizontaldisparityAmplitude``
+    """
+    reminder_texts = {'w': "One = real word, Three = nonsense word", 'i': "One = flower, Three = bird"}
+    csv_header = 'VerticaldisparityAmplitude,HorizonataldisparityAmplitude,stimulusDuration'
+    csv_format = '%.3f,%.3f,%.3f'
+
+    def practice_ranges(self, easy):
+        durations, vertical, _ = VerticalDisparity.practice_ranges(self, easy)
+        return durations, vertical, (-20, 20)
+
+    def trial_parameters(self, config):
+        duration = float(config['stimulusDuration'][0])
+        vertical = float(config['VerticaldisparityAmplitude'][0])
+        horizontal = float(config['HorizontaldisparityAmplitude'][0])
+        return duration, (horizontal/60, vertical/60), (vertical, horizontal, duration)
+
+
+class InteractiveAdjust(VerticalDisparity):
+    """demo (MR.py, demo.py): the experimenter moves the first stimulus with the keyboard
+
+    There is no AEPsych server. During each practice trial only the first
+    stimulus is shown, until ``q``, and redrawn after each of these keys:
+
+    ``v``/``b``
+        increase/decrease its horizontal offset
+    ``n``/``m``
+        decrease/increase the vertical disparity
+    ``r``
+        reset both to 0
+
+    """
+    uses_server = False
+    step = 0.01
+
+    def present(self, loop, trial, left, right, duration, disparity):
+        hpos1, hpos2 = trial.hpos
+        h_disparity, v_disparity = disparity
+        shared = right is left
+        left = left[:1]
+        right = left if shared else right[:1]
+        while True:
+            # nothing moves between key presses, so each adjustment is drawn once and then waits for the next
+            loop.place(left, right, (hpos1, hpos2), (h_disparity, v_disparity))
+            loop.draw_frame(left, right)
+            keys = loop.display.wait_keys(['v', 'b', 'n', 'm', 'r', 'q'])
+            print(keys)
+            if 'v' in keys:
+                hpos1 = hpos1+self.step
+                print("horizontsl offet increased to " + str(hpos1*60))
+            if 'b' in keys:
+                hpos1 = hpos1-self.step
+                print("horizontsl offet decreased to " + str(hpos1*60))
+            if 'n' in keys:
+                v_disparity = v_disparity-self.step
+                print("Vertical offet decreased to " + str(v_disparity*60))
+            if 'm' in keys:
+                v_disparity = v_disparity+self.step
+                print("Vertical offet increased to " + str(v_disparity*60))
+            if 'r' in keys:
+                v_disparity = 0
+                hpos1 = 0
+            if 'q' in keys:
+                return
+
+
+def ease_in_out(progress):
+    # Smoothstep (S-curve) easing: 3x^2 - 2x^3
+    return 3 * progress**2 - 2 * progress**3
+
+
+class ConvergenceAnimation(VerticalDisparity):
+    """convergence time demo (Demo_Convergence_time.py, test_convergence_time.py)
+
+    Only the first stimulus is shown, without horizontal offset, and
+    there is no server, response or background. Until ``q``:
+
+    ``g``
+        animate the vertical disparity back to 0 (smoothstep easing)
+    ``s``/``a``
+        lengthen/shorten that animation by 0.5 s
+    ``n``/``m``
+        decrease/increase the vertical disparity
+    ``r``
+        reset it to 0
+
+    Parameters
+    ----------
+    redraw_key : str or None
+        Only draw a new frame when this key is pressed (None draws every frame)
+    animation_duration : float
+        Initial length of the animation, in seconds
+
+    """
+    uses_server = False
+    has_response = False
+    draws_background = False
+    end_screen = False
+    step = 0.01
+
+    def __init__(self, redraw_key=None, animation_duration=1.0):
+        self.redraw_key = redraw_key
+        self.animation_duration = animation_duration
+
+    def present(self, loop, trial, left, right, duration, disparity):
+        hpos = (0, trial.hpos[1])
+        h_disparity, v_disparity = disparity
+        shared = right is left
+        left = left[:1]
+        right = left if shared else right[:1]
+        animation_duration = self.animation_duration
+        animation_start_time = None
+        while True:
+            keys = loop.display.get_keys()
+            if len(keys):
+                print(keys)
+            if 's' in keys:
+                animation_duration = animation_duration+0.5
+                print("disparity_animation_duration increased to " + str(animation_duration))
+            if 'a' in keys:
+                animation_duration = animation_duration-0.5
+                print("disparity_animation_duration decreased to " + str(animation_duration))
+            if 'g' in keys and animation_start_time is None:
+                animation_start_time = loop.clock()
+                animation_start = v_disparity
+            if animation_start_time is not None:
+                progress = min((loop.clock() - animation_start_time) / animation_duration, 1.0)
+                v_disparity = animation_start * (1 - ease_in_out(progress))
+                if progress >= 1.0:
+                    v_disparity = 0.
+                    animation_start_time = None
+            if 'n' in keys:
+                v_disparity = v_disparity-self.step
+                print("Vertical offet decreased to " + str(v_disparity*60))
+            if 'm' in keys:
+                v_disparity = v_disparity+self.step
+                print("Vertical offet increased to " + str(v_disparity*60))
+            if 'r' in keys:
+                v_disparity = 0
+            if 'q' in keys:
+                return
+            if self.redraw_key is None or self.redraw_key in keys:
+                loop.place(left, right, hpos, (h_disparity, v_disparity))
+                loop.draw_frame(left, right)
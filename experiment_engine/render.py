@@ -0,0 +1,354 @@
+#!/usr/bin/python
+"""the render loop shared by every paradigm: where the stimuli go, and drawing them frame after frame
+"""
+import math
+import time
+
+
+def stimulus_positions(spacing, hpos, disparity, offset=(0., 0.), constant_offset=0.):
+    """positions of the two stimuli for each eye, in degrees
+
+    Parameters
+    ----------
+    spacing : float
+        Gap between the two stimuli, in degrees
+    hpos : tuple
+        Horizontal offset of stimulus 1 and 2 (the one that pops out)
+    disparity : tuple
+        (horizontal, vertical) disparity of the trial, in degrees. It is
+        split between the eyes, half each.
+    offset : tuple
+        Calibrated (horizontal, vertical) offset of the right eye
+    constant_offset : float
+        Extra vertical offset of the right eye, in degrees
+
+    Returns
+    -------
+    left, right : list of tuple
+        Positions of stimulus 1 and 2 in the left and right eye
+
+    """
+    h_disparity, v_disparity = disparity
+    left = [((spacing/2)-hpos[0]-h_disparity/2, v_disparity/2),
+            ((-spacing/2)-hpos[1]-h_disparity/2, v_disparity/2)]
+    right = [((spacing/2)+offset[0]+hpos[0]+h_disparity/2, constant_offset+offset[1]-v_disparity/2),
+             ((-spacing/2)+offset[0]+hpos[1]+h_disparity/2, constant_offset+offset[1]-v_disparity/2)]
+    return left, right
+
+
+class FrameSchedule:
+    """stimulus durations as a whole number of screen refreshes
+
+    A stimulus shown for ``n`` flips is on screen for ``n`` refresh
+    periods, so a requested duration is rounded to the nearest number of
+    frames (at least one) at the measured frame rate.
+
+    Parameters
+    ----------
+    frame_rate : float
+        Refresh rate of the stimulus screens, in Hz
+    bounds : tuple or None
+        ``(lb, ub)`` of the AEPsych duration parameter, in seconds.
+        Durations are kept within them (rounded up to a whole frame at
+        ``lb`` and down at ``ub``), so that what is shown, and told with
+        ``tell_quantized_duration``, stays in the parameter's range
+
+    """
+    def __init__(self, frame_rate, bounds=None):
+        self.frame_rate = frame_rate
+        self.frame_period = 1./frame_rate
+        self.min_frames, self.max_frames = 1, None
+        if bounds is not None:
+            # the tolerance keeps e.g. 0.1 s at 60 Hz (6.000000000000001 frames) at 6 frames
+            min_frames = max(1, int(math.ceil(bounds[0]*frame_rate - 1e-6)))
+            max_frames = int(math.floor(bounds[1]*frame_rate + 1e-6))
+            # no whole number of frames fits in a range shorter than a frame, the nearest is shown then
+            if min_frames <= max_frames:
+                self.min_frames, self.max_frames = min_frames, max_frames
+
+    def n_frames(self, duration):
+        """number of flips that show a stimulus for ``duration`` seconds
+        """
+        n = max(self.min_frames, int(round(duration*self.frame_rate)))
+        return n if self.max_frames is None else min(n, self.max_frames)
+
+    def quantize(self, duration):
+        """the duration actually shown when ``duration`` is requested, in seconds
+        """
+        return self.n_frames(duration)*self.frame_period
+
+
+class RetainedWindow:
+    """a window whose content rarely changes, redrawn and flipped only when it does
+
+    A window keeps showing what it last flipped, so a window holding
+    only static content (the back screen's background) does not need a
+    flip every frame: its flips would only hold up the eyes' windows.
+
+    Parameters
+    ----------
+    win : psychopy.visual.Window
+    content :
+        Anything with a ``draw()`` method and a ``version`` attribute
+        that changes whenever its content does
+    clock : callable
+        Stamps flips when the window does not (see ``RenderLoop``)
+
+    Attributes
+    ----------
+    n_flips : int
+        Number of times the window was redrawn and flipped
+
+    """
+    def __init__(self, win, content, clock=time.perf_counter):
+        self.win = win
+        self.content = content
+        self.clock = clock
+        self.n_flips = 0
+        self._version = None
+
+    def update(self):
+        """redraw and flip the window if its content changed, returns the time of the flip (None if there was none)
+        """
+        version = self.content.version
+        if version == self._version:
+            return None
+        self.content.draw()
+        flip_time = self.win.flip()
+        self._version = version
+        self.n_flips += 1
+        return self.clock() if flip_time is None else flip_time
+
+
+class RenderLoop:
+    """draw the stimuli of a trial, with the background, until their time is up
+
+    Each frame draws the right eye's stims in the right eye's window and
+    the left eye's in the left window, and flips both. The background
+    is drawn under them when it shares the eyes' window (debug mode);
+    on its own back screen it is only redrawn and flipped when it
+    changes (see ``RetainedWindow``).
+
+    Parameters
+    ----------
+    display : experiment_engine.display.Display
+        Or anything with ``win_left``, ``win_right``, ``win_back``,
+        ``right_window``, ``offset`` and ``flip()``
+    spacing : float
+        Gap between the two stimuli, in degrees
+    constant_offset : float
+        Extra vertical offset of the right eye, in degrees
+    background : experiment_engine.stimuli.Background or None
+    clock : callable
+        Returns the current time in seconds, on the clock the windows'
+        ``flip()`` stamps its return value with (``psychopy.core.getTime``
+        for PsychoPy windows). Flips are timed with what ``flip()``
+        returns, and with ``clock`` only when it returns None (PsychoPy
+        windows that do not wait for the blanking)
+    schedule : FrameSchedule or None
+        Present stimuli for a whole number of frames. None draws frames
+        until the duration has gone by on ``clock``
+    recorder : experiment_engine.frame_timing.FlipRecorder or None
+        Records the time of every flip of ``draw_frame``. None records
+        nothing, and costs nothing
+
+    Attributes
+    ----------
+    n_frames : int
+        Number of frames drawn so far
+    back : RetainedWindow or None
+        The back screen, when the background is drawn there
+    onset, offset : float or None
+        When the last stimulus came on (its first flip) and went off (the
+        next blank), on ``clock``
+    flip_time : float or None
+        When the left eye's window last flipped
+
+    """
+    def __init__(self, display, spacing, constant_offset=0., background=None, clock=time.perf_counter,
+                 schedule=None, recorder=None):
+        self.display = display
+        self.spacing = spacing
+        self.constant_offset = constant_offset
+        self.background = background
+        self.clock = clock
+        self.schedule = schedule
+        self.recorder = recorder
+        self.back = None
+        if background is not None and display.win_back is not None:
+            self.back = RetainedWindow(display.win_back, background, clock)
+        self.n_frames = 0
+        self.onset = self.offset = self.flip_time = None
+        self._left_pos = self._right_pos = None
+
+    def place(self, left, right, hpos, disparity):
+        """move the stims to where ``hpos`` and ``disparity`` put them
+        """
+        left_pos, right_pos = stimulus_positions(self.spacing, hpos, disparity, self.display.offset,
+                                                 self.constant_offset)
+        for stim, pos in zip(left, left_pos):
+            stim.pos = pos
+        # in test mode both eyes share the stims, which are then moved for each eye as they are drawn
+        if right is left:
+            self._right_pos = right_pos
+            self._left_pos = left_pos
+        else:
+            self._right_pos = self._left_pos = None
+            for stim, pos in zip(right, right_pos):
+                stim.pos = pos
+
+    def draw_background(self):
+        """draw the background, if it shares the eyes' window
+        """
+        if self.background is not None and self.back is None:
+            self.background.draw()
+
+    def _flip(self, win):
+        """flip ``win``, returns the time the flip completed
+        """
+        flip_time = win.flip()
+        return self.clock() if flip_time is None else flip_time
+
+    def flip(self, stamps=None):
+        """flip the back screen if its content changed, then the right and left eyes' windows
+
+        Their flip times go in ``stamps``, a row of the recorder (see
+        ``draw_frame``), if one is given.
+        """
+        display = self.display
+        if self.back is not None:
+            back_time = self.back.update()
+            if back_time is not None and stamps is not None:
+                stamps[2] = back_time
+        if display.win_right is not None:
+            right_time = self._flip(display.win_right)
+            if stamps is not None:
+                stamps[1] = right_time
+        self.flip_time = self._flip(display.win_left)
+        if stamps is not None:
+            stamps[0] = self.flip_time
+
+    def blank(self, record=False):
+        """show the background alone
+
+        With ``record``, its flips are recorded as one more frame: for the
+        blank that ends a stimulus, so that the last stimulus frame's
+        interval (and a refresh missed on it) is checked too.
+        """
+        self.draw_background()
+        self.flip(self.recorder.frame() if record and self.recorder is not None else None)
+        self.offset = self.flip_time
+
+    def draw_frame(self, left, right, extra=()):
+        """draw and flip one frame of the stimuli
+
+        ``extra`` stims (e.g. instruction text) are drawn on top, each in
+        its own window.
+        """
+        display = self.display
+        # flip times go in columns 0, 1 and 2 (left, right, back) of the recorder's row for the frame
+        stamps = self.recorder.frame() if self.recorder is not None else None
+        if self.back is not None:
+            back_time = self.back.update()
+            if back_time is not None and stamps is not None:
+                stamps[2] = back_time
+        elif self.background is not None:
+            self.background.draw()
+        right_window = display.right_window
+        if self._right_pos is not None:
+            for stim, pos in zip(right, self._right_pos):
+                stim.pos = pos
+                stim.draw(right_window)
+            for stim, pos in zip(left, self._left_pos):
+                stim.pos = pos
+                stim.draw(display.win_left)
+        else:
+            for stim in right:
+                stim.draw(right_window)
+            for stim in left:
+                stim.draw(display.win_left)
+        for stim in extra:
+            stim.draw()
+        self.flip_time = self._flip(display.win_left)
+        if stamps is not None:
+            stamps[0] = self.flip_time
+        if display.win_right is not None:
+            right_time = self._flip(display.win_right)
+            if stamps is not None:
+                stamps[1] = right_time
+        self.n_frames += 1
+
+    @property
+    def measured_duration(self):
+        """how long the last stimulus was up, from its first flip to the blank that followed, in seconds
+        """
+        return self.offset - self.onset
+
+    def present(self, left, right, duration):
+        """show the stimuli for ``duration`` seconds
+
+        With a schedule, exactly ``schedule.n_frames(duration)`` frames are
+        flipped; otherwise frames are drawn until the clock runs out. The
+        caller blanks the screen afterwards (see ``blank``), which ends
+        the stimulus.
+
+        Returns
+        -------
+        n_frames : int
+            Number of frames drawn
+
+        """
+        self.offset = None
+        self.draw_frame(left, right)
+        self.onset = self.flip_time
+        if self.schedule is not None:
+            n_frames = self.schedule.n_frames(duration)
+            for _ in range(n_frames - 1):
+                self.draw_frame(left, right)
+            return n_frames
+        end = self.onset + duration
+        n_frames = 1
+        while self.clock() < end:
+            self.draw_frame(left, right)
+            n_frames += 1
+        return n_frames
+
+
+class StaticScreen:
+    """a screen that only changes on a key press: drawn and flipped once, then waiting for the keys
+
+    A window keeps showing what it last flipped, so a screen that is not
+    animated is not redrawn while the participant reads it.
+
+    Parameters
+    ----------
+    loop : RenderLoop
+    stims : sequence
+        Drawn each in its own window (e.g. the text from ``Display.text``)
+    left, right : list or None
+        Stimuli to show as in a trial (placed with ``loop.place``)
+
+    """
+    def __init__(self, loop, stims=(), left=None, right=None):
+        self.loop = loop
+        self.stims = stims
+        self.left = left
+        self.right = right
+
+    def show(self):
+        """draw the screen over the background and flip it
+        """
+        loop = self.loop
+        if self.left is not None:
+            loop.draw_frame(self.left, self.right, self.stims)
+            return
+        loop.draw_background()
+        for stim in self.stims:
+            stim.draw()
+        loop.flip()
+
+    def wait(self, key_list):
+        """show the screen, and return the keys of ``key_list`` that ended the wait
+        """
+        self.show()
+        return self.loop.display.wait_keys(key_list)
@@ -0,0 +1,265 @@
+#!/usr/bin/python
+"""session parameters: the experiment script's config and the choices made in the GUI
+"""
+import os
+import os.path as op
+
+
+## monitor characteristics of the two places the experiment is run
+LOCATIONS = {
+    'lab': {'width': 4096, 'height': 2160, 'width_cm': 69.85,
+            'back_width': 3840, 'back_height': 2160, 'back_width_cm': 165},
+    'desk': {'width': 2560, 'height': 1600, 'width_cm': 40},
+}
+
+## list of possible parameters (to display in the gui)
+VID_LIST = ['57', '100', '139']
+STIM_LIST = ['word', 'image']
+LOC_LIST = ['desk', 'lab']
+MODE_LIST = ['debug', 'test']
+BG_LIST = ['off', 'pinknoise', 'deadleaves']
+PRACTICE_LIST = ['on', 'off']
+
+ORDER = ['date', 'Left, Right, and Back Screens', 'participantID', 'Horizontal Disparity (arcmin)',
+         'Gap Between Stimuli (deg)', 'VID (cm)', 'Practice Session', 'Background']
+
+
+class ExperimentConfig:
+    """what an experiment script sets before the GUI comes up
+
+    Every experiment script is one of these plus a paradigm (see
+    ``experiment_engine.paradigms``).
+
+    Parameters
+    ----------
+    dir : str
+        Folder of the experiment (holding assets/, configs/ and Data/)
+    constant_offset : float
+        Vertical offset added to the right eye's stimuli, in arcmin
+    image_size : float
+        Size of image stimuli, in degrees
+    texture_cache_mb : int
+        Memory budget for the word/image textures kept between trials
+    bg_contrast : float
+        Contrast of the noise backgrounds
+    n_practice_trials : int
+        The practice session runs ``n_practice_trials + 1`` trials, as
+        the scripts always have
+    config_ini : str
+        AEPsych config, relative to ``dir``
+    offset_path : str or None
+        The participant's ipd_correction.csv. None uses
+        haploscope_utils/ipd_correction.csv in the parent folder of ``dir``
+    back_screen : bool
+        Whether test mode opens the back (background) screen
+    debug_border : str
+        Border drawn over the background in debug mode (the VID it was
+        made for)
+    calibration_targets : tuple
+        What the backup calibration shows the left eye in test mode:
+        the ``'glyph'`` (a large circle character) and/or a red ``'circle'``
+    reminder_texts : dict or None
+        Reminder of the response keys shown after each practice trial,
+        by stimulus type. None keeps the paradigm's
+    frame_locked : bool
+        Show stimuli for a whole number of frames at the measured frame
+        rate, instead of until the clock runs out
+    tell_quantized_duration : bool
+        Tell AEPsych the duration that was actually shown (a whole number
+        of frames) instead of the one it asked for
+    record_frames : bool
+        Record the time of every flip, and write a summary of each
+        trial's frame intervals (Data/<file name>_frames.csv)
+    background_cache_dir : str or None
+        Folder where backgrounds, baked with their border and contrast,
+        are kept between sessions (a 3840x2160 background takes 8 MB).
+        None keeps none
+    background_cache_seeds : int
+        Number of different backgrounds shown when they are cached: the
+        cache holds at most that many per background, border and contrast
+    aepsych_server : str or None
+        Path of the ``aepsych_server`` executable (e.g. in the Scripts
+        folder of the conda environment AEPsych is installed in). None
+        looks for it on the PATH, and falls back to startAEPsychShell.bat
+    aepsych_pool : tuple or None
+        ``(ip, port)`` of a warm server pool (``python -m
+        aepsych_utils.server_pool``) to take the session's server from
+    aepsych_transport : {'tcp', 'unix', 'pipe'}
+        What the client talks to the server over (see
+        ``aepsych_utils.transport``); over unix or pipe, a server must
+        already be listening at ``aepsych_address``
+    aepsych_address : str or None
+        Socket file (unix) or pipe name (pipe)
+    glyph_atlas : bool
+        Draw the Optimistic Display text from glyph atlases of the bundled
+        font (assets/GlyphAtlas/, built on first use) instead of through
+        PsychoPy's font engine
+    file_prefix : str
+        Start of the data file names
+    title : str
+        Title of the session dialog
+
+    """
+    def __init__(self, dir, constant_offset=0.0, image_size=5.0, texture_cache_mb=1024, bg_contrast=0,
+                 n_practice_trials=20, config_ini='configs/config.ini', offset_path=None, back_screen=True,
+                 debug_border='139', calibration_targets=('glyph',), reminder_texts=None,
+                 frame_locked=True, tell_quantized_duration=False, record_frames=True,
+                 background_cache_dir=None, background_cache_seeds=64, aepsych_server=None, aepsych_pool=None,
+                 aepsych_transport='tcp', aepsych_address=None, glyph_atlas=True,
+                 file_prefix='MargaretRiver_TTFuse_PPT', title='Project Margaret River TTF Task'):
+        self.dir = dir
+        self.constant_offset = constant_offset
+        self.image_size = image_size
+        self.texture_cache_mb = texture_cache_mb
+        self.bg_contrast = bg_contrast
+        self.n_practice_trials = n_practice_trials
+        self.config_ini = config_ini
+        if offset_path is None:
+            # dir ends with a separator, so dirname has to be taken twice to get its parent
+            offset_path = op.dirname(op.dirname(dir)) + "/haploscope_utils/ipd_correction.csv"
+        self.offset_path = offset_path
+        self.back_screen = back_screen
+        self.debug_border = debug_border
+        self.calibration_targets = calibration_targets
+        self.reminder_texts = reminder_texts
+        self.frame_locked = frame_locked
+        self.tell_quantized_duration = tell_quantized_duration
+        self.record_frames = record_frames
+        self.background_cache_dir = background_cache_dir
+        self.background_cache_seeds = background_cache_seeds
+        self.aepsych_server = aepsych_server
+        self.aepsych_pool = aepsych_pool
+        self.aepsych_transport = aepsych_transport
+        self.aepsych_address = aepsych_address
+        self.glyph_atlas = glyph_atlas
+        self.file_prefix = file_prefix
+        self.title = title
+
+
+## function to reorder lists which helps keep dropdown menus while remembering the previously used parameters
+def move_to_front(lst, item):
+    lst = list(lst)
+    lst.remove(item)
+    lst.insert(0, item)
+    return lst
+
+
+def vid_list(config):
+    """the VIDs there are word stimuli for: ``VID_LIST``, and any rendered by ``stimulus_utils.word_renderer``
+    """
+    vids = set(VID_LIST)
+    for location in LOC_LIST:
+        folder = op.join(config.dir, 'assets', 'Words', location, 'Real')
+        if op.isdir(folder):
+            vids.update(name for name in os.listdir(folder) if name.isdigit())
+    return sorted(vids, key=int)
+
+
+def ask_session_info(config):
+    """show the session dialog, prefilled with the previous session's choices
+
+    Quits the experiment if the dialog is cancelled.
+
+    Returns
+    -------
+    session_info : dict
+        The dialog's fields, as the scripts used to keep them in ``sessionInfo``
+
+    """
+    #imported here, so the rest of the module can be used without PsychoPy (see experiment_engine.simulation)
+    from psychopy import core, data, gui
+    from psychopy.tools.filetools import fromFile, toFile
+
+    info_path = op.join(config.dir, 'lastInfo.pickle')
+    vids = vid_list(config)
+    try:
+        previous = fromFile(info_path)
+        session_info = {
+            'Left, Right, and Back Screens': previous['Left, Right, and Back Screens'],
+            'participantID': previous['participantID'],
+            'Horizontal Disparity (arcmin)': previous['Horizontal Disparity (arcmin)'],
+            'Gap Between Stimuli (deg)': previous['Gap Between Stimuli (deg)'],
+            'VID (cm)': move_to_front(vids, previous['VID (cm)']),
+            'Stim Type': move_to_front(STIM_LIST, previous['Stim Type']),
+            'Location': move_to_front(LOC_LIST, previous['Location']),
+            'Mode': move_to_front(MODE_LIST, previous['Mode']),
+            'Background': move_to_front(BG_LIST, previous['Background']),
+            'Practice Session': move_to_front(PRACTICE_LIST, previous['Practice Session']),
+        }
+    except Exception:
+        session_info = {
+            'Left, Right, and Back Screens': '1 2 3',
+            'participantID': '999',
+            'Horizontal Disparity (arcmin)': '5',
+            'Gap Between Stimuli (deg)': '8',
+            'VID (cm)': vids,
+            'Stim Type': list(STIM_LIST),
+            'Location': list(LOC_LIST),
+            'Mode': list(MODE_LIST),
+            'Background': list(BG_LIST),
+            'Practice Session': list(PRACTICE_LIST),
+        }
+    session_info['Difficulty'] = ['easy', 'hard']
+    session_info['Anaglyph Type'] = ['plastic', 'cardboard']
+    session_info['date'] = data.getDateStr(format="%Y-%m-%d-%H%M")
+
+    dlg = gui.DlgFromDict(session_info, title=config.title, order=ORDER, fixed=['date'])
+    if not dlg.OK:
+        core.quit()
+    toFile(info_path, session_info)
+    return session_info
+
+
+class Settings:
+    """the session's parameters, read from the dialog's fields
+
+    Attributes
+    ----------
+    view_distance : int
+        Viewing distance (VID), in cm
+    h_disparity : int
+        Horizontal disparity of the stimulus that pops out, in arcmin
+    stim_spacing : int
+        Gap between the two stimuli, in degrees
+    location : {'lab', 'desk'}
+    mode : {'debug', 'test'}
+        Debug runs in a single anaglyph window, test on the haploscope
+    stim_type : {'w', 'i'}
+        Words or images
+    background : str or None
+        Type of noise background, None when the background is off
+    practice, easy : bool
+    screens : list of int
+        Screen numbers of the left, right and back screens
+
+    """
+    def __init__(self, session_info):
+        self.info = session_info
+        self.participant = session_info['participantID']
+        self.date = session_info['date']
+        self.view_distance = int(session_info['VID (cm)'])
+        self.h_disparity = int(session_info['Horizontal Disparity (arcmin)'])
+        self.stim_spacing = int(session_info['Gap Between Stimuli (deg)'])
+        self.location = session_info['Location']
+        self.mode = session_info['Mode']
+        self.stim_type = 'w' if session_info['Stim Type'] == 'word' else 'i'
+        self.background = session_info['Background'] if session_info['Background'] != 'off' else None
+        self.practice = session_info['Practice Session'] == 'on'
+        self.easy = session_info['Difficulty'] == 'easy'
+        self.anaglyph = session_info['Anaglyph Type']
+        ## screen numbers python has assigned to the various screens when doing a multi-monitor setup
+        self.screens = [int(screen) for screen in session_info['Left, Right, and Back Screens'].split()]
+        self.monitor = LOCATIONS[self.location]
+
+    def file_name(self, config):
+        """base name of the session's data files
+        """
+        info = self.info
+        if self.stim_type == 'w':
+            size = "_XHeight_24arcmin_" + "_Background_"
+        else:
+            size = "_ImageHeight_" + str(config.image_size) + "_"
+        return (config.file_prefix + info['participantID'] + "_VID_" + info['VID (cm)'] + "_StimType_"
+                + self.stim_type + "_Spacing_" + str(self.stim_spacing) + "_HorDisparity_"
+                + str(self.h_disparity) + size + info['Background'] + "_bgContrast_" + str(config.bg_contrast)
+                + "_" + self.location + "_" + self.mode + "_" + info['date'])
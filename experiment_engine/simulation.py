@@ -0,0 +1,290 @@
+#!/usr/bin/python
+"""run AEPsych sessions without windows or a participant, answered by a simulated observer
+
+Comparing AEPsych configs (the ``[init_strat]`` and ``[opt_strat]``
+sections) otherwise takes a participant in the haploscope for every
+session. The harness runs the trial loop of ``Experiment.trials``
+(``experiment_engine.trials.TrialRunner``) with a front end that draws
+nothing and takes its responses from a ``SimulatedObserver`` instead of
+the keyboard. Nothing waits either, so a session runs as fast as
+AEPsych generates its trials. Each session writes the same
+Data/<file name>.csv and .jsonl as a real one, with ``simulated`` as its
+mode in the file name.
+
+Sessions run back to back on a process pool, each with its own server:
+
+    python -m experiment_engine.simulation --dir "C:/.../Time To Fuse/" --paradigm hv --sessions 20 --workers 4 \\
+        --server ".../Scripts/aepsych_server.exe"
+
+``--mock`` runs them against ``aepsych_utils.mock_server`` instead, to
+check the harness itself without AEPsych.
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from aepsych_utils.mock_server import MockServer, parse_latency
+from experiment_engine.aepsych_session import AEPsychSession
+from experiment_engine.paradigms import HVDisparity, VerticalDisparity
+from experiment_engine.render import FrameSchedule
+from experiment_engine.settings import ExperimentConfig, Settings
+from experiment_engine.trial_log import TrialLog
+from experiment_engine.trial_plan import StimulusFiles, TrialPlan
+from experiment_engine.trials import TrialRunner
+
+## the paradigms that run AEPsych trials, with the config each is run with
+PARADIGMS = {
+    'vertical': (VerticalDisparity, 'configs/config.ini'),
+    'hv': (HVDisparity, 'configs/config2.ini'),
+}
+
+
+class SimulatedObserver:
+    """a participant whose answers depend on the duration and the disparities of the trial
+
+    The stimulus that pops out can only be told apart once the pair is
+    fused, which takes longer the larger the disparities. The observer
+    needs
+
+        time_to_fuse + vertical_cost*|vertical| + horizontal_cost*|horizontal|
+
+    seconds (disparities in arcmin), and the probability of a correct
+    answer rises with the time the stimuli were shown past that, as a
+    cumulative normal of standard deviation ``spread``: from chance
+    (``guess``) when they were shown far too briefly, to ``1 - lapse``.
+
+    Parameters
+    ----------
+    time_to_fuse : float
+        Seconds needed without disparity
+    vertical_cost, horizontal_cost : float
+        Seconds added per arcmin of vertical and horizontal disparity
+    spread : float
+        In seconds
+    guess : float
+        0.5: one of two answers
+    lapse : float
+        Probability of a wrong answer however easy the trial
+    seed : int or None
+
+    """
+    def __init__(self, time_to_fuse=0.3, vertical_cost=0.012, horizontal_cost=0.005, spread=0.15, guess=0.5,
+                 lapse=0.02, seed=None):
+        self.time_to_fuse = time_to_fuse
+        self.vertical_cost = vertical_cost
+        self.horizontal_cost = horizontal_cost
+        self.spread = spread
+        self.guess = guess
+        self.lapse = lapse
+        self.rng = np.random.default_rng(seed)
+
+    def p_correct(self, duration, disparity):
+        """probability of a correct answer
+
+        Parameters
+        ----------
+        duration : float
+            Seconds the stimuli were shown
+        disparity : tuple
+            (horizontal, vertical) disparity, in degrees, as the paradigm's
+            ``trial_parameters`` gives it
+
+        """
+        horizontal, vertical = (abs(d)*60 for d in disparity)
+        needed = self.time_to_fuse + self.vertical_cost*vertical + self.horizontal_cost*horizontal
+        fused = 0.5*(1 + math.erf((duration - needed)/(self.spread*math.sqrt(2))))
+        return self.guess + (1 - self.guess - self.lapse)*fused
+
+    def respond(self, duration, disparity):
+        """1 if the observer answers correctly, 0 if not
+        """
+        return int(self.rng.random() < self.p_correct(duration, disparity))
+
+
+class HeadlessFrontend:
+    """the front end of a simulated session (see ``experiment_engine.trials.TrialRunner``)
+
+    Nothing is drawn or waited for: a trial is shown for its duration
+    rounded to whole frames, if there is a ``schedule``, and ``observer``
+    answers it.
+
+    Parameters
+    ----------
+    observer : SimulatedObserver
+    schedule : experiment_engine.render.FrameSchedule or None
+
+    """
+    def __init__(self, observer, schedule=None):
+        self.observer = observer
+        self.schedule = schedule
+
+    def start_trial(self, trial_num, trial):
+        return True, None
+
+    def show_trial(self, trial_num, trial, duration, disparity):
+        if self.schedule is None:
+            return 0, duration
+        return self.schedule.n_frames(duration), self.schedule.quantize(duration)
+
+    def respond(self, trial, duration, disparity):
+        return self.observer.respond(duration, disparity)
+
+
+def session_info(participant, vid='57', h_disparity='5', spacing='8', stim_type='word', location='desk'):
+    """the session dialog's fields for a simulated session (see ``experiment_engine.settings.Settings``)
+
+    The date has seconds as well, so that a batch started within a minute
+    of the previous one does not overwrite its data files.
+    """
+    return {
+        'Left, Right, and Back Screens': '1 2 3',
+        'participantID': participant,
+        'Horizontal Disparity (arcmin)': h_disparity,
+        'Gap Between Stimuli (deg)': spacing,
+        'VID (cm)': vid,
+        'Stim Type': stim_type,
+        'Location': location,
+        'Mode': 'simulated',
+        'Background': 'off',
+        'Practice Session': 'off',
+        'Difficulty': 'easy',
+        'Anaglyph Type': 'plastic',
+        'date': datetime.now().strftime("%Y-%m-%d-%H%M%S"),
+    }
+
+
+def simulate_session(config, paradigm, observer, settings, port=5555, mock=None, seed=None, frame_rate=60.,
+                     max_trials=None):
+    """run one session's AEPsych trials with ``observer`` answering, writing the data files of a real session
+
+    Parameters
+    ----------
+    config : experiment_engine.settings.ExperimentConfig
+        The server options (``aepsych_server``, ``aepsych_pool``...) are
+        used as in a real session
+    paradigm : experiment_engine.paradigms.VerticalDisparity or HVDisparity
+    observer : SimulatedObserver
+    settings : experiment_engine.settings.Settings
+    port : int
+        Port of the session's server (sessions running at the same time
+        need different ones)
+    mock : dict or None
+        Run against a ``aepsych_utils.mock_server.MockServer`` with this
+        ``latency`` instead of starting a server
+    seed : int or None
+        Seed of the trial plan (and of the mock server)
+    frame_rate : float
+        Durations are rounded to whole frames at this rate if
+        ``config.frame_locked``
+    max_trials : int or None
+        Stop after this many trials, even if AEPsych is not done
+
+    Returns
+    -------
+    summary : dict
+        ``file_name``, ``n_trials``, ``p_correct``, ``seconds`` and the
+        mean ``ask_latency`` and ``wait`` per trial
+
+    """
+    if not paradigm.uses_server:
+        raise ValueError("%s runs no AEPsych trials" % type(paradigm).__name__)
+    file_name = settings.file_name(config)
+    os.makedirs(config.dir + 'Data/', exist_ok=True)
+    trial_log = TrialLog(config.dir + 'Data/' + file_name + '.csv', paradigm, settings.stim_type)
+    session = AEPsychSession(config.dir, file_name, config.config_ini, port=port,
+                             server_executable=config.aepsych_server, pool=config.aepsych_pool,
+                             transport=config.aepsych_transport, address=config.aepsych_address)
+    plan = TrialPlan(StimulusFiles(config, settings), settings.h_disparity, seed)
+    schedule = None
+    if config.frame_locked:
+        schedule = FrameSchedule(frame_rate, session.parameter_bounds(paradigm.duration_parameter))
+    runner = TrialRunner(session, paradigm, plan, trial_log, schedule=schedule,
+                         tell_quantized_duration=config.tell_quantized_duration, verbose=False)
+    mock_server = None
+    try:
+        if mock is not None:
+            mock_server = MockServer(config.dir + config.config_ini, mock, seed)
+            session.client.ip, session.client.port = mock_server.start(session.client.ip)
+            session.attach()
+        else:
+            session.launch()
+        session.server.wait_ready()
+        session.start()
+        start = time.perf_counter()
+        runner.run(HeadlessFrontend(observer, schedule), max_trials)
+        session.finish_trials()
+        elapsed = time.perf_counter() - start
+    finally:
+        trial_log.close()
+        session.close()
+        if mock_server is not None:
+            mock_server.close()
+    n_trials = runner.n_trials
+    return {'file_name': file_name, 'n_trials': n_trials, 'p_correct': runner.n_correct/n_trials, 'seconds': elapsed,
+            'ask_latency': sum(latency['ask_latency'] for latency in runner.latencies)/n_trials,
+            'wait': sum(latency['wait'] for latency in runner.latencies)/n_trials}
+
+
+def _run(args, index):
+    """one session of the command line's batch (on a worker process)
+    """
+    paradigm_class, config_ini = PARADIGMS[args.paradigm]
+    config = ExperimentConfig(args.dir, config_ini=args.config_ini or config_ini, aepsych_server=args.server,
+                              frame_locked=args.frame_rate > 0)
+    settings = Settings(session_info('%s%i' % (args.participant, index), args.vid, args.h_disparity,
+                                     stim_type=args.stim_type, location=args.location))
+    seed = None if args.seed is None else args.seed + index
+    observer = SimulatedObserver(args.time_to_fuse, args.vertical_cost, args.horizontal_cost, args.spread,
+                                 lapse=args.lapse, seed=seed)
+    mock = None if args.mock is None else parse_latency(args.mock)
+    return simulate_session(config, paradigm_class(), observer, settings, args.base_port + index, mock, seed,
+                            args.frame_rate or 60., args.max_trials)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run AEPsych sessions answered by a simulated observer, without windows.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--dir', default=os.getcwd() + os.sep, help='Experiment folder (with assets/, configs/, Data/)')
+    parser.add_argument('--paradigm', choices=sorted(PARADIGMS), default='hv')
+    parser.add_argument('--config-ini', default=None, help="AEPsych config relative to --dir, default: the paradigm's")
+    parser.add_argument('--sessions', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Sessions run at the same time')
+    parser.add_argument('--server', default=None, help='aepsych_server executable (default: on the PATH)')
+    parser.add_argument('--mock', nargs='*', default=None,
+                        help='Run against the mock server instead, with these Generator=seconds latencies')
+    parser.add_argument('--base-port', type=int, default=5600, help='Port of the first session, the others follow')
+    parser.add_argument('--max-trials', type=int, default=None)
+    parser.add_argument('--participant', default='sim', help='Participant IDs are this followed by the session number')
+    parser.add_argument('--vid', default='57')
+    parser.add_argument('--h-disparity', default='5')
+    parser.add_argument('--stim-type', choices=['word', 'image'], default='word')
+    parser.add_argument('--location', choices=['desk', 'lab'], default='desk')
+    parser.add_argument('--frame-rate', type=float, default=60., help='Hz, durations are rounded to it (0: not)')
+    parser.add_argument('--time-to-fuse', type=float, default=0.3, help='Observer: seconds without disparity')
+    parser.add_argument('--vertical-cost', type=float, default=0.012, help='Observer: seconds per arcmin')
+    parser.add_argument('--horizontal-cost', type=float, default=0.005, help='Observer: seconds per arcmin')
+    parser.add_argument('--spread', type=float, default=0.15, help='Observer: seconds')
+    parser.add_argument('--lapse', type=float, default=0.02, help='Observer: lapse rate')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    if not args.dir.endswith(('/', '\\')):
+        args.dir += os.sep
+    #the session's database is created in the working directory, as in a real session run from the experiment folder
+    os.chdir(args.dir)
+
+    start = time.perf_counter()
+    print("%4s %7s %9s %9s %10s %9s  %s" % ('', 'trials', 'correct', 'seconds', 'ask (ms)', 'wait (ms)', 'data file'))
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = {executor.submit(_run, args, index): index for index in range(args.sessions)}
+        for future in as_completed(futures):
+            summary = future.result()
+            print("%4i %7i %9.3f %9.2f %10.1f %9.1f  %s" % (
+                futures[future], summary['n_trials'], summary['p_correct'], summary['seconds'],
+                summary['ask_latency']*1e3, summary['wait']*1e3, summary['file_name']))
+    print("%i session(s) in %.1f s" % (args.sessions, time.perf_counter() - start))
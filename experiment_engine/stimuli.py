@@ -0,0 +1,126 @@
+#!/usr/bin/python
+"""the session's word/image stimuli and noise background
+"""
+from collections import ChainMap
+
+from psychopy import visual
+
+from experiment_engine.trial_plan import StimulusFiles
+from stimulus_utils.background_provider import CACHE_SEEDS, BackgroundProvider
+from stimulus_utils.bundle import open_bundle
+from stimulus_utils.preloader import AssetPreloader
+from stimulus_utils.texture_cache import TextureCache
+
+
+class StimulusSet(StimulusFiles):
+    """the two stimulus folders of a session, and the stims built from them
+
+    Once the folders are listed (see ``experiment_engine.trial_plan.StimulusFiles``),
+    every stimulus starts decoding on a thread pool (see
+    ``stimulus_utils.preloader``), except for folders packed into an up
+    to date stimulus bundle, which are read from the bundle instead.
+
+    Parameters
+    ----------
+    config : experiment_engine.settings.ExperimentConfig
+    settings : experiment_engine.settings.Settings
+
+    Attributes
+    ----------
+    preloader : stimulus_utils.preloader.AssetPreloader
+    cache : stimulus_utils.texture_cache.TextureCache
+
+    """
+    def __init__(self, config, settings):
+        super().__init__(config, settings)
+        self.image_size = config.image_size
+
+        folders = [(self.target_path, self.target_files), (self.foil_path, self.foil_files)]
+        paths = [folder + name for folder, names in folders for name in names]
+        bundled_images = {}
+        for folder, names in folders:
+            bundle = open_bundle(folder, names)
+            if bundle is not None:
+                bundled_images.update(bundle.images(folder))
+        self.preloader = AssetPreloader([path for path in paths if path not in bundled_images]).start()
+        #keep the stimuli of recently shown words/images around, so a trial showing them again does not
+        #decode and upload their textures again
+        self.cache = TextureCache(config.texture_cache_mb*1024**2,
+                                  images=ChainMap(self.preloader.images, bundled_images))
+
+    def stims(self, paths, display):
+        """the stims showing ``paths`` to each eye
+
+        In test mode both eyes share the same stims (drawn once in each
+        window); in debug mode each eye has its own, in its anaglyph colour.
+
+        Returns
+        -------
+        left, right : list of psychopy.visual.ImageStim
+
+        """
+        kwargs = dict(units='deg', colorSpace='rgb', flipHoriz=display.mirror)
+        if self.stim_type == 'i':
+            kwargs['size'] = self.image_size
+        left = [self.cache.get(path, 'left', display.win_left, **kwargs) for path in paths]
+        if display.mode == "debug":
+            right = [self.cache.get(path, 'right', display.win_left, color=display.col2, **kwargs) for path in paths]
+            for stim in left:
+                stim.color = display.col
+        else:
+            right = left
+        return left, right
+
+
+class Background:
+    """the noise background, with its contrast and border baked in
+
+    Backgrounds are synthesized from a seed on a worker process (see
+    ``stimulus_utils.background_provider``), and a new one is shown on
+    every trial. The seed is what gets saved in the data file. The
+    worker also applies the contrast and composites the border, so each
+    frame draws one opaque texture.
+
+    Parameters
+    ----------
+    kind : {'deadleaves', 'pinknoise'}
+    display : experiment_engine.display.Display
+    border_file : str
+        Border image. Borders are constructed so that at every viewing
+        distance the background pattern subtends the same amount of
+        visual field.
+    contrast : float
+    cache_dir : str or None
+        Folder where baked backgrounds are kept between sessions
+    cache_seeds : int
+        Number of different backgrounds shown when they are cached (see
+        ``stimulus_utils.background_provider.BackgroundProvider``)
+
+    Attributes
+    ----------
+    version : int
+        Changes whenever the background does (see
+        ``experiment_engine.render.RetainedWindow``)
+
+    """
+    def __init__(self, kind, display, border_file, contrast, cache_dir=None, cache_seeds=CACHE_SEEDS):
+        win = display.background_window
+        self.version = 0
+        self.provider = BackgroundProvider(kind, win.size, border=border_file, contrast=contrast,
+                                           cache_dir=cache_dir, cache_seeds=cache_seeds)
+        self.seed, image = self.provider.next_background()
+        self.image = visual.ImageStim(win, units="pix", image=image, pos=(0, 0))
+
+    def next(self):
+        """switch to the next background. It was generated while the previous trial ran,
+        so only its upload happens here
+        """
+        self.seed, self.image.image = self.provider.next_background()
+        self.version += 1
+        return self.seed
+
+    def draw(self):
+        self.image.draw()
+
+    def close(self):
+        self.provider.close()
@@ -0,0 +1,53 @@
+#!/usr/bin/python
+"""the trial-by-trial data file (CSV) of a session
+"""
+import time
+
+
+class TrialLog:
+    """one row per AEPsych trial, with the paradigm's parameter columns
+
+    Parameters
+    ----------
+    path : str
+        Path of the CSV file (overwritten)
+    paradigm : experiment_engine.paradigms.VerticalDisparity
+        Provides the parameter columns (``csv_header``, ``csv_format``)
+    stim_type : {'w', 'i'}
+
+    """
+    def __init__(self, path, paradigm, stim_type):
+        self.path = path
+        names = 'word1,word2' if stim_type == 'w' else 'image1,image2'
+        self._file = open(path, 'w')
+        self._file.write('trialNum,' + paradigm.csv_header + ',' + names
+                         + ',popOutChoice,correct,backgroundSeed,timeStamp,askLatency,askWait,'
+                         + 'requestedDuration,quantizedDuration,measuredDuration,nFrames\n')
+        self._row = '%i,' + paradigm.csv_format + ',%s,%s,%s,%i,%s,%s,%.3f,%.3f,%.4f,%.4f,%.4f,%i\n'
+
+    def write(self, trial_num, values, trial, correct, background_seed, latency, timing):
+        """add a trial to the file
+
+        Parameters
+        ----------
+        trial_num : int
+        values : tuple
+            The paradigm's parameter values for the trial
+        trial : experiment_engine.trial_plan.Trial
+        correct : int
+        background_seed : int or None
+            None when the background is off
+        latency : dict
+            The trial's entry of ``TrialScheduler.latencies``
+        timing : tuple
+            Requested, quantized (whole frames) and measured stimulus
+            durations in seconds, and the number of frames drawn
+
+        """
+        self._file.write(self._row % ((trial_num,) + tuple(values) + (
+            trial.stim1, trial.stim2, trial.pop_out_choice, correct,
+            'none' if background_seed is None else background_seed,
+            time.strftime("%H%M%S"), latency['ask_latency'], latency['wait']) + tuple(timing)))
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+"""the random choices of every trial, drawn before the session starts
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from stimulus_utils.preloader import IMAGE_EXTENSIONS
+
+
+## labels of the pop-out choice, as written in the data files
+POP_OUT_TARGET = 'real or flower'
+POP_OUT_FOIL = 'nonesense or bird'
+
+
+Trial = namedtuple('Trial', ['index', 'stim1', 'stim2', 'pop_out_choice', 'hpos', 'uniforms'])
+Trial.__doc__ = """one trial of a TrialPlan
+
+Attributes
+----------
+index : int
+stim1, stim2 : str
+    Paths of the stimuli shown right and left of the centre
+pop_out_choice : str
+    ``POP_OUT_TARGET`` if the target (real word, flower) pops out,
+    ``POP_OUT_FOIL`` if the foil does
+hpos : tuple
+    Horizontal offset of stimulus 1 and 2, in degrees. The stimulus
+    that pops out gets half of the session's horizontal disparity per eye
+uniforms : tuple
+    Three numbers uniform in [0, 1), which practice trials scale to their
+    duration, vertical and horizontal disparity ranges
+"""
+
+
+class StimulusFiles:
+    """the two stimulus folders of a session and their listings, without loading anything
+
+    The target folder holds the stimuli that count as "1" (real words,
+    flowers), the foil folder those that count as "3" (nonsense words,
+    birds).
+
+    Parameters
+    ----------
+    config : experiment_engine.settings.ExperimentConfig
+    settings : experiment_engine.settings.Settings
+
+    Attributes
+    ----------
+    target_path, foil_path : str
+        The two folders
+    target_files, foil_files : list of str
+        Their listings
+
+    """
+    def __init__(self, config, settings):
+        self.stim_type = settings.stim_type
+        if self.stim_type == 'w':
+            self.target_path = config.dir + "assets/Words/" + settings.location + "/Real/" + str(settings.view_distance) + "/"
+            self.foil_path = config.dir + "assets/Words/" + settings.location + "/Nonsense/" + str(settings.view_distance) + "/"
+        else:
+            self.target_path = config.dir + 'assets/Flowers/Cropped Images/'
+            self.foil_path = config.dir + 'assets/Birds/Cropped Images/'
+        self.target_files = [name for name in os.listdir(self.target_path) if name.lower().endswith(IMAGE_EXTENSIONS)]
+        self.foil_files = [name for name in os.listdir(self.foil_path) if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+    def target(self, index):
+        return self.target_path + self.target_files[index]
+
+    def foil(self, index):
+        return self.foil_path + self.foil_files[index]
+
+
+class TrialPlan:
+    """the stimuli, pop-out side and practice draws of every trial, decided up front
+
+    Everything random about a trial except AEPsych's parameters is drawn
+    in blocks of ``block_size`` trials with NumPy, so building a
+    trial during the session is a lookup. The plan grows by another
+    block if a session runs longer than expected.
+
+    Parameters
+    ----------
+    stimuli : StimulusFiles or similar
+        Anything with ``target_files``, ``foil_files`` and
+        ``target(index)``/``foil(index)`` methods returning paths
+    h_disparity : float
+        The session's horizontal disparity, in arcmin
+    seed : int or None
+        Seed of the plan. None draws one at random (it is kept in ``seed``)
+    block_size : int
+
+    """
+    def __init__(self, stimuli, h_disparity, seed=None, block_size=512):
+        self.stimuli = stimuli
+        self.hpos = (h_disparity/2)/60
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+        self.block_size = block_size
+        self._rng = np.random.default_rng(self.seed)
+        self._target_first = []
+        self._pop_out_target = []
+        self._target_index = []
+        self._foil_index = []
+        self._uniforms = []
+        self._extend()
+
+    def __len__(self):
+        return len(self._target_first)
+
+    def _extend(self):
+        # drawn as arrays, kept as lists: indexing a list is much cheaper than indexing an array
+        n = self.block_size
+        rng = self._rng
+        self._target_first += (rng.random(n) < .5).tolist()
+        self._pop_out_target += (rng.random(n) < .5).tolist()
+        self._target_index += rng.integers(len(self.stimuli.target_files), size=n).tolist()
+        self._foil_index += rng.integers(len(self.stimuli.foil_files), size=n).tolist()
+        self._uniforms += [tuple(row) for row in rng.random((n, 3)).tolist()]
+
+    def __getitem__(self, index):
+        while index >= len(self):
+            self._extend()
+        target = self.stimuli.target(self._target_index[index])
+        foil = self.stimuli.foil(self._foil_index[index])
+        target_first = self._target_first[index]
+        pop_out_target = self._pop_out_target[index]
+        # stimulus 1 pops out when it is the one of the chosen kind
+        if target_first == pop_out_target:
+            hpos = (self.hpos, 0)
+        else:
+            hpos = (0, self.hpos)
+        return Trial(index,
+                     target if target_first else foil,
+                     foil if target_first else target,
+                     POP_OUT_TARGET if pop_out_target else POP_OUT_FOIL,
+                     hpos,
+                     self._uniforms[index])
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+"""the AEPsych trial loop, apart from how the trials are shown and answered
+
+``Experiment.trials`` runs it with the windows and the keyboard, and
+``experiment_engine.simulation`` with a simulated observer and nothing
+drawn, so both ask, tell and write the data file the same way. This
+module does not import PsychoPy.
+"""
+
+
+class TrialRunner:
+    """run AEPsych trials until the server is done or the front end stops them
+
+    Each trial takes its stimuli and pop-out choice from the plan, its
+    parameters from AEPsych, is shown and answered through the front end,
+    and is then told to AEPsych (which asks for the next trial in the
+    background) and written to the data file.
+
+    The front end has three methods:
+
+    ``start_trial(trial_num, trial)``
+        Get the trial ready (stimuli, fixation...). Returns ``(go,
+        background_seed)``; the loop stops if ``go`` is False
+    ``show_trial(trial_num, trial, duration, disparity)``
+        Show the stimuli for ``duration`` seconds at ``disparity``
+        (horizontal, vertical, in degrees). Returns ``(n_frames,
+        measured_duration)``
+    ``respond(trial, duration, disparity)``
+        The answer to the trial, shown for ``duration`` seconds: 1 if
+        correct, 0 if not, None to stop
+
+    Parameters
+    ----------
+    session : experiment_engine.aepsych_session.AEPsychSession
+        Started (see ``AEPsychSession.start``)
+    paradigm : experiment_engine.paradigms.VerticalDisparity or subclass
+    plan : experiment_engine.trial_plan.TrialPlan
+    trial_log : experiment_engine.trial_log.TrialLog
+    first_trial : int
+        Index in ``plan`` of the first trial (the practice trials come first)
+    schedule : experiment_engine.render.FrameSchedule or None
+        Durations are rounded to whole frames with it
+    tell_quantized_duration : bool
+        Tell AEPsych the rounded duration instead of the one it asked for
+    verbose : bool
+        Print each trial's timing and ask latency
+
+    Attributes
+    ----------
+    n_trials : int
+        Trials told to AEPsych so far
+    n_correct : int
+    latencies : list of dict
+        The ``ask_latency`` and ``wait`` of every trial
+
+    """
+    def __init__(self, session, paradigm, plan, trial_log, first_trial=0, schedule=None,
+                 tell_quantized_duration=False, verbose=True):
+        self.session = session
+        self.paradigm = paradigm
+        self.plan = plan
+        self.trial_log = trial_log
+        self.next_index = first_trial
+        self.schedule = schedule
+        self.tell_quantized_duration = tell_quantized_duration
+        self.verbose = verbose
+        self.n_trials = 0
+        self.n_correct = 0
+        self.latencies = []
+
+    def run(self, frontend, max_trials=None):
+        """run the trials
+
+        Parameters
+        ----------
+        frontend :
+            See the class docstring
+        max_trials : int or None
+            Stop after this many trials, even if AEPsych is not done
+
+        """
+        paradigm, session, schedule = self.paradigm, self.session, self.schedule
+        session.start_trials()
+        trial_num = 0
+        while True:
+            trial_num += 1
+            trial = self.plan[self.next_index]
+            self.next_index += 1
+            go, background_seed = frontend.start_trial(trial_num, trial)
+            if not go:
+                break
+
+            # get this trial's parameters from AEPsych. They have usually been generated while the participant was
+            # busy, otherwise this waits for the server to finish
+            parameters = session.next_trial()
+            duration, disparity, values = paradigm.trial_parameters(parameters['config'])
+            finished = parameters['is_finished'] or trial_num == max_trials
+
+            n_frames, measured = frontend.show_trial(trial_num, trial, duration, disparity)
+            quantized = schedule.quantize(duration) if schedule is not None else duration
+            timing = (duration, quantized, measured, n_frames)
+            if self.verbose:
+                print("Stimulus duration: requested %.4f s, %i frames (%.4f s), measured %.4f s" %
+                      (duration, n_frames, quantized, measured))
+            if self.tell_quantized_duration and schedule is not None:
+                #so AEPsych's model learns from what was actually shown
+                paradigm.set_duration(parameters['config'], quantized)
+
+            correct = frontend.respond(trial, quantized, disparity)
+            if correct is None:
+                break
+            if self.verbose:
+                print(trial_num)
+
+            #Tell the AEPsych server our outcome for this iteration, and (unless we're done) ask for the next trial
+            #straight away. Both happen in the background
+            latency = session.record(parameters, correct, ask=not finished)
+            if self.verbose:
+                print("AEPsych ask latency: %.3f s (waited %.3f s for it)" % (latency['ask_latency'], latency['wait']))
+            self.trial_log.write(trial_num, values, trial, correct, background_seed, latency, timing)
+            self.n_trials += 1
+            self.n_correct += correct
+            self.latencies.append(latency)
+            if finished:
+                break
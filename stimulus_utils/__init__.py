@@ -0,0 +1,2 @@
+"""helpers for loading, building and caching the experiment's stimuli
+"""
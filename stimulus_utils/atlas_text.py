@@ -0,0 +1,51 @@
+#!/usr/bin/python
+"""a text stim laid out from a glyph atlas instead of by the font engine
+"""
+import numpy as np
+from PIL import Image
+from psychopy import visual
+
+
+class AtlasTextStim:
+    """text drawn as one ImageStim of glyphs copied from a ``GlyphAtlas``
+
+    Takes the ``visual.TextStim`` arguments the experiment uses. The text
+    is laid out once, when the stim is built; ``height`` is the font size
+    in ``units``, and the text is drawn pixel for pixel when it matches
+    the atlas' size.
+
+    Parameters
+    ----------
+    win : psychopy.visual.Window
+    text : str
+    atlas : stimulus_utils.glyph_atlas.GlyphAtlas
+        Must hold every character of ``text`` (see ``GlyphAtlas.can_render``)
+    units, pos, height, wrapWidth, color, colorSpace, flipHoriz :
+        As for ``visual.TextStim``
+    font : str or None
+        Ignored (the atlas decides the font); accepted so that the stim
+        can stand in for a TextStim
+
+    """
+    def __init__(self, win, text, atlas, units='deg', pos=(0, 0), height=1, wrapWidth=None, color=(1, 1, 1),
+                 colorSpace='rgb', flipHoriz=False, font=None):
+        self.text = text
+        self.atlas = atlas
+        scale = height / atlas.size
+        coverage = atlas.render(text, None if wrapWidth is None else wrapWidth / scale)
+        rgba = np.full(coverage.shape + (4,), 255, np.uint8)
+        rgba[..., 3] = coverage
+        self.stim = visual.ImageStim(win, image=Image.fromarray(rgba, 'RGBA'), units=units, pos=pos,
+                                     size=(coverage.shape[1]*scale, coverage.shape[0]*scale), color=color,
+                                     colorSpace=colorSpace, flipHoriz=flipHoriz, interpolate=True)
+
+    @property
+    def pos(self):
+        return self.stim.pos
+
+    @pos.setter
+    def pos(self, pos):
+        self.stim.pos = pos
+
+    def draw(self, win=None):
+        self.stim.draw(win)
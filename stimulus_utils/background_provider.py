@@ -0,0 +1,295 @@
+#!/usr/bin/python
+"""synthesize seeded noise backgrounds on a worker process, one step ahead of the experiment
+
+The worker is a separate Python process (``python -m
+stimulus_utils.background_provider --serve``) started with ``Popen``,
+like the AEPsych server, rather than a multiprocessing pool: on Windows
+a pool would re-run the experiment script (which has no ``__main__``
+guard) in every worker. Requests go to the worker's stdin as one line
+each, and it answers with the raw 8 bit pixels on its stdout.
+
+The worker also bakes the session's contrast and border into each
+background, so the experiment draws a single opaque texture instead of
+the background (scaled by its contrast at draw time) with the border
+alpha-blended over it. Baked backgrounds can be kept on disk and are
+then reused whenever the same (background, seed, size, border,
+contrast) comes up again.
+"""
+import argparse
+import os
+import os.path as op
+import queue
+import subprocess
+import sys
+import threading
+from random import randrange
+
+import numpy as np
+from PIL import Image
+
+from stimulus_utils.dead_leaves import dead_leaves, to_uint8
+from stimulus_utils.pink_noise import pink_noise
+
+
+KINDS = ('deadleaves', 'pinknoise')
+
+#number of different backgrounds a session draws from when they are cached on disk
+CACHE_SEEDS = 64
+
+
+def make_background(kind, height, width, seed):
+    """generate one background
+
+    Parameters
+    ----------
+    kind : {'deadleaves', 'pinknoise'}
+        The session's ``Background`` choice
+    height, width : int
+        Size of the background, in pixels
+    seed : int
+        Seed of the background: the same arguments always give the same
+        image, so a logged seed is enough to get a trial's background back
+
+    Returns
+    -------
+    image : numpy.ndarray
+        (height, width) uint8 array
+
+    """
+    if kind == 'deadleaves':
+        return to_uint8(dead_leaves(height, width, seed, shape='square'))
+    elif kind == 'pinknoise':
+        return to_uint8(pink_noise(height, width, seed=seed))
+    raise ValueError("Unknown background %r, expected one of %s" % (kind, KINDS))
+
+
+def load_border(path, height, width):
+    """a border image, centred on a (height, width) background
+
+    Borders larger than the background are cropped, smaller ones are
+    padded with transparent pixels.
+
+    Returns
+    -------
+    grey, alpha : numpy.ndarray
+        (height, width) float arrays: the border's luminance (0-255) and
+        its opacity (0-1)
+
+    """
+    border = Image.open(path).convert('RGBA')
+    left = (border.width - width) // 2
+    top = (border.height - height) // 2
+    border = border.crop((left, top, left + width, top + height))
+    grey = np.asarray(border.convert('L'), np.float32)
+    alpha = np.asarray(border.getchannel('A'), np.float32) / 255
+    return grey, alpha
+
+
+def bake(image, border=None, contrast=1.):
+    """apply a background's contrast and composite its border over it
+
+    Gives the pixels PsychoPy shows when it draws ``image`` with
+    ``contrast`` and then the border on top: the contrast scales the
+    image around mid grey, in PsychoPy's -1 to 1 colour space.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        (height, width) uint8 background
+    border : tuple or None
+        ``(grey, alpha)`` from ``load_border``
+    contrast : float
+
+    Returns
+    -------
+    baked : numpy.ndarray
+        (height, width) uint8 array
+
+    """
+    baked = (contrast * (image.astype(np.float32) / 127.5 - 1) + 1) * 127.5
+    if border is not None:
+        grey, alpha = border
+        baked += alpha * (grey - baked)
+    return np.clip(np.rint(baked), 0, 255).astype(np.uint8)
+
+
+def baked_path(cache_dir, kind, height, width, seed, border_path, contrast):
+    """where the baked background for these arguments is kept in ``cache_dir``
+    """
+    border_name = op.splitext(op.basename(border_path))[0] if border_path else 'noborder'
+    return op.join(cache_dir, '%s_%d_%dx%d_%s_%g.npy' % (kind, seed, width, height, border_name, contrast))
+
+
+def _serve():
+    """worker loop: read ``kind height width seed contrast cache_dir border`` lines, write back the pixels
+
+    Fields are tab separated, as the paths may contain spaces. ``cache_dir``
+    and ``border`` are ``-`` when unused.
+    """
+    out = sys.stdout.buffer
+    borders = {}
+    for line in sys.stdin.buffer:
+        kind, height, width, seed, contrast, cache_dir, border_path = line.decode('utf-8').rstrip('\n').split('\t')
+        height, width, seed, contrast = int(height), int(width), int(seed), float(contrast)
+        cache_dir = None if cache_dir == '-' else cache_dir
+        border_path = None if border_path == '-' else border_path
+        path = cache_dir and baked_path(cache_dir, kind, height, width, seed, border_path, contrast)
+        if path and op.isfile(path):
+            image = np.load(path)
+        else:
+            border = None
+            if border_path is not None:
+                if (border_path, height, width) not in borders:
+                    borders[border_path, height, width] = load_border(border_path, height, width)
+                border = borders[border_path, height, width]
+            image = bake(make_background(kind, height, width, seed), border, contrast)
+            if path:
+                np.save(path + '.tmp.npy', image)
+                os.replace(path + '.tmp.npy', path)
+        out.write(image.tobytes())
+        out.flush()
+
+
+class BackgroundProvider:
+    """hand out a freshly synthesized background whenever the experiment asks for one
+
+    The next background is always being generated on the worker process
+    while the current one is on screen, and a reader thread collects its
+    pixels as soon as they are ready, so ``next_background`` normally
+    returns straight away.
+
+    Backgrounds use consecutive seeds starting at ``seed``. With a
+    ``cache_dir``, the seeds are taken modulo ``cache_seeds``, so they
+    repeat every ``cache_seeds`` backgrounds and are the same from one
+    session to the next.
+
+    Parameters
+    ----------
+    kind : {'deadleaves', 'pinknoise'}
+    size : tuple
+        (width, height) of the backgrounds, in pixels (e.g. the size of
+        the window they are drawn in)
+    seed : int or None
+        Seed of the first background. None draws one at random
+    prefetch : int
+        Number of backgrounds generated ahead
+    border : str or None
+        Border image baked over every background
+    contrast : float
+        Contrast baked into every background
+    cache_dir : str or None
+        Folder where baked backgrounds are kept between sessions. None
+        keeps none
+    cache_seeds : int
+        Number of different backgrounds when ``cache_dir`` is set (at
+        most that many files are kept per kind, size, border and contrast)
+
+    Attributes
+    ----------
+    seed : int
+        Seed of the most recent background handed out (None before the
+        first one)
+
+    """
+    def __init__(self, kind, size, seed=None, prefetch=1, border=None, contrast=1., cache_dir=None,
+                 cache_seeds=CACHE_SEEDS):
+        if kind not in KINDS:
+            raise ValueError("Unknown background %r, expected one of %s" % (kind, KINDS))
+        self.kind = kind
+        self.border = border
+        self.contrast = contrast
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        #without a cache, seeds are never reused
+        self._n_seeds = cache_seeds if cache_dir is not None else 2**31
+        self.width, self.height = (int(n) for n in size)
+        self._next_seed = (randrange(2**31) if seed is None else seed) % self._n_seeds
+        self.seed = None
+        self._ready = queue.Queue()
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'stimulus_utils.background_provider', '--serve'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0,
+            cwd=op.dirname(op.dirname(op.abspath(__file__))))
+        self._reader = threading.Thread(target=self._read, name='BackgroundProvider', daemon=True)
+        self._reader.start()
+        self._pending = []
+        for _ in range(prefetch):
+            self._request()
+
+    def _request(self):
+        seed = self._next_seed
+        self._next_seed = (seed + 1) % self._n_seeds
+        self._pending.append(seed)
+        request = '%s\t%d\t%d\t%d\t%r\t%s\t%s\n' % (self.kind, self.height, self.width, seed, float(self.contrast),
+                                                      self.cache_dir or '-', self.border or '-')
+        self._process.stdin.write(request.encode('utf-8'))
+        self._process.stdin.flush()
+
+    def _read(self):
+        n_bytes = self.width * self.height
+        stdout = self._process.stdout
+        while True:
+            pixels = bytearray(n_bytes)
+            view = memoryview(pixels)
+            n_read = 0
+            while n_read < n_bytes:
+                n = stdout.readinto(view[n_read:])
+                if not n:
+                    self._ready.put(None)
+                    return
+                n_read += n
+            self._ready.put(pixels)
+
+    def next_background(self, timeout=None):
+        """return the next background and start generating the one after it
+
+        Returns
+        -------
+        seed : int
+            The background's seed (see ``make_background``)
+        image : PIL.Image.Image
+            The background, 8 bit greyscale, with the contrast and border baked in
+
+        """
+        pixels = self._ready.get(timeout=timeout)
+        if pixels is None:
+            raise RuntimeError("The background worker exited (return code %s)" % self._process.poll())
+        self.seed = self._pending.pop(0)
+        self._request()
+        return self.seed, Image.frombuffer('L', (self.width, self.height), pixels, 'raw', 'L', 0, 1)
+
+    def close(self):
+        """stop the worker process
+        """
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Regenerate a background from the seed logged for a trial, or (with --serve) "
+                     "run as the worker process of BackgroundProvider."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--kind', choices=KINDS, default='deadleaves', help='Type of background')
+    parser.add_argument('--seed', type=int, help='Seed logged in the backgroundSeed column')
+    parser.add_argument('--width', type=int, default=3840, help='Width of the background window, in pixels')
+    parser.add_argument('--height', type=int, default=2160, help='Height of the background window, in pixels')
+    parser.add_argument('--border', help='Border image to bake in (assets/Backgrounds/Borders/<VID>.png)')
+    parser.add_argument('--contrast', type=float, default=1., help='Background contrast to bake in')
+    parser.add_argument('--output', '-o', default='background.png', help='Where to save the background')
+    args = parser.parse_args()
+    if args.serve:
+        _serve()
+    else:
+        if args.seed is None:
+            parser.error("--seed is required")
+        border = load_border(args.border, args.height, args.width) if args.border else None
+        image = bake(make_background(args.kind, args.height, args.width, args.seed), border, args.contrast)
+        Image.fromarray(image).save(args.output)
+        print("%s background with seed %d -> %s" % (args.kind, args.seed, args.output))
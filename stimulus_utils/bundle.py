@@ -0,0 +1,273 @@
+#!/usr/bin/python
+"""pack a folder of stimulus images into one memory-mappable file, and read stimuli back from it
+
+A bundle is written next to the folder it was built from, as
+``<folder>.stimbundle`` (e.g. ``assets/Words/lab/Real/57.stimbundle``).
+Layout::
+
+    header      MAGIC, uint32 version, uint32 reserved,
+                uint64 index offset, uint64 index size (little endian)
+    planes      the decoded pixels of every image, each starting on a
+                PLANE_ALIGNMENT byte boundary
+    index       utf-8 JSON: the bundle's metadata and, for every image,
+                its file name, offset, width, height and PIL mode, and
+                the size and modification time of the file it came from
+
+Images are stored already decoded (and, like ``AssetPreloader``, cropped
+to their content), as a luminance plane when they are grey, so loading
+one is a slice of the mapped file rather than opening and inflating a
+PNG.
+"""
+import argparse
+import json
+import mmap
+import os
+import os.path as op
+import struct
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+from stimulus_utils.preloader import IMAGE_EXTENSIONS, decode_image
+
+
+MAGIC = b'MRSTIMBN'
+VERSION = 2
+HEADER = struct.Struct('<8sIIQQ')
+PLANE_ALIGNMENT = 64
+EXTENSION = '.stimbundle'
+
+
+def bundle_path(folder):
+    """where the bundle for ``folder`` is (or would be) written
+    """
+    return folder.rstrip('/\\') + EXTENSION
+
+
+def _planes(image):
+    """convert a decoded image to the smallest mode that loses nothing (grey images become L or LA)
+    """
+    if image.mode == 'RGBA':
+        pixels = np.asarray(image)
+        if (pixels[..., 0] == pixels[..., 1]).all() and (pixels[..., 1] == pixels[..., 2]).all():
+            return image.convert('LA')
+    elif image.mode == 'RGB':
+        pixels = np.asarray(image)
+        if (pixels[..., 0] == pixels[..., 1]).all() and (pixels[..., 1] == pixels[..., 2]).all():
+            return image.convert('L')
+    elif image.mode not in ('L', 'LA'):
+        return image.convert('RGBA')
+    return image
+
+
+def _prepare(path, crop):
+    # stat before decoding, so that a file changed during the build shows up as out of date
+    stat = os.stat(path)
+    image = _planes(decode_image(path, crop))
+    with Image.open(path) as im:
+        source_size = im.size
+    return image, source_size, stat
+
+
+def build_bundle(folder, out_path=None, crop=True, n_workers=None):
+    """pack the images in ``folder`` into a bundle
+
+    Parameters
+    ----------
+    folder : str
+        Folder holding the images (e.g. one VID folder of words)
+    out_path : str or None
+        Where to write the bundle, ``bundle_path(folder)`` by default.
+        It is written to a temporary file first and then moved into
+        place, so an interrupted build never leaves a broken bundle.
+    crop : bool
+        Whether to crop images with an alpha channel to their content,
+        see ``stimulus_utils.preloader.decode_image``
+    n_workers : int or None
+        Number of decoding threads
+
+    Returns
+    -------
+    out_path : str
+        Path of the bundle
+
+    """
+    if out_path is None:
+        out_path = bundle_path(folder)
+    names = sorted(name for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    paths = [op.join(folder, name) for name in names]
+    entries = []
+    tmp_path = out_path + '.tmp'
+    with ThreadPoolExecutor(n_workers or min(16, os.cpu_count() or 1)) as executor, open(tmp_path, 'wb') as f:
+        f.write(bytes(HEADER.size))
+        for name, (image, source_size, stat) in zip(names, executor.map(lambda path: _prepare(path, crop), paths)):
+            padding = -f.tell() % PLANE_ALIGNMENT
+            f.write(bytes(padding))
+            offset = f.tell()
+            f.write(image.tobytes())
+            entries.append({'name': name, 'offset': offset, 'width': image.width,
+                            'height': image.height, 'mode': image.mode,
+                            'source_size': list(source_size),
+                            'file_size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+        index = json.dumps({
+            'version': VERSION,
+            'folder': op.basename(folder.rstrip('/\\')),
+            'cropped': crop,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'images': entries,
+        }).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, index_offset, len(index)))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class StimulusBundle:
+    """read-only, memory-mapped view of a bundle built by ``build_bundle``
+
+    Opening a bundle maps the file and reads its index; pixels are only
+    paged in by the OS when an image is first used, and images are
+    returned as views on the mapping rather than copies.
+
+    Parameters
+    ----------
+    path : str
+        Path of the bundle
+
+    Attributes
+    ----------
+    metadata : dict
+        Everything in the index apart from the per-image entries
+        (folder, whether images were cropped, when it was built)
+
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, index_offset, index_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a stimulus bundle" % path)
+        if version != VERSION:
+            raise ValueError("%s is a version %d bundle, expected version %d (rebuild it)"
+                             % (path, version, VERSION))
+        index = json.loads(bytes(self._mmap[index_offset:index_offset + index_size]).decode('utf-8'))
+        self._entries = {entry['name']: entry for entry in index.pop('images')}
+        self.metadata = index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def names(self):
+        return list(self._entries)
+
+    def is_current(self, folder):
+        """whether every image's file in ``folder`` still has the size and modification time it was bundled with
+        """
+        for name, entry in self._entries.items():
+            try:
+                stat = os.stat(op.join(folder, name))
+            except OSError:
+                return False
+            if stat.st_size != entry['file_size'] or stat.st_mtime_ns != entry['mtime_ns']:
+                return False
+        return True
+
+    def get_array(self, name):
+        """return the pixels of image ``name`` as a uint8 array (height, width[, channels])
+
+        The array is a read-only view on the mapped file.
+        """
+        entry = self._entries[name]
+        n_channels = len(entry['mode'])
+        shape = (entry['height'], entry['width'], n_channels) if n_channels > 1 else (entry['height'], entry['width'])
+        return np.frombuffer(self._mmap, dtype=np.uint8, count=int(np.prod(shape)),
+                             offset=entry['offset']).reshape(shape)
+
+    def get_image(self, name):
+        """return image ``name`` as a PIL image
+
+        For L and RGBA images PIL uses the mapped pixels directly; the
+        other modes are copied once into the image.
+        """
+        entry = self._entries[name]
+        n_bytes = entry['width'] * entry['height'] * len(entry['mode'])
+        data = memoryview(self._mmap)[entry['offset']:entry['offset'] + n_bytes]
+        return Image.frombuffer(entry['mode'], (entry['width'], entry['height']), data,
+                                'raw', entry['mode'], 0, 1)
+
+    def images(self, prefix=''):
+        """return all of the bundle's images as a dict keyed by ``prefix`` + file name
+
+        With the folder path the experiment scripts build stimulus paths
+        from as ``prefix``, the dict can stand in for
+        ``AssetPreloader.images``.
+        """
+        return {prefix + name: self.get_image(name) for name in self._entries}
+
+
+def open_bundle(folder, file_names=None):
+    """open the bundle for ``folder`` if there is an up to date one
+
+    Parameters
+    ----------
+    folder : str
+        The stimulus folder
+    file_names : list of str or None
+        The folder's listing, if it has been read already. The bundle is
+        only used when it holds exactly the images listed, each with the
+        size and modification time its file has now, so a bundle that is
+        out of date is never used in place of the files.
+
+    Returns
+    -------
+    bundle : StimulusBundle or None
+        None if there is no bundle, or it is out of date or from an older
+        version of this module (with a warning)
+
+    """
+    path = bundle_path(folder)
+    if not op.isfile(path):
+        return None
+    if file_names is None:
+        file_names = os.listdir(folder)
+    try:
+        bundle = StimulusBundle(path)
+    except ValueError as e:
+        warnings.warn("%s, loading the files instead" % e)
+        return None
+    listed = set(name for name in file_names if name.lower().endswith(IMAGE_EXTENSIONS))
+    if set(bundle.names()) != listed or not bundle.is_current(folder):
+        warnings.warn("%s does not match the images in %s, loading the files instead (rebuild it with "
+                      "python -m stimulus_utils.bundle)" % (path, folder))
+        return None
+    return bundle
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Pack folders of stimulus images into memory-mappable bundles, written next "
+                     "to each folder as <folder>%s. The experiment scripts use a bundle in place "
+                     "of the folder's files whenever it is up to date." % EXTENSION),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('folders', nargs='+',
+                        help='Stimulus folder(s), e.g. "assets/Words/lab/Real/57"')
+    parser.add_argument('--no-crop', dest='crop', action='store_false',
+                        help='Keep the full frame of images with an alpha channel')
+    parser.add_argument('--workers', type=int, default=None, help='Number of decoding threads')
+    args = parser.parse_args()
+    for folder in args.folders:
+        start = time.perf_counter()
+        out_path = build_bundle(folder, crop=args.crop, n_workers=args.workers)
+        print("%s -> %s (%d images, %.1f MB, %.1f s)" % (
+            folder, out_path, len(StimulusBundle(out_path)), op.getsize(out_path) / 1024**2,
+            time.perf_counter() - start))
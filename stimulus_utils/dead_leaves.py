@@ -0,0 +1,268 @@
+#!/usr/bin/python
+"""dead-leaves background generator (NumPy port of DeadLeaves.m)
+
+Leaves (disks or squares) with random positions, grey levels and sizes
+are dropped one after the other, each only covering the pixels no
+earlier leaf has covered, until the image is covered or the iteration
+budget runs out. Radii follow the distribution of ``compute_dead_leaves``
+in DeadLeaves.m (1/r^sigma between ``rmin`` and ``rmax``, sigma = 3 is
+close to scale invariant).
+
+DeadLeaves.m tests every pixel of the image against every leaf. Here a
+leaf is only rasterized inside its bounding box, and a coarse map of how
+many pixels are still uncovered in each TILE x TILE tile lets leaves that
+land on an already covered area be skipped, and big leaves be clipped to
+the part of their box that still has uncovered pixels. Both give exactly
+the image the full-grid version (``dead_leaves_reference``) gives for
+the same seed.
+
+Coordinates follow DeadLeaves.m: pixel centres are spaced 1/(n-1) apart
+where n is the longer side of the image (so a square image spans [0, 1]
+in both directions), and leaf centres are uniform over the image.
+"""
+import argparse
+import os
+import os.path as op
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+
+TILE = 16
+
+SHAPES = ('disk', 'square')
+
+
+def radius_table(sigma=3, rmin=0.001, rmax=0.8, k=400):
+    """the radii leaves can have and their cumulative distribution, as in DeadLeaves.m
+
+    Returns
+    -------
+    r_list : numpy.ndarray
+        ``k`` radii between ``rmin`` and ``rmax``
+    r_dist : numpy.ndarray
+        Cumulative distribution of the radii, rescaled to [0, 1]
+
+    """
+    r_list = np.linspace(rmin, rmax, k)
+    r_dist = 1. / r_list**sigma
+    if sigma > 0:
+        r_dist = r_dist - 1. / rmax**sigma
+    r_dist = np.cumsum(r_dist)
+    r_dist = (r_dist - r_dist.min()) / (r_dist.max() - r_dist.min())
+    return r_list, r_dist
+
+
+def draw_leaves(rng, n_leaves, extent, sigma=3, rmin=0.001, rmax=0.8):
+    """draw the radius, centre and grey level of ``n_leaves`` leaves
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator
+    n_leaves : int
+    extent : tuple
+        (height, width) of the image in normalized units
+
+    Returns
+    -------
+    leaves : numpy.ndarray
+        (n_leaves, 4) array of radius, row coordinate, column coordinate
+        and grey level (in [0, 1])
+
+    """
+    r_list, r_dist = radius_table(sigma, rmin, rmax)
+    u = rng.random((n_leaves, 4))
+    # nearest point of the cumulative distribution, like min(abs(r - r_dist)) in DeadLeaves.m
+    i = np.clip(np.searchsorted(r_dist, u[:, 0]), 1, len(r_dist) - 1)
+    i -= (u[:, 0] - r_dist[i - 1]) <= (r_dist[i] - u[:, 0])
+    u[:, 0] = r_list[i]
+    u[:, 1] *= extent[0]
+    u[:, 2] *= extent[1]
+    return u
+
+
+def _leaf_mask(rows, cols, leaf, shape):
+    r, x, y, _ = leaf
+    dx = rows - x
+    dy = cols - y
+    if shape == 'disk':
+        return dx[:, None]**2 + dy[None, :]**2 < r * r
+    return (np.abs(dx) < r)[:, None] & (np.abs(dy) < r)[None, :]
+
+
+def _setup(height, width, seed, n_iter, sigma, rmin, rmax, shape):
+    if shape not in SHAPES:
+        raise ValueError("shape must be one of %s, not %r" % (SHAPES, shape))
+    if width is None:
+        width = height
+    spacing = 1. / (max(height, width) - 1)
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    leaves = draw_leaves(rng, n_iter, ((height - 1) * spacing, (width - 1) * spacing), sigma, rmin, rmax)
+    return height, width, spacing, leaves
+
+
+def dead_leaves(height, width=None, seed=None, n_iter=10000, sigma=3, rmin=0.001, rmax=0.8, shape='disk'):
+    """generate one dead-leaves image
+
+    Parameters
+    ----------
+    height : int
+        Height of the image, in pixels
+    width : int or None
+        Width of the image, in pixels (``height`` if None)
+    seed : int, sequence of int, numpy.random.Generator or None
+        Seed for the leaves. The same seed always gives the same image
+    n_iter : int
+        Maximum number of leaves (``options.nbr_iter``)
+    sigma : float
+        Exponent of the radius distribution
+    rmin, rmax : float
+        Smallest and largest leaf radius, as a fraction of the longer side
+    shape : {'disk', 'square'}
+
+    Returns
+    -------
+    image : numpy.ndarray
+        (height, width) float32 array in [0, 1]. Pixels no leaf covered
+        are 0, as in DeadLeaves.m
+
+    """
+    height, width, spacing, leaves = _setup(height, width, seed, n_iter, sigma, rmin, rmax, shape)
+    n_ti, n_tj = -(-height // TILE), -(-width // TILE)
+    # padded to whole tiles; the padding counts as covered
+    image = np.zeros((n_ti * TILE, n_tj * TILE), np.float32)
+    image[:height, :width] = np.nan
+    free = np.isnan(image).reshape(n_ti, TILE, n_tj, TILE).sum(axis=(1, 3))
+    remaining = height * width
+    rows = np.arange(n_ti * TILE) * spacing
+    cols = np.arange(n_tj * TILE) * spacing
+
+    for leaf in leaves:
+        r, x, y, albedo = leaf
+        # tiles touched by the leaf's bounding box
+        ti0 = max(0, int((x - r) / spacing) // TILE)
+        ti1 = min(n_ti, int((x + r) / spacing) // TILE + 1)
+        tj0 = max(0, int((y - r) / spacing) // TILE)
+        tj1 = min(n_tj, int((y + r) / spacing) // TILE + 1)
+        window = free[ti0:ti1, tj0:tj1]
+        if not window.any():
+            continue
+        # shrink the window to the tiles that still have uncovered pixels
+        open_i = np.flatnonzero(window.any(axis=1))
+        open_j = np.flatnonzero(window.any(axis=0))
+        ti0, ti1 = ti0 + open_i[0], ti0 + open_i[-1] + 1
+        tj0, tj1 = tj0 + open_j[0], tj0 + open_j[-1] + 1
+        i0, i1, j0, j1 = ti0 * TILE, ti1 * TILE, tj0 * TILE, tj1 * TILE
+        block = image[i0:i1, j0:j1]
+        covered = np.isnan(block) & _leaf_mask(rows[i0:i1], cols[j0:j1], leaf, shape)
+        block[covered] = albedo
+        n_covered = covered.reshape(ti1 - ti0, TILE, tj1 - tj0, TILE).sum(axis=(1, 3))
+        free[ti0:ti1, tj0:tj1] -= n_covered
+        remaining -= n_covered.sum()
+        if remaining == 0:
+            break
+
+    image = image[:height, :width]
+    image[np.isnan(image)] = 0
+    return image
+
+
+def dead_leaves_reference(height, width=None, seed=None, n_iter=10000, sigma=3, rmin=0.001, rmax=0.8,
+                          shape='disk'):
+    """straight translation of compute_dead_leaves, testing every pixel against every leaf
+
+    Only meant as a reference for tests and benchmarks: it gives the same
+    image as ``dead_leaves`` for the same arguments, much more slowly.
+    """
+    height, width, spacing, leaves = _setup(height, width, seed, n_iter, sigma, rmin, rmax, shape)
+    image = np.full((height, width), np.nan, np.float32)
+    rows = np.arange(height) * spacing
+    cols = np.arange(width) * spacing
+    remaining = height * width
+    for leaf in leaves:
+        covered = np.isnan(image) & _leaf_mask(rows, cols, leaf, shape)
+        image[covered] = leaf[3]
+        remaining -= covered.sum()
+        if remaining == 0:
+            break
+    image[np.isnan(image)] = 0
+    return image
+
+
+def to_uint8(image):
+    """convert an image in [0, 1] to 8 bits, as MATLAB's imwrite does
+    """
+    return np.round(image * 255).astype(np.uint8)
+
+
+def _write_one(args):
+    path, height, width, seed, kwargs = args
+    start = time.perf_counter()
+    Image.fromarray(to_uint8(dead_leaves(height, width, seed, **kwargs))).save(path)
+    return path, time.perf_counter() - start
+
+
+def generate_backgrounds(folder, n_images, height=3840, width=None, seed=0, n_workers=None, first=1, **kwargs):
+    """write ``n_images`` dead-leaves PNGs to ``folder``, named like DeadLeaves.m names them
+
+    Image ``i`` is generated from the seed ``[seed, i]``, so any single
+    image can be regenerated on its own, and the result does not depend
+    on the number of workers.
+
+    Parameters
+    ----------
+    folder : str
+    n_images : int
+    height, width : int
+        Size of the images, in pixels
+    seed : int
+        Base seed
+    n_workers : int or None
+        Number of processes to spread the images over. None uses one per
+        CPU; 1 generates them in this process
+    first : int
+        Number of the first image (DeadLeaves_<first>.png)
+    kwargs :
+        Passed on to ``dead_leaves`` (n_iter, sigma, rmin, rmax, shape)
+
+    Returns
+    -------
+    timings : list of tuple
+        (path, seconds) for every image written
+
+    """
+    os.makedirs(folder, exist_ok=True)
+    jobs = [(op.join(folder, 'DeadLeaves_%d.png' % i), height, width, [seed, i], kwargs)
+            for i in range(first, first + n_images)]
+    if n_workers == 1:
+        return [_write_one(job) for job in jobs]
+    with ProcessPoolExecutor(n_workers) as executor:
+        return list(executor.map(_write_one, jobs))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Generate dead-leaves backgrounds (what DeadLeaves.m does, without MATLAB), "
+                     "e.g. into assets/Backgrounds/Noise/lab/deadleaves."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('folder', help='Where to write the images')
+    parser.add_argument('--number', '-n', type=int, default=50, help='Number of images')
+    parser.add_argument('--height', type=int, default=3840, help='Image height, in pixels')
+    parser.add_argument('--width', type=int, default=None, help='Image width, in pixels (default: square)')
+    parser.add_argument('--shape', choices=SHAPES, default='square', help='Leaf shape')
+    parser.add_argument('--sigma', type=float, default=3, help='Exponent of the leaf size distribution')
+    parser.add_argument('--iterations', type=int, default=10000, help='Maximum number of leaves per image')
+    parser.add_argument('--seed', type=int, default=0, help='Base seed (image i uses [seed, i])')
+    parser.add_argument('--first', type=int, default=1, help='Number of the first image')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = generate_backgrounds(args.folder, args.number, args.height, args.width, args.seed,
+                                   args.workers, args.first, n_iter=args.iterations,
+                                   sigma=args.sigma, shape=args.shape)
+    for path, seconds in timings:
+        print("%s (%.2f s)" % (path, seconds))
+    print("%d images in %.1f s" % (len(timings), time.perf_counter() - start))
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+"""rasterize the bundled Optimistic font into glyph atlases, and lay text out from them
+
+An atlas holds every glyph of ``GLYPHS`` rasterized at one pixel size,
+as ``<folder>/<size>px.png`` (the glyphs' coverage, packed in rows)
+and ``<folder>/<size>px.json`` (where each glyph is, and how far it
+advances the pen). Text is then laid out by copying glyphs, without
+going through the font engine: no font lookup, no rasterization.
+
+The sizes the experiment uses are 50 px (instructions) and 1 degree at
+each viewing distance (prompts and feedback), which depends on the
+screen. The experiment builds a missing atlas the first time it needs
+it; this script builds them ahead of time:
+
+    python -m stimulus_utils.glyph_atlas --sizes 50 65 106 145
+
+Kerning is not applied.
+"""
+import argparse
+import json
+import os
+import os.path as op
+import string
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+## the bundled variable font, relative to the experiment folder
+FONT = 'Optimistic_V5.000-VF/Optimistic_V5.000-VF/Desktop/OptimisticVF_WghtItalDrkmWdth.ttf'
+## its named instance closest to the Optimistic Display the scripts ask PsychoPy for
+VARIATION = 'Regular'
+GLYPHS = string.ascii_letters + string.digits + string.punctuation + ' '
+VERSION = 1
+ATLAS_WIDTH = 1024
+PADDING = 1
+
+
+def atlas_paths(folder, size):
+    stem = op.join(folder, '%dpx' % size)
+    return stem + '.png', stem + '.json'
+
+
+def build_atlas(font_path, size, folder, glyphs=GLYPHS, variation=VARIATION):
+    """rasterize ``glyphs`` at ``size`` pixels (the font size) and save the atlas in ``folder``
+
+    Returns
+    -------
+    atlas : GlyphAtlas
+
+    """
+    font = ImageFont.truetype(font_path, size)
+    if variation is not None:
+        font.set_variation_by_name(variation)
+    ascent, descent = font.getmetrics()
+    rasters = []
+    for char in glyphs:
+        left, top, right, bottom = font.getbbox(char)
+        width, height = max(right - left, 0), max(bottom - top, 0)
+        raster = Image.new('L', (width, height))
+        if width and height:
+            ImageDraw.Draw(raster).text((-left, -top), char, font=font, fill=255)
+        rasters.append((char, raster, left, top, font.getlength(char)))
+
+    ## pack the glyphs in rows, tallest first
+    metrics = {}
+    x = y = row_height = 0
+    placements = []
+    for char, raster, left, top, advance in sorted(rasters, key=lambda glyph: -glyph[1].height):
+        if x + raster.width + PADDING > ATLAS_WIDTH:
+            x, y, row_height = 0, y + row_height + PADDING, 0
+        placements.append((raster, x, y))
+        metrics[char] = [x, y, raster.width, raster.height, left, top, advance]
+        x += raster.width + PADDING
+        row_height = max(row_height, raster.height)
+    image = Image.new('L', (ATLAS_WIDTH, y + row_height))
+    for raster, x, y in placements:
+        image.paste(raster, (x, y))
+
+    os.makedirs(folder, exist_ok=True)
+    png_path, json_path = atlas_paths(folder, size)
+    image.save(png_path)
+    info = {'version': VERSION, 'font': op.basename(font_path), 'font_bytes': op.getsize(font_path),
+            'variation': variation, 'size': size, 'ascent': ascent, 'descent': descent, 'glyphs': metrics}
+    with open(json_path, 'w') as f:
+        json.dump(info, f)
+    return GlyphAtlas(np.asarray(image), info)
+
+
+def open_atlas(font_path, size, folder, glyphs=GLYPHS, variation=VARIATION):
+    """the atlas for ``size`` in ``folder``, or None if there is none or it was built from something else
+    """
+    png_path, json_path = atlas_paths(folder, size)
+    if not (op.isfile(png_path) and op.isfile(json_path)):
+        return None
+    with open(json_path) as f:
+        info = json.load(f)
+    if (info.get('version') != VERSION or info['font'] != op.basename(font_path)
+            or info['font_bytes'] != op.getsize(font_path) or info['variation'] != variation
+            or set(info['glyphs']) != set(glyphs)):
+        return None
+    with Image.open(png_path) as image:
+        return GlyphAtlas(np.asarray(image.convert('L')), info)
+
+
+def load_atlas(font_path, size, folder, glyphs=GLYPHS, variation=VARIATION):
+    """open the atlas for ``size``, building it first if it is missing or out of date
+    """
+    atlas = open_atlas(font_path, size, folder, glyphs, variation)
+    if atlas is None:
+        atlas = build_atlas(font_path, size, folder, glyphs, variation)
+    return atlas
+
+
+class GlyphAtlas:
+    """the glyphs of a font at one size, and the text laid out from them
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        (height, width) uint8 coverage of the packed glyphs
+    info : dict
+        The atlas' JSON: ``size``, ``ascent``, ``descent`` and, per
+        glyph, its ``[x, y, width, height, left, top, advance]``
+
+    """
+    def __init__(self, image, info):
+        self.image = image
+        self.size = info['size']
+        self.ascent = info['ascent']
+        self.descent = info['descent']
+        self.line_height = self.ascent + self.descent
+        self.glyphs = info['glyphs']
+
+    def __contains__(self, char):
+        return char in self.glyphs
+
+    def can_render(self, text):
+        return all(char in self.glyphs for char in text if char != '\n')
+
+    def line_width(self, line):
+        return sum(self.glyphs[char][6] for char in line)
+
+    def wrap(self, text, wrap_width=None):
+        """split ``text`` into lines, at its newlines and between words longer than ``wrap_width`` pixels
+        """
+        lines = []
+        for paragraph in text.split('\n'):
+            if wrap_width is None:
+                lines.append(paragraph)
+                continue
+            line = ''
+            for word in paragraph.split(' '):
+                candidate = word if not line else line + ' ' + word
+                if line and self.line_width(candidate) > wrap_width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            lines.append(line)
+        return lines
+
+    def render(self, text, wrap_width=None):
+        """lay ``text`` out, each line centred
+
+        Parameters
+        ----------
+        text : str
+        wrap_width : float or None
+            Width at which lines wrap, in pixels of the atlas
+
+        Returns
+        -------
+        coverage : numpy.ndarray
+            (height, width) uint8 array
+
+        """
+        lines = self.wrap(text, wrap_width)
+        widths = [self.line_width(line) for line in lines]
+        width = max(int(np.ceil(max(widths))), 1)
+        coverage = np.zeros((self.line_height*len(lines), width), np.uint8)
+        for n_line, (line, line_width) in enumerate(zip(lines, widths)):
+            pen = (width - line_width) / 2
+            baseline_top = n_line*self.line_height
+            for char in line:
+                x, y, glyph_width, glyph_height, left, top, advance = self.glyphs[char]
+                if glyph_width and glyph_height:
+                    col = int(round(pen + left))
+                    row = baseline_top + top
+                    # clip glyphs that overhang the line box (e.g. a j at the start of a line)
+                    col0, row0 = max(col, 0), max(row, 0)
+                    col1, row1 = min(col + glyph_width, width), min(row + glyph_height, coverage.shape[0])
+                    if col1 > col0 and row1 > row0:
+                        glyph = self.image[y + row0 - row:y + row1 - row, x + col0 - col:x + col1 - col]
+                        target = coverage[row0:row1, col0:col1]
+                        np.maximum(target, glyph, out=target)
+                pen += advance
+        return coverage
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Rasterize the bundled Optimistic font into glyph atlases, one per size. 1 degree is "
+                     "about 65 px at 57 cm, 106 px at 100 cm and 145 px at 139 cm on the lab screens."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[50], help='Font sizes, in pixels')
+    parser.add_argument('--font', default=FONT, help='Font file')
+    parser.add_argument('--variation', default=VARIATION, help='Named instance of the variable font')
+    parser.add_argument('--output', '-o', default='assets/GlyphAtlas', help='Folder of the atlases')
+    args = parser.parse_args()
+    for size in args.sizes:
+        atlas = build_atlas(args.font, size, args.output, variation=args.variation)
+        print("%d px -> %s (%d glyphs, %dx%d)" % (size, atlas_paths(args.output, size)[0], len(atlas.glyphs),
+                                                  atlas.image.shape[1], atlas.image.shape[0]))
@@ -0,0 +1,342 @@
+#!/usr/bin/python
+"""the English Lexicon Project tables the word lists come from, cached as NumPy arrays and indexed
+
+``assets/Stimuli-from-English-Lexicon-Words-May-2022.xls`` holds one
+sheet per list (5 and 6 letter words and nonwords, before and after
+filtering), each with a ``Word`` column and the lexical variables
+``Length``, ``Ortho_N``, ``BG_Sum`` and (for words) ``Freq_HAL``.
+Reading the .xls takes a while and needs xlrd, so the first
+``load_lexicon`` converts every sheet into a NumPy structured array and
+keeps them, with their indexes, in ``<source>.lexicon.npz``. The cache
+is rebuilt whenever the source's SHA-256 changes.
+
+Matched sets for a new stimulus list, e.g. 200 six letter words with
+a HAL frequency above 5600, each with a nonword of the same orthographic
+neighbourhood and a bigram sum within 500:
+
+    python -m stimulus_utils.lexicon --words 6WordMioreFilter --nonwords 6NonwordsMoreFilter -n 200 \\
+        --where Freq_HAL=5600: --match Ortho_N=0 BG_Sum=500 --out-words words.csv --out-nonwords nonwords.csv
+
+The CSVs have the columns of ``assets/Words6Letter.csv``, and can be
+rendered with ``stimulus_utils.word_renderer``.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import os.path as op
+
+import numpy as np
+
+
+SOURCE = 'assets/Stimuli-from-English-Lexicon-Words-May-2022.xls'
+INDEXED = ('Length', 'Ortho_N', 'BG_Sum', 'Freq_HAL')
+CACHE_EXTENSION = '.lexicon.npz'
+VERSION = 1
+
+
+def cache_path(source):
+    return op.splitext(source)[0] + CACHE_EXTENSION
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_sheets(source):
+    """the word tables of the workbook, by sheet name
+
+    A sheet is a word table if its first cell is ``Word``. Its columns
+    are the named ones up to the first unnamed column (the sheets have
+    scratch columns after that), keeping the first of repeated names;
+    rows without a word are skipped, and cells that are not numbers
+    become NaN.
+
+    Returns
+    -------
+    tables : dict of numpy.ndarray
+        Structured arrays, with a unicode ``Word`` field and float64
+        fields for the other columns
+
+    """
+    import xlrd
+
+    book = xlrd.open_workbook(source)
+    tables = {}
+    for sheet in book.sheets():
+        if sheet.nrows < 2 or sheet.cell_value(0, 0) != 'Word':
+            continue
+        columns = {}
+        for col, name in enumerate(sheet.row_values(0)):
+            if not name:
+                break
+            columns.setdefault(name.strip(), col)
+        words = sheet.col_values(0, 1)
+        rows = [row for row, word in enumerate(words) if isinstance(word, str) and word.strip()]
+        dtype = [('Word', 'U%d' % max(len(words[row].strip()) for row in rows))]
+        dtype += [(name, 'f8') for name in columns if name != 'Word']
+        table = np.zeros(len(rows), dtype)
+        table['Word'] = [words[row].strip() for row in rows]
+        for name, col in columns.items():
+            if name != 'Word':
+                values = sheet.col_values(col, 1)
+                table[name] = [values[row] if isinstance(values[row], float) else np.nan for row in rows]
+        tables[sheet.name] = table
+    return tables
+
+
+def build_lexicon(source=SOURCE, path=None):
+    """convert the workbook into its cache (written to a temporary file, then moved into place)
+
+    Returns
+    -------
+    lexicon : Lexicon
+
+    """
+    if path is None:
+        path = cache_path(source)
+    tables = read_sheets(source)
+    arrays = {}
+    for name, table in tables.items():
+        arrays[name] = table
+        for column in INDEXED:
+            if column in table.dtype.names:
+                arrays[name + '/' + column] = np.argsort(table[column], kind='stable')
+    info = {'version': VERSION, 'source': op.basename(source), 'sha256': file_hash(source),
+            'sheets': list(tables)}
+    arrays['info'] = np.array(json.dumps(info))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return Lexicon(arrays, info)
+
+
+def load_lexicon(source=SOURCE, path=None):
+    """the lexicon, from its cache if it is up to date, and built from ``source`` otherwise
+
+    Returns
+    -------
+    lexicon : Lexicon
+
+    """
+    if path is None:
+        path = cache_path(source)
+    if op.isfile(path):
+        with np.load(path) as cache:
+            info = json.loads(cache['info'][()])
+            if info['version'] == VERSION and info['sha256'] == file_hash(source):
+                return Lexicon({name: cache[name] for name in cache.files}, info)
+    return build_lexicon(source, path)
+
+
+class Lexicon:
+    """the tables of the lexicon, by sheet name (e.g. ``lexicon['6WordMioreFilter']``)
+
+    Parameters
+    ----------
+    arrays : dict of numpy.ndarray
+        The sheets' structured arrays, and ``<sheet>/<column>`` their indexes
+    info : dict
+        The cache's metadata: source name, its SHA-256, the sheets
+
+    """
+    def __init__(self, arrays, info):
+        self.info = info
+        self.tables = {}
+        for name in info['sheets']:
+            orders = {column: arrays[name + '/' + column] for column in INDEXED if name + '/' + column in arrays}
+            self.tables[name] = LexiconTable(arrays[name], orders)
+
+    def __getitem__(self, sheet):
+        return self.tables[sheet]
+
+    def sheets(self):
+        return list(self.tables)
+
+
+def _bounds(value):
+    """``(low, high)`` from a number (exact match) or a ``(low, high)`` pair where None is unbounded
+    """
+    if isinstance(value, (tuple, list)):
+        low, high = value
+        return -np.inf if low is None else low, np.inf if high is None else high
+    return value, value
+
+
+class LexiconTable:
+    """one sheet of the lexicon, queried through sorted indexes of the ``INDEXED`` columns
+
+    Parameters
+    ----------
+    rows : numpy.ndarray
+        Structured array of the sheet
+    orders : dict of numpy.ndarray
+        For each indexed column, the row order that sorts it
+
+    """
+    def __init__(self, rows, orders):
+        self.rows = rows
+        self.orders = orders
+        self.sorted = {column: rows[column][order] for column, order in orders.items()}
+        # missing values (NaN) sort last: only the rows before them are looked up
+        self.n_valid = {column: len(values) - int(np.isnan(values).sum()) if values.dtype.kind == 'f' else len(values)
+                        for column, values in self.sorted.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def columns(self):
+        return self.rows.dtype.names
+
+    def where(self, **ranges):
+        """the indexes of the rows whose columns are within ``ranges``
+
+        Parameters
+        ----------
+        ranges :
+            ``column=value`` for an exact value, or ``column=(low, high)``,
+            both inclusive and None for no bound. The narrowest indexed
+            range is looked up first, and the other columns are only
+            compared on the rows it leaves. Rows whose value is missing
+            (NaN) are never within a range.
+
+        Returns
+        -------
+        indexes : numpy.ndarray
+            In row order
+
+        """
+        bounds = {column: _bounds(value) for column, value in ranges.items()}
+        candidates = None
+        for column, (low, high) in bounds.items():
+            if column not in self.orders:
+                continue
+            values = self.sorted[column][:self.n_valid[column]]
+            found = self.orders[column][np.searchsorted(values, low, 'left'):np.searchsorted(values, high, 'right')]
+            if candidates is None or len(found) < len(candidates):
+                candidates, narrowest = found, column
+        if candidates is None:
+            candidates, narrowest = np.arange(len(self.rows)), None
+        keep = np.ones(len(candidates), bool)
+        for column, (low, high) in bounds.items():
+            if column != narrowest:
+                values = self.rows[column][candidates]
+                keep &= (values >= low) & (values <= high)
+        return np.sort(candidates[keep])
+
+    def select(self, **ranges):
+        """the rows whose columns are within ``ranges`` (see ``where``)
+        """
+        return self.rows[self.where(**ranges)]
+
+    def matched(self, other, n, tolerance, seed=None, **ranges):
+        """draw ``n`` rows from this table, each paired with a different row of ``other`` that matches it
+
+        Rows are drawn at random among those within ``ranges``; for each,
+        a match is drawn among the unused rows of ``other`` whose columns
+        are within ``tolerance`` of the row's. Rows without one, or with a
+        missing value in a ``tolerance`` column, are passed over.
+
+        Parameters
+        ----------
+        other : LexiconTable
+        n : int
+        tolerance : dict
+            ``column: tolerance``; 0 for the same value
+        seed : int or None
+        ranges :
+            Restrict the rows of this table, as in ``where``
+
+        Returns
+        -------
+        rows, other_rows : numpy.ndarray
+            The pairs, ``rows[i]`` matched with ``other_rows[i]``
+
+        Raises
+        ------
+        ValueError
+            If fewer than ``n`` rows could be matched
+
+        """
+        rng = np.random.default_rng(seed)
+        used = np.zeros(len(other), bool)
+        pairs = []
+        for index in rng.permutation(self.where(**ranges)):
+            row = self.rows[index]
+            if any(np.isnan(row[column]) for column in tolerance):
+                continue
+            candidates = other.where(**{column: (row[column] - tol, row[column] + tol)
+                                        for column, tol in tolerance.items()})
+            candidates = candidates[~used[candidates]]
+            if len(candidates) == 0:
+                continue
+            match = rng.choice(candidates)
+            used[match] = True
+            pairs.append((index, match))
+            if len(pairs) == n:
+                break
+        if len(pairs) < n:
+            raise ValueError("only %i of the %i rows asked for could be matched" % (len(pairs), n))
+        indexes, other_indexes = (np.array(column, int) for column in zip(*pairs))
+        return self.rows[indexes], other.rows[other_indexes]
+
+
+def write_csv(rows, path, columns=None):
+    """write ``rows`` in the layout of ``assets/Words6Letter.csv`` (the ``Word`` column, then ``columns``)
+    """
+    if columns is None:
+        columns = [column for column in ('Length', 'Ortho_N', 'BG_Sum', 'Freq_HAL') if column in rows.dtype.names]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Word'] + list(columns))
+        for row in rows:
+            writer.writerow([row['Word']] + ['%g' % row[column] for column in columns])
+
+
+def _parse_ranges(items):
+    """``Column=value`` or ``Column=low:high`` (either side may be left empty) into ``where`` arguments
+    """
+    ranges = {}
+    for item in items:
+        column, value = item.split('=')
+        if ':' in value:
+            low, high = value.split(':')
+            ranges[column] = (float(low) if low else None, float(high) if high else None)
+        else:
+            ranges[column] = float(value)
+    return ranges
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Build (or refresh) the cached lexicon, and draw matched word/nonword sets from it.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--source', default=SOURCE, help='English Lexicon Project workbook')
+    parser.add_argument('--words', help='Sheet to draw words from')
+    parser.add_argument('--nonwords', help='Sheet to draw the matched nonwords from')
+    parser.add_argument('-n', type=int, default=100, help='Number of pairs')
+    parser.add_argument('--where', nargs='*', default=[], help='Column=value or Column=low:high, for the words')
+    parser.add_argument('--match', nargs='*', default=['Length=0', 'Ortho_N=0', 'BG_Sum=500'],
+                        help='Column=tolerance, between a word and its nonword')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--out-words', default='words.csv')
+    parser.add_argument('--out-nonwords', default='nonwords.csv')
+    args = parser.parse_args()
+
+    lexicon = load_lexicon(args.source)
+    for sheet in lexicon.sheets():
+        print("%-20s %5i rows  %s" % (sheet, len(lexicon[sheet]), ', '.join(lexicon[sheet].columns)))
+    if args.words and args.nonwords:
+        words, nonwords = lexicon[args.words].matched(lexicon[args.nonwords], args.n, _parse_ranges(args.match),
+                                                      args.seed,
+                                                      **_parse_ranges(args.where))
+        write_csv(words, args.out_words)
+        write_csv(nonwords, args.out_nonwords)
+        print("%i pairs -> %s, %s" % (len(words), args.out_words, args.out_nonwords))
@@ -0,0 +1,162 @@
+#!/usr/bin/python
+"""1/f^alpha (pink) noise backgrounds, a NumPy port of generate_pinknoise_stimuli.m
+
+White Gaussian noise is filtered in the frequency domain by
+1/|f|^alpha and rescaled to [0, 1], as in generate_pinknoise_stimuli.m.
+The noise is real, so real FFTs (``rfft2``/``irfft2``) are used, which
+do about half the work of ``fft2``, and the filter for a given
+(height, width, alpha) is only computed once per process.
+"""
+import argparse
+import functools
+import os
+import os.path as op
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from stimulus_utils.dead_leaves import to_uint8
+
+
+@functools.lru_cache(maxsize=8)
+def frequency_filter(height, width, alpha=1.):
+    """the 1/|f|^alpha filter, laid out like the output of ``numpy.fft.rfft2``
+
+    Frequencies are in cycles per image, and the DC component is left
+    at 1, as in generate_pinknoise_stimuli.m. The array is cached (and
+    read-only), so it must not be modified.
+    """
+    fy = np.fft.fftfreq(height) * height
+    fx = np.fft.rfftfreq(width) * width
+    dd = np.sqrt(fy[:, None]**2 + fx[None, :]**2)
+    dd[0, 0] = 1
+    filt = dd ** -alpha
+    filt.setflags(write=False)
+    return filt
+
+
+def _rescale(noise):
+    """rescale each image of ``noise`` to [0, 1] (MATLAB's rescale), in place
+    """
+    low = noise.min(axis=(-2, -1), keepdims=True)
+    high = noise.max(axis=(-2, -1), keepdims=True)
+    noise -= low
+    noise /= high - low
+    return noise
+
+
+def pink_noise_batch(n_images, height=2160, width=3840, alpha=1., seed=None, first=0):
+    """generate several pink-noise images at once
+
+    Image ``i`` of the batch is generated from the seed ``[seed, first + i]``,
+    so it is the same image whatever the batch it was generated in.
+
+    Parameters
+    ----------
+    n_images : int
+    height, width : int
+        Size of the images, in pixels
+    alpha : float
+        Exponent of the 1/f^alpha filter (1 is pink noise)
+    seed : int
+        Base seed
+    first : int
+        Index of the first image
+
+    Returns
+    -------
+    images : numpy.ndarray
+        (n_images, height, width) float32 array in [0, 1]
+
+    """
+    white = np.empty((n_images, height, width))
+    for i in range(n_images):
+        white[i] = np.random.default_rng([seed or 0, first + i]).standard_normal((height, width))
+    spectrum = np.fft.rfft2(white)
+    del white
+    spectrum *= frequency_filter(height, width, alpha)
+    noise = np.fft.irfft2(spectrum, s=(height, width)).astype(np.float32)
+    return _rescale(noise)
+
+
+def pink_noise(height=2160, width=3840, alpha=1., seed=None, index=0):
+    """generate one pink-noise image, see ``pink_noise_batch``
+    """
+    return pink_noise_batch(1, height, width, alpha, seed, index)[0]
+
+
+def iter_pink_noise(height=2160, width=3840, alpha=1., seed=None, first=0, batch_size=1):
+    """yield pink-noise images one at a time, for as long as they are asked for
+
+    Images are generated ``batch_size`` at a time, and image ``i`` is
+    the same as ``pink_noise(..., seed, i)``.
+
+    Yields
+    ------
+    index : int
+        The image's index (what, with ``seed``, regenerates it)
+    image : numpy.ndarray
+        (height, width) float32 array in [0, 1]
+
+    """
+    index = first
+    while True:
+        for image in pink_noise_batch(batch_size, height, width, alpha, seed, index):
+            yield index, image
+            index += 1
+
+
+def _write_one(args):
+    path, height, width, alpha, seed, index = args
+    start = time.perf_counter()
+    Image.fromarray(to_uint8(pink_noise(height, width, alpha, seed, index))).save(path)
+    return path, time.perf_counter() - start
+
+
+def generate_backgrounds(folder, n_images, height=2160, width=3840, alpha=1., seed=0, n_workers=None, first=1):
+    """write ``n_images`` pink-noise PNGs (pinknoise_<i>.png) to ``folder``
+
+    Parameters
+    ----------
+    n_workers : int or None
+        Number of processes to spread the images over. None uses one per
+        CPU; 1 generates them in this process
+
+    Returns
+    -------
+    timings : list of tuple
+        (path, seconds) for every image written
+
+    """
+    os.makedirs(folder, exist_ok=True)
+    jobs = [(op.join(folder, 'pinknoise_%d.png' % i), height, width, alpha, seed, i)
+            for i in range(first, first + n_images)]
+    if n_workers == 1:
+        return [_write_one(job) for job in jobs]
+    with ProcessPoolExecutor(n_workers) as executor:
+        return list(executor.map(_write_one, jobs))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=("Generate 1/f^alpha noise backgrounds (what generate_pinknoise_stimuli.m does, "
+                     "without MATLAB), e.g. into assets/Backgrounds/Noise/lab/pinknoise."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('folder', help='Where to write the images')
+    parser.add_argument('--number', '-n', type=int, default=50, help='Number of images')
+    parser.add_argument('--height', type=int, default=2160, help='Image height, in pixels')
+    parser.add_argument('--width', type=int, default=3840, help='Image width, in pixels')
+    parser.add_argument('--alpha', type=float, default=1., help='1/f^alpha exponent')
+    parser.add_argument('--seed', type=int, default=0, help='Base seed (image i uses [seed, i])')
+    parser.add_argument('--first', type=int, default=1, help='Number of the first image')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = generate_backgrounds(args.folder, args.number, args.height, args.width, args.alpha,
+                                   args.seed, args.workers, args.first)
+    for path, seconds in timings:
+        print("%s (%.2f s)" % (path, seconds))
+    print("%d images in %.1f s" % (len(timings), time.perf_counter() - start))
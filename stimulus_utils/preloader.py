@@ -0,0 +1,198 @@
+#!/usr/bin/python
+"""decode the session's stimulus images in the background before the first trial
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+
+# anything else in a stimulus folder (e.g. the Thumbs.db Windows leaves behind) is not preloaded
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+def content_box(size, bbox):
+    """grow ``bbox`` into the smallest box around it that is centred on the image
+
+    The word images are full-screen RGBA frames with the word drawn
+    somewhere near the middle. ImageStim centres an image on its ``pos``
+    and (without a ``size``) shows it at one screen pixel per image
+    pixel, so cropping to a box with the same centre as the full frame
+    leaves where and how large the word appears unchanged, mirrored or
+    not.
+
+    Parameters
+    ----------
+    size : tuple
+        (width, height) of the image
+    bbox : tuple
+        (left, upper, right, lower) of the content, as returned by
+        ``PIL.Image.Image.getbbox``
+
+    Returns
+    -------
+    box : tuple
+        (left, upper, right, lower)
+
+    """
+    width, height = size
+    left, upper, right, lower = bbox
+    left = min(left, width - right)
+    upper = min(upper, height - lower)
+    return (left, upper, width - left, height - upper)
+
+
+def decode_image(path, crop=True):
+    """read and decode an image file
+
+    Parameters
+    ----------
+    path : str
+        Path of the image
+    crop : bool
+        Whether to crop images with an alpha channel to their visible
+        content (see ``content_box``)
+
+    Returns
+    -------
+    image : PIL.Image.Image
+        The decoded image, not tied to the file anymore
+
+    """
+    with Image.open(path) as im:
+        im.load()
+        if crop and im.mode in ('RGBA', 'LA'):
+            bbox = im.getchannel('A').getbbox()
+            if bbox is not None:
+                return im.crop(content_box(im.size, bbox))
+        return im.copy()
+
+
+class AssetPreloader:
+    """decode a set of stimulus images on a thread pool
+
+    The session's stimuli used to be decoded from their PNGs only when a
+    trial happened to pick them. Starting the preloader while the
+    AEPsych server boots decodes all of them in the meantime (PIL
+    releases the GIL while decoding, so the threads actually run in
+    parallel and the loading screen stays responsive). The decoded
+    images are collected in ``images`` as they finish, which can be
+    handed to ``TextureCache`` to build the stims from.
+
+    Parameters
+    ----------
+    paths : list of str
+        The images to decode. Paths without an image extension (see
+        ``IMAGE_EXTENSIONS``) are skipped
+    n_workers : int or None
+        Number of decoding threads. None uses one per CPU (capped at 16)
+    crop : bool
+        Whether to crop images with an alpha channel to their visible
+        content, see ``decode_image``
+
+    Attributes
+    ----------
+    images : dict
+        Decoded images, by path
+    n_done : int
+        Number of images finished so far (including failed ones)
+
+    """
+    def __init__(self, paths, n_workers=None, crop=True):
+        self.paths = [path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS)]
+        self.n_workers = n_workers or min(16, os.cpu_count() or 1)
+        self.crop = crop
+        self.images = {}
+        self.n_done = 0
+        self.errors = {}
+        self._decode_times = []
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._executor = None
+        self._start = None
+        self._stop = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def start(self):
+        """start decoding, returns straight away
+        """
+        self._start = time.perf_counter()
+        if not self.paths:
+            self._stop = self._start
+            self._finished.set()
+            return self
+        self._executor = ThreadPoolExecutor(self.n_workers, thread_name_prefix='AssetPreloader')
+        for path in self.paths:
+            self._executor.submit(self._load, path)
+        self._executor.shutdown(wait=False)
+        return self
+
+    def _load(self, path):
+        start = time.perf_counter()
+        try:
+            image = decode_image(path, self.crop)
+        except Exception as e:
+            image = None
+            error = e
+        stop = time.perf_counter()
+        with self._lock:
+            if image is None:
+                self.errors[path] = error
+            else:
+                self.images[path] = image
+            self._decode_times.append(stop - start)
+            self.n_done += 1
+            if self.n_done == len(self.paths):
+                self._stop = stop
+                self._finished.set()
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    @property
+    def fraction_done(self):
+        return self.n_done / len(self.paths) if self.paths else 1.
+
+    def wait(self, timeout=None):
+        """block until every image has been decoded
+
+        Raises
+        ------
+        TimeoutError
+            If ``timeout`` seconds went by first
+        OSError
+            If an image could not be read, naming the first one that
+            failed and how many did
+
+        """
+        if not self._finished.wait(timeout):
+            raise TimeoutError("Stimuli still loading after %s s (%d of %d done)"
+                               % (timeout, self.n_done, len(self.paths)))
+        if self.errors:
+            path, error = next(iter(self.errors.items()))
+            raise OSError("Could not load %d stimulus image(s), e.g. %s: %s"
+                          % (len(self.errors), path, error))
+
+    def metrics(self):
+        """return load-time statistics as a dict (times in seconds, sizes in megabytes)
+        """
+        with self._lock:
+            decode_times = sorted(self._decode_times)
+            n_bytes = sum(len(image.mode) * image.width * image.height for image in self.images.values())
+        n = len(decode_times)
+        stop = self._stop if self._stop is not None else time.perf_counter()
+        return {
+            'images': n,
+            'failed': len(self.errors),
+            'workers': self.n_workers,
+            'wall_time': stop - self._start if self._start is not None else 0.,
+            'mean_decode': sum(decode_times) / n if n else 0.,
+            'max_decode': decode_times[-1] if n else 0.,
+            'p95_decode': decode_times[min(n - 1, int(0.95 * n))] if n else 0.,
+            'megabytes': n_bytes / 1024**2,
+        }
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+"""cache of the TextStims used for instructions, prompts and feedback
+"""
+from psychopy import visual
+
+
+class TextCache:
+    """keep every TextStim built, keyed by its text, window and appearance
+
+    Laying out a TextStim and uploading its glyphs is one of the slowest
+    things PsychoPy does, and the scripts used to do it for the reminder
+    and feedback text of every practice trial, between the response and
+    the next screen. A stim is built the first time a ``(text, win,
+    height, flipHoriz, pos, ...)`` combination is asked for, and reused
+    after that. The session's strings are few, so nothing is evicted.
+
+    Stims handed out are shared: change their attributes and the key no
+    longer describes them.
+
+    Attributes
+    ----------
+    hits, misses : int
+        Counters, to check that the strings were built up front
+
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stims = {}
+
+    def __len__(self):
+        return len(self._stims)
+
+    @staticmethod
+    def key(win, text, kwargs):
+        return (text, win) + tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                                          for name, value in kwargs.items()))
+
+    def get(self, win, text, factory=None, **kwargs):
+        """return the TextStim showing ``text`` in ``win``, creating it if needed
+
+        Parameters
+        ----------
+        win : psychopy.visual.Window
+        text : str
+        factory : callable or None
+            Builds the stim from ``(win, text=text, **kwargs)`` on a miss;
+            ``psychopy.visual.TextStim`` if None. Not part of the key: a
+            text is always built the same way.
+        kwargs :
+            Passed on to the factory (units, pos, height, flipHoriz, ...).
+            They are part of the key.
+
+        Returns
+        -------
+        stim : psychopy.visual.TextStim
+
+        """
+        key = self.key(win, text, kwargs)
+        stim = self._stims.get(key)
+        if stim is not None:
+            self.hits += 1
+            return stim
+        self.misses += 1
+        stim = self._stims[key] = (factory or visual.TextStim)(win, text=text, **kwargs)
+        return stim
+
+    def stats(self):
+        """return the cache's counters as a dict
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.,
+                'entries': len(self._stims)}
@@ -0,0 +1,129 @@
+#!/usr/bin/python
+"""LRU cache of the ImageStims used for word and image stimuli
+"""
+from collections import OrderedDict
+
+from PIL import Image
+from psychopy import visual
+
+
+def texture_bytes(image):
+    """estimate the memory an image takes up once it has been uploaded as an RGBA texture
+
+    Parameters
+    ----------
+    image : str or PIL.Image.Image or numpy.ndarray
+        Path of the image (only its header is read), or the image itself
+
+    Returns
+    -------
+    n_bytes : int
+
+    """
+    if isinstance(image, str):
+        with Image.open(image) as im:
+            width, height = im.size
+    elif isinstance(image, Image.Image):
+        width, height = image.size
+    else:
+        height, width = image.shape[:2]
+    return width * height * 4
+
+
+class TextureCache:
+    """keep the ImageStims (and so the uploaded textures) of recently shown stimuli
+
+    Building an ImageStim from a file decodes the PNG and uploads the
+    texture, which used to happen on every trial between fixation and
+    stimulus onset. Stims are cached per ``(path, eye)``, so when an
+    asset comes up again its texture is reused and only its position is
+    updated. Each eye must always be drawn in the same window (in debug
+    mode both eyes share ``winLeft``).
+
+    Least recently used stims are dropped once the textures held add up
+    to more than ``max_bytes``.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget for the cached textures, in bytes
+    min_entries : int
+        Number of most recently used stims that are never evicted (so the
+        stims of the current trial stay valid whatever the budget)
+    images : dict or None
+        Already decoded images by path (e.g. ``AssetPreloader.images``).
+        Stims are built from these when available instead of from the
+        file.
+
+    Attributes
+    ----------
+    hits, misses, evictions : int
+        Counters, to check how often trials get to reuse a texture
+
+    """
+    def __init__(self, max_bytes=1024**3, min_entries=8, images=None):
+        self.max_bytes = max_bytes
+        self.min_entries = min_entries
+        self.images = images if images is not None else {}
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stims = OrderedDict()
+
+    def __len__(self):
+        return len(self._stims)
+
+    def __contains__(self, key):
+        return key in self._stims
+
+    def get(self, path, eye, win, pos=(0, 0), **kwargs):
+        """return the ImageStim for ``path`` shown to ``eye``, creating it if needed
+
+        Parameters
+        ----------
+        path : str
+            Path of the image
+        eye : {'left', 'right'}
+            Which eye the stim is shown to
+        win : psychopy.visual.Window
+            The window the stim is drawn in (only used on a miss)
+        pos : tuple
+            Position of the stim, set on hits as well as misses
+        kwargs :
+            Passed on to ``psychopy.visual.ImageStim`` on a miss (units,
+            size, color, flipHoriz, ...). They are not reapplied on a hit.
+
+        Returns
+        -------
+        stim : psychopy.visual.ImageStim
+
+        """
+        key = (path, eye)
+        if key in self._stims:
+            self.hits += 1
+            self._stims.move_to_end(key)
+            stim = self._stims[key][0]
+            stim.pos = pos
+            return stim
+        self.misses += 1
+        image = self.images.get(path, path)
+        stim = visual.ImageStim(win, image=image, pos=pos, **kwargs)
+        self._add(key, stim, texture_bytes(image))
+        return stim
+
+    def _add(self, key, stim, n_bytes):
+        self._stims[key] = (stim, n_bytes)
+        self.n_bytes += n_bytes
+        while self.n_bytes > self.max_bytes and len(self._stims) > self.min_entries:
+            _, (_, evicted_bytes) = self._stims.popitem(last=False)
+            self.n_bytes -= evicted_bytes
+            self.evictions += 1
+
+    def stats(self):
+        """return the cache's counters as a dict
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.,
+                'entries': len(self._stims), 'megabytes': self.n_bytes / 1024**2}
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+"""render the word stimuli from the lexicon CSVs, at any viewing distance and pixel pitch
+
+The words of ``assets/Words6Letter.csv`` and the nonwords of
+``assets/Nonwords6Letter.csv`` are drawn in the bundled Optimistic font
+with an x-height of ``X_HEIGHT`` arcmin, and written where the
+experiment looks for them:
+
+    <output>/<location>/Real/<VID>/<word>.png
+    <output>/<location>/Nonsense/<VID>/<word>.png
+
+e.g. for a 75 cm condition on the lab screens:
+
+    python -m stimulus_utils.word_renderer --location lab --vids 75
+
+Each image is white text on a transparent background, centred on its
+line box, and is shown at one screen pixel per image pixel (like the
+exported full-screen PNGs, once cropped by ``stimulus_utils.preloader``).
+Words are rendered on a process pool. The parameters a folder was
+rendered with are kept in its ``RENDER_INFO`` file; rendering it again
+with the same parameters only renders the words it is missing, and
+changing them re-renders it. Folders of images from somewhere else (no
+``RENDER_INFO``) are left alone.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import os.path as op
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from stimulus_utils.glyph_atlas import FONT, VARIATION
+
+
+LEXICONS = {'Real': 'assets/Words6Letter.csv', 'Nonsense': 'assets/Nonwords6Letter.csv'}
+## x-height of the words, in arcmin
+X_HEIGHT = 24
+## pixel pitch of the haploscope screens, in mm (width_cm / width of experiment_engine.settings.LOCATIONS)
+PIXEL_PITCH = {'lab': 698.5 / 4096, 'desk': 400 / 2560}
+RENDER_INFO = 'render_info.json'
+VERSION = 1
+## transparent margin around the line box, in pixels
+PADDING = 2
+
+
+def read_words(path):
+    """the ``Word`` column of a lexicon CSV
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return [row['Word'].strip() for row in csv.DictReader(f) if row['Word'].strip()]
+
+
+def x_height_px(view_distance, pixel_pitch, x_height=X_HEIGHT):
+    """the x-height in pixels of ``x_height`` arcmin, ``view_distance`` cm away on ``pixel_pitch`` mm pixels
+    """
+    return 2 * view_distance * 10 * math.tan(math.radians(x_height / 60) / 2) / pixel_pitch
+
+
+def open_font(font_path, size, variation=VARIATION):
+    font = ImageFont.truetype(font_path, size)
+    if variation is not None:
+        font.set_variation_by_name(variation)
+    return font
+
+
+def font_size_for(font_path, x_height, variation=VARIATION):
+    """the font size (in pixels, not rounded) at which the font's x is ``x_height`` pixels high
+    """
+    reference = 1000
+    _, top, _, baseline = open_font(font_path, reference, variation).getbbox('x', anchor='ls')
+    return x_height * reference / (baseline - top)
+
+
+_fonts = {}
+
+
+def render_word(word, path, font_path, size, variation=VARIATION):
+    """draw ``word`` at font ``size`` and save it to ``path`` (written to a temporary file, then moved into place)
+    """
+    key = (font_path, size, variation)
+    if key not in _fonts:
+        _fonts[key] = open_font(font_path, size, variation)
+    font = _fonts[key]
+    ascent, descent = font.getmetrics()
+    width = int(math.ceil(font.getlength(word))) + 2*PADDING
+    coverage = Image.new('L', (width, ascent + descent + 2*PADDING))
+    ImageDraw.Draw(coverage).text((PADDING, PADDING), word, font=font, fill=255)
+    rgba = np.full((coverage.height, coverage.width, 4), 255, np.uint8)
+    rgba[..., 3] = np.asarray(coverage)
+    tmp_path = path + '.tmp'
+    Image.fromarray(rgba, 'RGBA').save(tmp_path, format='PNG')
+    os.replace(tmp_path, path)
+
+
+def render_folder(words, folder, view_distance, pixel_pitch, font_path=FONT, variation=VARIATION,
+                  x_height=X_HEIGHT, executor=None):
+    """render ``words`` into ``folder``, skipping those already rendered with the same parameters
+
+    Parameters
+    ----------
+    words : list of str
+    folder : str
+    view_distance : float
+        In cm
+    pixel_pitch : float
+        In mm
+    font_path, variation :
+        The font, and its named instance
+    x_height : float
+        In arcmin
+    executor : concurrent.futures.Executor or None
+        Where the words are rendered; in this process if None
+
+    Returns
+    -------
+    n_rendered : int
+        Number of words rendered, or None if ``folder`` holds images that
+        were not rendered here
+
+    """
+    #whole pixels: Pillow < 10.1 only takes integer font sizes (the x-height is then within a quarter pixel)
+    size = int(round(font_size_for(font_path, x_height_px(view_distance, pixel_pitch, x_height), variation)))
+    info = {'version': VERSION, 'font': op.basename(font_path), 'font_bytes': op.getsize(font_path),
+            'variation': variation, 'view_distance': view_distance, 'pixel_pitch': pixel_pitch,
+            'x_height': x_height, 'font_size': size}
+    info_path = op.join(folder, RENDER_INFO)
+    existing = set(name for name in os.listdir(folder) if name.lower().endswith('.png')) if op.isdir(folder) else set()
+    if existing and not op.isfile(info_path):
+        return None
+    os.makedirs(folder, exist_ok=True)
+    previous = None
+    if op.isfile(info_path):
+        with open(info_path) as f:
+            previous = json.load(f)
+    if previous != info:
+        ## rendered with other parameters (or not at all): start over
+        with open(info_path, 'w') as f:
+            json.dump(info, f, indent=1)
+        existing = set()
+    names = {word + '.png': word for word in words}
+    for name in existing - set(names):
+        os.remove(op.join(folder, name))
+    todo = [(word, op.join(folder, name)) for name, word in names.items() if name not in existing]
+    args = ([path for _, path in todo], [font_path]*len(todo), [size]*len(todo), [variation]*len(todo))
+    if executor is None:
+        list(map(render_word, [word for word, _ in todo], *args))
+    else:
+        list(executor.map(render_word, [word for word, _ in todo], *args, chunksize=16))
+    return len(todo)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Render the words and nonwords of the lexicon CSVs for viewing distances of the experiment.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--vids', nargs='+', type=int, required=True, help='Viewing distances, in cm')
+    parser.add_argument('--location', choices=sorted(PIXEL_PITCH), default='lab',
+                        help='Screens the words are for (their pixel pitch, and the output subfolder)')
+    parser.add_argument('--pixel-pitch', type=float, default=None,
+                        help="Pixel pitch in mm, instead of the location's")
+    parser.add_argument('--x-height', type=float, default=X_HEIGHT, help='x-height, in arcmin')
+    parser.add_argument('--font', default=FONT, help='Font file')
+    parser.add_argument('--variation', default=VARIATION, help='Named instance of the variable font')
+    parser.add_argument('--real', default=LEXICONS['Real'], help='CSV of the words (e.g. from stimulus_utils.lexicon)')
+    parser.add_argument('--nonsense', default=LEXICONS['Nonsense'], help='CSV of the nonwords')
+    parser.add_argument('--output', '-o', default='assets/Words', help='Root of the word folders')
+    parser.add_argument('--workers', type=int, default=None, help='Number of rendering processes')
+    args = parser.parse_args()
+    pixel_pitch = args.pixel_pitch if args.pixel_pitch is not None else PIXEL_PITCH[args.location]
+
+    lexicons = {'Real': read_words(args.real), 'Nonsense': read_words(args.nonsense)}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as executor:
+        for vid in args.vids:
+            for kind, words in lexicons.items():
+                folder = op.join(args.output, args.location, kind, str(vid))
+                n_rendered = render_folder(words, folder, vid, pixel_pitch, args.font, args.variation,
+                                           args.x_height, executor)
+                if n_rendered is None:
+                    print("%s: skipped, it holds images that were not rendered from the lexicon" % folder)
+                else:
+                    print("%s: %i of %i words rendered (x-height %.1f px)"
+                          % (folder, n_rendered, len(words), x_height_px(vid, pixel_pitch, args.x_height)))
+    print("done in %.1f s" % (time.perf_counter() - start))